@@ -1,92 +1,1304 @@
-from flask import (Flask, request, send_from_directory, redirect, jsonify, abort, json)
+from flask import (Flask, request, send_from_directory, redirect, jsonify, abort, json, g)
+import numpy
 import spyce
+import async_server
+import compression
+import ephemeris_cache
+import ephemeris_store
+import kernel_loader
+import metrics
+import spice_pool
+import trajectory_lod
+import contextlib
+import functools
+import hashlib
+import hmac
+import threading
 import os, os.path
+import struct
+import time
 
 EARTH = 399
+SUN = 10
+
+# Order of the state vector components returned by spyce.get_frames_batch
+FRAME_FIELDS = ('x', 'y', 'z', 'dx', 'dy', 'dz')
+
+# Reference frame and aberration correction of frames requests that don't
+# ask for others. The ephemeris store and cache only hold these geometric
+# J2000 states; other frames and corrections are always computed by SPICE.
+DEFAULT_FRAME = 'J2000'
+DEFAULT_ABCORR = 'NONE'
+ABERRATION_CORRECTIONS = ('NONE', 'LT', 'LT+S', 'CN', 'CN+S', 'XLT', 'XLT+S', 'XCN', 'XCN+S')
+
+# Speed of light in km/s, and the name of the light time member added
+# after FRAME_FIELDS when a request asks for light times
+CLIGHT = 299792.458
+LIGHT_TIME_FIELD = 'lt'
+
+# Maximum number of entries kept by each of the kernel pool caches
+NAME_CACHE_SIZE = 1024
+KERNEL_OBJECTS_CACHE_SIZE = 64
+COVERAGE_CACHE_SIZE = 256
+TRAIL_CACHE_SIZE = 32
+EVENTS_CACHE_SIZE = 32
+
+# Upper bound on the number of epochs a single frames request may generate
+MAX_SAMPLED_TIMES = 1000000
+
+# Binary frames format: a little-endian header of
+#   magic (4 bytes), version (uint16), bytes per state value (uint16),
+#   frame count N (uint32), column count (uint32)
+# followed by N float64 ETs and then N values for each of FRAME_FIELDS,
+# column by column, as float64 or float32.
+BINARY_FRAMES_MIMETYPE = 'application/octet-stream'
+BINARY_FRAMES_HEADER = struct.Struct('<4sHHII')
+BINARY_FRAMES_MAGIC = b'FRMS'
+BINARY_FRAMES_VERSION = 1
+BINARY_FRAMES_DTYPES = {'float64': '<f8', 'float32': '<f4'}
+
+# JSON frames responses are computed and serialized this many epochs at a
+# time, and streamed if they have more than that. format=ndjson gives one
+# JSON value per line instead of a single array.
+FRAMES_CHUNK_SIZE = 10000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# API responses of these types are compressed (see compress_response())
+# if the client accepts it
+COMPRESSED_MIMETYPES = ('application/json', NDJSON_MIMETYPE, BINARY_FRAMES_MIMETYPE)
+
+# Event searches (/api/objects/<id>/events): the kinds of events, and the
+# default step (seconds) of the SPICE geometry finder, which must be
+# shorter than any event or gap between events to be found
+EVENT_TYPES = ('periapsis', 'apoapsis', 'closest_approach', 'distance', 'occultation', 'eclipse')
+DISTANCE_EVENT_RELATIONS = {'periapsis': 'LOCMIN', 'apoapsis': 'LOCMAX', 'closest_approach': 'ABSMIN'}
+OCCULTATION_TYPES = ('any', 'full', 'annular', 'partial')
+DEFAULT_EVENT_STEP = 600.0
+
+# Frame stream (/api/stream) settings: the allowed range of seconds
+# between updates, and how many updates' frames are computed per batch
+STREAM_DEFAULT_PERIOD = 1.0
+STREAM_MIN_PERIOD = 0.05
+STREAM_MAX_PERIOD = 60.0
+STREAM_TICKS_PER_BATCH = 16
+
+# HTTP caching of responses that only depend on the request and the
+# loaded kernels (see cacheable()): seconds clients and proxies may reuse
+# them without revalidating, and a version to bump whenever the format of
+# any of those responses changes
+CACHE_MAX_AGE = 24 * 60 * 60
+CACHE_ETAG_VERSION = 1
+
+# Longest time (seconds) a request waits for kernels that are loading in
+# the background before giving up with 503 Service Unavailable
+KERNEL_WAIT_TIMEOUT = 300.0
+
+# Config file read by load_config() and reload_config()
+CONFIG_FILEPATH = 'config/config.json'
 
 # This can be overridden by the automatic tests
 STATIC_FILES_DIRECTORY = 'dist'
 
-app = Flask(__name__)
-kernels = []
-main_subject_id = None
-main_subject_name = ''
+app = Flask(__name__)
+kernels = []
+main_subject_id = None
+main_subject_name = ''
+
+# (modification time, size) of each loaded kernel file when it was loaded,
+# for noticing replaced kernels
+kernel_signatures = {}
+
+# Held for reading while a request uses the kernel pool, and for writing
+# while reload_config() changes it
+kernel_pool_lock = kernel_loader.ReadWriteLock()
+
+# KernelLoader of the configured kernels, which may still be running in
+# the background
+config_loader = None
+
+# EphemerisCache answering frame queries, if enabled in the config
+frames_cache = None
+
+# EphemerisStore of precomputed frames, if enabled in the config and baked
+# from the loaded kernels
+frames_store = None
+
+# SpicePool of worker processes doing SPICE computations, if enabled in
+# the config
+worker_pool = None
+
+# Config sections the ephemeris cache and store were last set up from, so
+# reload_config() only rebuilds them when they change
+computation_conf = {}
+
+# Metrics served at /metrics
+METRICS = metrics.Registry()
+REQUESTS = METRICS.counter(
+    'lunah_http_requests_total', 'HTTP requests handled, by endpoint, method and status code',
+    ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = METRICS.histogram(
+    'lunah_http_request_duration_seconds', 'Time taken to handle HTTP requests, by endpoint', ('endpoint',))
+STAGE_SECONDS = METRICS.histogram(
+    'lunah_stage_duration_seconds', 'Time spent in each stage of handling requests: parse_json, utc_to_et,'
+    ' et_to_utc, compute_frames (including caches), spkez (SPICE evaluation) and serialize', ('stage',))
+FRAMES = METRICS.counter(
+    'lunah_spice_frames_total', 'Frames evaluated by SPICE, by whether there was data for them (result="valid")'
+    ' or not (result="no_data"), and frames left out without calling SPICE because they are outside the'
+    ' coverage of their target or observer (result="not_covered")', ('result',))
+SWALLOWED_ERRORS = METRICS.counter(
+    'lunah_swallowed_errors_total', 'spyce errors handled without failing the request, by error and where',
+    ('error', 'where'))
+
+
+#
+# Helper Functions
+#
+
+def load_config(conf_data=None, background=False):
+    """
+    Load the information from config/config.json into appropriate
+    global variables.
+    conf_data overrides the json data (used for automatic testing)
+    background: return right away and load the kernels (and everything
+        set up from them) on a background thread; API requests wait for
+        the kernels they need (see wait_for_kernels())
+    """
+    global main_subject_id
+    global main_subject_name
+    global config_loader
+
+    if conf_data is None:
+        conf_data = read_config()
+
+    main_subject_id = conf_data['main_subject_id']
+    main_subject_name = conf_data['main_subject_name']
+
+    config_loader = kernel_loader.KernelLoader(
+        config_kernel_filepaths(conf_data),
+        add_kernel,
+        finished=lambda: configure_computation(conf_data))
+    if background:
+        config_loader.start()
+    else:
+        config_loader.run()
+
+
+def configure_computation(conf_data, kernels_reloaded=True):
+    """
+    Set up the worker pool, ephemeris cache and ephemeris store enabled
+    in the config, for the kernels that are loaded.
+
+    kernels_reloaded: whether the kernels changed since the last call.
+        If they didn't, the cache and store are only rebuilt if their
+        config changed. A pool with the configured number of workers is
+        kept, and restarted with the new kernels if they changed.
+    """
+    global frames_cache
+    global frames_store
+    global worker_pool
+    global computation_conf
+
+    workers = conf_data.get('workers', 0)
+    kernel_paths = [os.path.abspath(k) for k in kernels]
+    if worker_pool is not None and worker_pool.workers == workers:
+        if kernels_reloaded:
+            worker_pool.restart(kernel_paths)
+    else:
+        if worker_pool is not None:
+            worker_pool.shutdown()
+            worker_pool = None
+        if workers:
+            worker_pool = spice_pool.SpicePool(kernel_paths, workers)
+
+    # kernels_changed() already emptied a cache that is kept
+    cache_conf = conf_data.get('ephemeris_cache', None)
+    if cache_conf is None:
+        frames_cache = None
+    elif frames_cache is None or cache_conf != computation_conf.get('ephemeris_cache', None):
+        frames_cache = ephemeris_cache.EphemerisCache(
+            get_coverage_windows,
+            tolerance=cache_conf.get('tolerance', 1e-3),
+            velocity_tolerance=cache_conf.get('velocity_tolerance', 1e-6),
+            max_bytes=int(cache_conf.get('max_megabytes', 64) * 1024 * 1024),
+            compute=spice_frames_batch)
+
+    store_conf = conf_data.get('ephemeris_store', None)
+    if kernels_reloaded or store_conf != computation_conf.get('ephemeris_store', None):
+        frames_store = None
+        if store_conf is not None:
+            store_path = store_conf.get('path', ephemeris_store.DEFAULT_STORE_PATH)
+            try:
+                store = ephemeris_store.EphemerisStore(
+                    store_path,
+                    tolerance=store_conf.get('tolerance', 1e-3),
+                    velocity_tolerance=store_conf.get('velocity_tolerance', 1e-6),
+                    compute=compute_cached_frames)
+            except (OSError, ValueError) as e:
+                print('[WARN]: could not open the ephemeris store:', e)
+            else:
+                if store.is_current(kernels):
+                    frames_store = store
+                else:
+                    print('[WARN]: the ephemeris store', store_path, 'was baked from other kernels, ignoring it'
+                          ' (run "python3 ephemeris_store.py bake" to update it)')
+
+    computation_conf = {'ephemeris_cache': cache_conf, 'ephemeris_store': store_conf}
+
+    # Index the kernels' coverage now rather than in the first requests.
+    # Hashing them for kernel_fingerprint() is left to the first request
+    # that needs it, since it reads every kernel file.
+    for k in kernels:
+        for obj_id in get_kernel_objects(k):
+            get_coverage_index(obj_id)
+
+
+def read_config():
+    """
+    Read and return the JSON data of config/config.json.
+    """
+    with open(CONFIG_FILEPATH, 'r', encoding='utf-8') as conf_file:
+        return json.load(conf_file)
+
+
+def config_kernel_filepaths(conf_data):
+    """
+    Return the paths of the kernel files listed in config data.
+    """
+    return [os.path.normpath('config/kernels/' + kern) for kern in conf_data['kernels']]
+
+
+def reload_config(conf_data=None):
+    """
+    Bring the loaded kernels in line with config/config.json (or
+    conf_data) without restarting the server, loading added kernels,
+    unloading removed ones and reloading kernels whose files were
+    replaced. Caches and the worker pool are reset to match.
+
+    Kernels loaded later take priority in SPICE, so every kernel after
+    the first difference from the config is unloaded and loaded again, in
+    order. This is done while holding kernel_pool_lock for writing, so
+    requests see either the old or the new kernel pool. If a new kernel
+    can't be loaded, the previous kernels are restored and the error is
+    raised.
+
+    Return {unloaded: [<file name>, ...], loaded: [<file name>, ...]}.
+    """
+    global main_subject_id
+    global main_subject_name
+
+    if conf_data is None:
+        conf_data = read_config()
+    wanted = kernel_loader.load_order(config_kernel_filepaths(conf_data))
+    if config_loader is not None:
+        config_loader.wait()
+
+    with kernel_pool_lock.writing():
+        keep = 0
+        while (keep < min(len(kernels), len(wanted)) and kernels[keep] == wanted[keep] and
+               kernel_signatures.get(kernels[keep]) == kernel_loader.file_signature(wanted[keep])):
+            keep += 1
+        old_tail = kernels[keep:]
+        new_tail = wanted[keep:]
+
+        if old_tail or new_tail:
+            for kernel_filepath in reversed(old_tail):
+                unload_kernel(kernel_filepath)
+            try:
+                for kernel_filepath in new_tail:
+                    furnish_kernel(kernel_filepath)
+            except Exception:
+                for kernel_filepath in reversed(kernels[keep:]):
+                    unload_kernel(kernel_filepath)
+                for kernel_filepath in old_tail:
+                    furnish_kernel(kernel_filepath)
+                kernels_changed()
+                raise
+            # configure_computation() restarts the pool, or replaces it
+            kernels_changed(restart_pool=False)
+
+        main_subject_id = conf_data['main_subject_id']
+        main_subject_name = conf_data['main_subject_name']
+        configure_computation(conf_data, kernels_reloaded=bool(old_tail or new_tail))
+
+    result = {
+        'unloaded': [os.path.basename(k) for k in old_tail],
+        'loaded': [os.path.basename(k) for k in new_tail],
+    }
+    print('[INFO]: reloaded kernels:', result)
+    return result
+
+
+def config_signature():
+    """
+    Return a value that changes whenever config/config.json or one of
+    the kernel files it lists is modified or replaced.
+    """
+    signature = [kernel_loader.file_signature(CONFIG_FILEPATH)]
+    try:
+        signature += [kernel_loader.file_signature(k) for k in config_kernel_filepaths(read_config())]
+    except (OSError, ValueError, KeyError):
+        pass
+    return signature
+
+
+def watch_config(period):
+    """
+    Start a background thread calling reload_config() whenever
+    config/config.json or one of its kernel files changes, checking every
+    `period` seconds.
+    """
+    def watch():
+        last_signature = config_signature()
+        while True:
+            time.sleep(period)
+            signature = config_signature()
+            if signature == last_signature:
+                continue
+            last_signature = signature
+            try:
+                reload_config()
+            except Exception as e:
+                print('[ERROR]: Unable to reload the config -', e)
+
+    threading.Thread(target=watch, name='config-watcher', daemon=True).start()
+
+
+def furnish_kernel(kernel_filepath):
+    """
+    Load a kernel file into the kernel pool, without kernels_changed().
+    """
+    spyce.add_kernel(kernel_filepath)
+    kernels.append(kernel_filepath)
+    kernel_signatures[kernel_filepath] = kernel_loader.file_signature(kernel_filepath)
+
+
+def unload_kernel(kernel_filepath):
+    """
+    Unload a kernel file from the kernel pool, without kernels_changed().
+    """
+    spyce.remove_kernel(kernel_filepath)
+    kernels.remove(kernel_filepath)
+    kernel_signatures.pop(kernel_filepath, None)
+
+
+def add_kernel(kernel_filepath):
+    """
+    Load a kernel file into the kernel pool.
+    """
+    furnish_kernel(kernel_filepath)
+    kernels_changed()
+
+
+def remove_kernel(kernel_filepath):
+    """
+    Unload a kernel file previously loaded with add_kernel().
+    """
+    unload_kernel(kernel_filepath)
+    kernels_changed()
+
+
+def kernels_changed(restart_pool=True):
+    """
+    Drop everything derived from the kernel pool. This must be called
+    whenever a kernel is loaded or unloaded.
+
+    restart_pool: whether to restart the worker pool with the new
+        kernels, which configure_computation() does when it follows
+    """
+    global frames_store
+    for cached in KERNEL_POOL_CACHES:
+        cached.cache_clear()
+    if frames_cache is not None:
+        frames_cache.clear()
+    if frames_store is not None and not frames_store.is_current(kernels):
+        print('[WARN]: the loaded kernels changed, no longer using the ephemeris store')
+        frames_store = None
+    if worker_pool is not None and restart_pool:
+        worker_pool.restart([os.path.abspath(k) for k in kernels])
+
+
+#
+# Kernel Pool Caches
+#
+# These only depend on the set of loaded kernels, so they are memoized
+# until kernels_changed() is called. Lookups that raise are not cached.
+#
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def lookup_object_name(obj_id):
+    """
+    Cached spyce.id_to_str().
+    """
+    return spyce.id_to_str(obj_id)
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def lookup_object_id(obj_name):
+    """
+    Cached spyce.str_to_id().
+    """
+    return spyce.str_to_id(obj_name)
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def lookup_frame_id(frame_name):
+    """
+    Return the ID code of a reference frame name (frame kernels can
+    define new ones), raising spyce.IDNotFoundError if it is unknown.
+    """
+    return spyce.frame_to_id(frame_name)
+
+
+@functools.lru_cache(maxsize=KERNEL_OBJECTS_CACHE_SIZE)
+def get_kernel_objects(kernel_filepath):
+    """
+    Return a tuple of the IDs of all objects in a kernel file, which is
+    empty for kernels that don't have objects (leapseconds for example).
+    """
+    try:
+        return tuple(spyce.get_objects(kernel_filepath))
+    except spyce.InternalError:
+        SWALLOWED_ERRORS.inc(error='InternalError', where='get_objects')
+        return ()
+
+
+@functools.lru_cache(maxsize=COVERAGE_CACHE_SIZE)
+def get_coverage_windows(obj_id):
+    """
+    Return the coverage windows of the object with the given ID across
+    all kernels, as a sorted tuple of non-overlapping (start, end) tuples
+    in ET.
+    """
+    windows_piecewise = []
+    for k in kernels:
+        if obj_id not in get_kernel_objects(k):
+            continue
+        try:
+            windows_piecewise += spyce.get_coverage_windows(k, obj_id)
+        except spyce.InternalError:
+            # Object does not exist in this kernel.
+            SWALLOWED_ERRORS.inc(error='InternalError', where='get_coverage_windows')
+    windows_piecewise.sort()
+
+    # Merge windows that overlap across kernels
+    merged = []
+    for start, end in windows_piecewise:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+@functools.lru_cache(maxsize=COVERAGE_CACHE_SIZE)
+def get_coverage_index(obj_id):
+    """
+    Return the coverage windows of an object as a (starts, ends) pair of
+    sorted arrays, for binary searches by covered_mask(). The returned
+    arrays must not be modified.
+    """
+    windows = numpy.array(get_coverage_windows(obj_id), dtype=numpy.float64).reshape(-1, 2)
+    return windows[:, 0].copy(), windows[:, 1].copy()
+
+
+@functools.lru_cache(maxsize=TRAIL_CACHE_SIZE)
+def get_trail_samples(obj_id, observer_id, start_et, end_et, tolerances, max_step, min_step,
+                      ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    Cached trajectory_lod.adaptive_sample() of an object's trajectory,
+    since every client asks for the same trails. The returned arrays
+    must not be modified.
+    """
+    return trajectory_lod.adaptive_sample(
+        lambda ets: compute_frames(obj_id, observer_id, ets, ref_frame, abcorr),
+        start_et, end_et, tolerances, max_step, min_step, MAX_SAMPLED_TIMES)
+
+
+@functools.lru_cache(maxsize=EVENTS_CACHE_SIZE)
+def find_distance_events(target_id, observer_id, relate, distance, windows, step, abcorr):
+    """
+    Cached spyce.find_distance_windows(), with the windows as a tuple.
+    """
+    with STAGE_SECONDS.time(stage='event_search'):
+        return tuple(spyce.find_distance_windows(target_id, observer_id, relate, distance, windows, step, abcorr))
+
+
+@functools.lru_cache(maxsize=EVENTS_CACHE_SIZE)
+def find_occultation_events(occultation_type, front_id, back_id, observer_id, windows, step, abcorr):
+    """
+    Cached spyce.find_occultation_windows(), with the windows as a tuple.
+    """
+    with STAGE_SECONDS.time(stage='event_search'):
+        return tuple(spyce.find_occultation_windows(occultation_type, front_id, back_id, observer_id,
+                                                    windows, step, abcorr))
+
+
+@functools.lru_cache(maxsize=1)
+def kernel_fingerprint():
+    """
+    Return a hex string identifying the set of loaded kernels by content
+    (the SHA-256 of each kernel file, in load order), which stays the
+    same across restarts and servers with identical kernels.
+
+    This reads every kernel file the first time, so it is only computed
+    when a request needs it. File hashes are memoized by size and
+    modification time, so after a reload only changed kernels are read
+    again. Callers must hold kernel_pool_lock.
+    """
+    digest = hashlib.sha256()
+    for k in kernels:
+        digest.update(ephemeris_store.file_sha256(k).encode('ascii'))
+    return digest.hexdigest()
+
+
+KERNEL_POOL_CACHES = (lookup_object_name, lookup_object_id, lookup_frame_id, get_kernel_objects,
+                      get_coverage_windows, get_coverage_index, get_trail_samples, find_distance_events, find_occultation_events,
+                      kernel_fingerprint)
+
+
+def cache_stats():
+    """
+    Return a dict of hit/miss counters for every cache, keyed by name.
+    """
+    stats = {cached.__name__: cached.cache_info()._asdict() for cached in KERNEL_POOL_CACHES}
+    if frames_cache is not None:
+        stats['ephemeris_cache'] = {
+            'hits': frames_cache.hits,
+            'misses': frames_cache.misses,
+            'bytes': frames_cache.nbytes,
+            'maxbytes': frames_cache.max_bytes,
+        }
+    if frames_store is not None:
+        stats['ephemeris_store'] = {
+            'hits': frames_store.hits,
+            'misses': frames_store.misses,
+        }
+    return stats
+
+
+def count_frames(valid):
+    """
+    Count the frames SPICE evaluated, from the mask it returned.
+    """
+    found = int(numpy.count_nonzero(valid))
+    FRAMES.inc(found, result='valid')
+    FRAMES.inc(valid.size - found, result='no_data')
+
+
+@METRICS.collector
+def collect_spyce_stats():
+    """
+    Metric families for the counters kept by spyce itself (see
+    spyce.get_stats()). Worker pool processes keep their own, which
+    aren't included.
+    """
+    stats = sorted(spyce.get_stats().items())
+    label = lambda function: [('function', function)]
+    return [
+        ('lunah_spyce_calls_total', 'counter', 'Calls to spyce batch functions',
+         [('lunah_spyce_calls_total', label(f), s['calls']) for f, s in stats]),
+        ('lunah_spyce_items_total', 'counter',
+         'Times (or target/time pairs, or event search windows) evaluated by spyce batch functions',
+         [('lunah_spyce_items_total', label(f), s['items']) for f, s in stats]),
+        ('lunah_spyce_seconds_total', 'counter', 'Time spent evaluating spyce batch functions',
+         [('lunah_spyce_seconds_total', label(f), s['seconds']) for f, s in stats]),
+        ('lunah_spyce_swallowed_errors_total', 'counter',
+         'CSPICE errors spyce batch functions reported through their masks, by the exception they would have raised',
+         [('lunah_spyce_swallowed_errors_total', label(f) + [('error', e)], n)
+          for f, s in stats for e, n in sorted(s['errors'].items())]),
+    ]
+
+
+def parse_request_json():
+    """
+    request.get_json(), timed as the parse_json stage.
+    """
+    with STAGE_SECONDS.time(stage='parse_json'):
+        return request.get_json()
+
+
+def spice_frames_batch(target_id, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    spyce.get_frames_batch(), run in the worker pool if it is enabled.
+    """
+    with STAGE_SECONDS.time(stage='spkez'):
+        if worker_pool is not None:
+            states, valid = worker_pool.get_frames_batch(target_id, observer_id, ets, ref_frame, abcorr)
+        else:
+            states, valid = spyce.get_frames_batch(target_id, observer_id, ets, ref_frame, abcorr)
+    count_frames(valid)
+    return states, valid
+
+
+def covered_mask(obj_id, ets):
+    """
+    Return a boolean array of whether each ET time is within one of an
+    object's coverage windows, found by binary search in its coverage
+    index. Objects without SPK coverage of their own (such as the solar
+    system barycenter, which is only ever the center of other objects)
+    are taken to be covered at every time.
+    """
+    starts, ends = get_coverage_index(obj_id)
+    if not len(starts):
+        return numpy.ones(len(ets), dtype=bool)
+    window = numpy.searchsorted(starts, ets, side='right') - 1
+    return (window >= 0) & (ets <= ends[numpy.maximum(window, 0)])
+
+
+def compute_frames(target_id, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    Compute the state of a target relative to an observer at an array of
+    ET times, in the given reference frame and with the given aberration
+    correction. Return the (states, valid) pair described for
+    spyce.get_frames_batch, answered from the ephemeris store or cache if
+    they are enabled (for DEFAULT_FRAME and DEFAULT_ABCORR only).
+
+    Times outside the coverage of the target or observer are invalid
+    without being evaluated, since SPICE would only fail for them.
+    """
+    with STAGE_SECONDS.time(stage='compute_frames'):
+        ets = numpy.asarray(ets, dtype=numpy.float64)
+        covered = covered_mask(target_id, ets)
+        if target_id != observer_id:
+            covered &= covered_mask(observer_id, ets)
+        if covered.all():
+            return compute_covered_frames(target_id, observer_id, ets, ref_frame, abcorr)
+
+        FRAMES.inc(int(len(ets) - numpy.count_nonzero(covered)), result='not_covered')
+        states = numpy.zeros((len(ets), 6))
+        valid = numpy.zeros(len(ets), dtype=bool)
+        if covered.any():
+            states[covered], valid[covered] = compute_covered_frames(target_id, observer_id, ets[covered],
+                                                                     ref_frame, abcorr)
+        return states, valid
+
+
+def compute_covered_frames(target_id, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    compute_frames(), for times that are all covered.
+    """
+    if (ref_frame, abcorr) != (DEFAULT_FRAME, DEFAULT_ABCORR):
+        return spice_frames_batch(target_id, observer_id, ets, ref_frame, abcorr)
+    if frames_store is not None:
+        return frames_store.get_frames_batch(target_id, observer_id, ets)
+    return compute_cached_frames(target_id, observer_id, ets)
+
+
+def compute_cached_frames(target_id, observer_id, ets):
+    """
+    compute_frames(), without the ephemeris store.
+    """
+    if frames_cache is not None:
+        return frames_cache.get_frames_batch(target_id, observer_id, ets)
+    return spice_frames_batch(target_id, observer_id, ets)
+
+
+def spice_frames_multi(target_ids, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    spyce.get_frames_multi(), run in the worker pool if it is enabled.
+    """
+    with STAGE_SECONDS.time(stage='spkez'):
+        if worker_pool is not None:
+            states, valid = worker_pool.get_frames_multi(target_ids, observer_id, ets, ref_frame, abcorr)
+        else:
+            states, valid = spyce.get_frames_multi(target_ids, observer_id, ets, ref_frame, abcorr)
+    count_frames(valid)
+    return states, valid
+
+
+def compute_frames_multi(target_ids, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    Compute the states of several targets relative to one observer at an
+    array of ET times, in the given reference frame and with the given
+    aberration correction. Return the (states, valid) pair described for
+    spyce.get_frames_multi, answered from the ephemeris store or cache if
+    they are enabled (for DEFAULT_FRAME and DEFAULT_ABCORR only).
+
+    As for compute_frames(), times outside the coverage of the observer or
+    of every target are invalid without being evaluated.
+    """
+    with STAGE_SECONDS.time(stage='compute_frames'):
+        ets = numpy.asarray(ets, dtype=numpy.float64)
+        covered = covered_mask(observer_id, ets)
+        if target_ids and observer_id not in target_ids:
+            covered &= numpy.logical_or.reduce([covered_mask(t, ets) for t in target_ids])
+        if covered.all():
+            return compute_covered_frames_multi(target_ids, observer_id, ets, ref_frame, abcorr)
+
+        FRAMES.inc(int(len(target_ids) * (len(ets) - numpy.count_nonzero(covered))), result='not_covered')
+        states = numpy.zeros((len(target_ids), len(ets), 6))
+        valid = numpy.zeros((len(target_ids), len(ets)), dtype=bool)
+        if covered.any():
+            states[:, covered], valid[:, covered] = compute_covered_frames_multi(target_ids, observer_id, ets[covered],
+                                                                                 ref_frame, abcorr)
+        return states, valid
+
+
+def compute_covered_frames_multi(target_ids, observer_id, ets, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR):
+    """
+    compute_frames_multi(), for times that are all covered.
+    """
+    if (ref_frame, abcorr) != (DEFAULT_FRAME, DEFAULT_ABCORR):
+        return spice_frames_multi(target_ids, observer_id, ets, ref_frame, abcorr)
+    if frames_store is not None:
+        return frames_store.get_frames_multi(target_ids, observer_id, ets)
+    if frames_cache is not None:
+        return frames_cache.get_frames_multi(target_ids, observer_id, ets)
+    return spice_frames_multi(target_ids, observer_id, ets)
+
+
+def get_object(identifier):
+    """
+    Look up the object with the given ID (int or str) or name (str), and
+    return a dict containing its ID and name, as
+    {'id': id, 'name': name}
+
+    Abort with a 404 if no such object can be found.
+    """
+    obj_name = None
+    obj_id = None
+    try:
+        obj_id = int(identifier)
+    except ValueError:
+        obj_name = identifier
+
+    if obj_id == main_subject_id or obj_name == main_subject_name or obj_name == 'main':
+        return {'id': main_subject_id, 'name': main_subject_name}
+    else:
+        try:
+            if obj_id:
+                obj_name = lookup_object_name(obj_id)
+            else:
+                obj_id = lookup_object_id(obj_name)
+            return {'id': obj_id, 'name': obj_name}
+        except spyce.InternalError:
+            abort(404, 'SPICE object not found.')
+        except spyce.IDNotFoundError:
+            abort(404, 'SPICE object not found.')
+
+
+def strip_utc_suffix(utc_time):
+    """
+    utc_to_et requires UTC strings but will not accept them if they are
+    appended with the letter 'Z' (indicating UTC) despite this being part
+    of the ISO 8601 spec. Return the string with the letter removed if it
+    exists.
+    """
+    return utc_time[:-1] if utc_time.endswith('Z') else utc_time
+
+
+def parse_time_range(req_json):
+    """
+    Return the (start, end) ET times given by the "start" and "end"
+    members of a request body.
+
+    Abort with a 400 if they are missing or malformed.
+    """
+    start = req_json.get('start', None)
+    end = req_json.get('end', None)
+    if not isinstance(start, str) or not isinstance(end, str):
+        abort(400, 'start and end must be time strings')
+    try:
+        (start_et, end_et), valid = utc_to_et_array([strip_utc_suffix(start), strip_utc_suffix(end)])
+    except spyce.InvalidArgumentError:
+        abort(400, 'Invalid time string')
+    if not valid.all():
+        abort(500)
+    if end_et < start_et:
+        abort(400, 'end is before start')
+    return start_et, end_et
+
+
+def clip_windows(windows, start_et, end_et):
+    """
+    Return the parts of sorted, non-overlapping (start, end) windows that
+    are between start_et and end_et, as a tuple.
+    """
+    return tuple((max(start, start_et), min(end, end_et)) for start, end in windows
+                 if start <= end_et and end >= start_et)
+
+
+def sample_time_range(req_json):
+    """
+    Build the array of ET times described by the "start", "end" and
+    either "step" (in seconds) or "count" members of a request body.
+
+    With "step", the times are start, start + step, ... followed by end
+    itself. With "count", the times are evenly spaced from start to end
+    inclusive.
+
+    Abort with a 400 if the description is malformed.
+    """
+    start_et, end_et = parse_time_range(req_json)
+
+    step = req_json.get('step', None)
+    count = req_json.get('count', None)
+    if (step is None) == (count is None):
+        abort(400, 'Exactly one of step or count is required')
+
+    if step is not None:
+        if not is_positive_number(step):
+            abort(400, 'step must be a positive number of seconds')
+        num_steps = int((end_et - start_et) // step) + 1
+        if num_steps >= MAX_SAMPLED_TIMES:
+            abort(400, 'Too many times requested')
+        times = start_et + step * numpy.arange(num_steps, dtype=numpy.float64)
+        if times[-1] < end_et:
+            times = numpy.append(times, end_et)
+    else:
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            abort(400, 'count must be a positive integer')
+        if count > MAX_SAMPLED_TIMES:
+            abort(400, 'Too many times requested')
+        times = numpy.linspace(start_et, end_et, count)
+    return times
+
+
+def utc_to_et_array(utc_times):
+    """
+    Convert a list of UTC strings to ET in a single spyce call, and
+    return the (ets, valid) arrays from spyce.utc_to_et_batch.
+
+    Raise spyce.InvalidArgumentError if any of the strings is malformed.
+    Strings that fail to convert for any other reason are only flagged
+    in `valid`.
+    """
+    with STAGE_SECONDS.time(stage='utc_to_et'):
+        ets, valid = spyce.utc_to_et_batch(utc_times)
+    # The batch call only reports *that* a conversion failed, so redo the
+    # (rare) failed ones individually to find out why.
+    for i in numpy.flatnonzero(~valid):
+        try:
+            spyce.utc_to_et(utc_times[i])
+        except spyce.InternalError:
+            SWALLOWED_ERRORS.inc(error='InternalError', where='utc_to_et')
+            print('[WARN]: unknown error parsing date: ', utc_times[i])
+    return ets, valid
+
+
+def et_to_utc_array(ets, format='ISOC'):
+    """
+    Convert an array of ET times to UTC strings in a single spyce call,
+    and return the (utc_times, valid) pair from spyce.et_to_utc_batch.
+
+    Raise spyce.InvalidArgumentError if any of the times is
+    inappropriate. Times that fail to convert for any other reason are
+    only flagged in `valid`.
+    """
+    with STAGE_SECONDS.time(stage='et_to_utc'):
+        utc_times, valid = spyce.et_to_utc_batch(ets, format)
+    for i in numpy.flatnonzero(~valid):
+        try:
+            spyce.et_to_utc(float(ets[i]), format)
+        except spyce.InternalError:
+            SWALLOWED_ERRORS.inc(error='InternalError', where='et_to_utc')
+            print('[WARN]: unknown error converting time: ', ets[i])
+    return utc_times, valid
+
+
+def parse_frame_options(req_json):
+    """
+    Return the reference frame and aberration correction asked for by a
+    frames request (its "frame" and "abcorr" members, or DEFAULT_FRAME
+    and DEFAULT_ABCORR), in upper case.
+
+    Abort with a 400 if the frame isn't known to the loaded kernels, or
+    the correction isn't one of ABERRATION_CORRECTIONS.
+    """
+    ref_frame = req_json.get('frame', DEFAULT_FRAME)
+    abcorr = req_json.get('abcorr', DEFAULT_ABCORR)
+    if not isinstance(ref_frame, str) or not isinstance(abcorr, str):
+        abort(400, 'frame and abcorr must be strings')
+
+    ref_frame = ref_frame.strip().upper()
+    abcorr = abcorr.replace(' ', '').upper()
+    if abcorr not in ABERRATION_CORRECTIONS:
+        abort(400, 'abcorr must be one of ' + ', '.join(ABERRATION_CORRECTIONS))
+    try:
+        lookup_frame_id(ref_frame)
+    except spyce.IDNotFoundError:
+        abort(400, 'Unknown reference frame')
+    return ref_frame, abcorr
+
+
+def with_light_times(states):
+    """
+    Append each state's one-way light time between observer and target
+    (in seconds) as an extra column.
+
+    The light time SPICE uses for its corrections is the length of the
+    (corrected) position over the speed of light, so it is derived from
+    the states here, which also works for states answered from the
+    ephemeris store and cache.
+    """
+    light_times = numpy.linalg.norm(states[..., :3], axis=-1) / CLIGHT
+    return numpy.concatenate([states, light_times[..., numpy.newaxis]], axis=-1)
+
+
+def frames_format():
+    """
+    Return the format the current frames request asked for, "json",
+    "binary" or "ndjson", either with a "format" query parameter or
+    through its Accept header.
+    """
+    response_format = request.args.get('format', None)
+    if response_format is None:
+        best = request.accept_mimetypes.best_match(['application/json', BINARY_FRAMES_MIMETYPE, NDJSON_MIMETYPE])
+        return {BINARY_FRAMES_MIMETYPE: 'binary', NDJSON_MIMETYPE: 'ndjson'}.get(best, 'json')
+    if response_format not in ('json', 'binary', 'ndjson'):
+        abort(400, 'format must be json, binary or ndjson')
+    return response_format
+
+
+def binary_frames_response(ets, states, levels=None):
+    """
+    Pack ET times and their state vectors into a binary frames response
+    (see BINARY_FRAMES_HEADER). The state columns are float64 unless the
+    request's "dtype" query parameter asks for float32. Trails add a
+    column of `levels` after the state columns.
+    """
+    dtype = BINARY_FRAMES_DTYPES.get(request.args.get('dtype', 'float64'), None)
+    if dtype is None:
+        abort(400, 'dtype must be float64 or float32')
+
+    with STAGE_SECONDS.time(stage='serialize'):
+        if levels is not None:
+            states = numpy.column_stack([states, levels])
+        columns = numpy.ascontiguousarray(states.T, dtype=dtype)
+        header = BINARY_FRAMES_HEADER.pack(
+            BINARY_FRAMES_MAGIC,
+            BINARY_FRAMES_VERSION,
+            columns.itemsize,
+            len(ets),
+            1 + len(columns))
+        body = header + ets.astype('<f8').tobytes() + columns.tobytes()
+    return app.response_class(body, mimetype=BINARY_FRAMES_MIMETYPE)
+
+
+def iter_frame_chunks(ets, compute, to_items, hold_lock):
+    """
+    Compute the frames at `ets` FRAMES_CHUNK_SIZE epochs at a time, and
+    generate the list of response items of each chunk.
+
+    compute: function(ets) returning (states, valid), like compute_frames()
+    to_items: function(offset, ets, states, valid) returning the items of
+        the chunk starting at index `offset` of `ets`
+    hold_lock: whether to hold kernel_pool_lock for each chunk, for when
+        they are generated after the request itself has been handled (as
+        for streamed responses)
+    """
+    for offset in range(0, len(ets), FRAMES_CHUNK_SIZE):
+        chunk = ets[offset:offset + FRAMES_CHUNK_SIZE]
+        with kernel_pool_lock.reading() if hold_lock else contextlib.nullcontext():
+            states, valid = compute(chunk)
+            items = to_items(offset, chunk, states, valid)
+        yield items
+
+
+def serialize_json_chunks(chunks, ndjson, prefix='', suffix=''):
+    """
+    Serialize lists of items into the text of a JSON array (between
+    `prefix` and `suffix`), or with ndjson, into one JSON value per line,
+    generating one piece of text per list.
+    """
+    yield prefix if ndjson else prefix + '['
+    first = True
+    for items in chunks:
+        if not items:
+            continue
+        with STAGE_SECONDS.time(stage='serialize'):
+            if ndjson:
+                text = ''.join(app.json.dumps(item, separators=(',', ':')) + '\n' for item in items)
+            else:
+                text = app.json.dumps(items, separators=(',', ':'))[1:-1]
+                if not first:
+                    text = ',' + text
+        first = False
+        yield text
+    yield suffix if ndjson else ']' + suffix
+
+
+def frames_json_response(ets, compute, to_items, ndjson):
+    """
+    Return the JSON (or NDJSON) response of a frames request at `ets`
+    (see iter_frame_chunks()). Only one chunk of frames is held in memory
+    at a time: responses of more than one chunk are streamed, and written
+    out as they are computed.
+    """
+    streamed = len(ets) > FRAMES_CHUNK_SIZE
+    body = serialize_json_chunks(iter_frame_chunks(ets, compute, to_items, streamed), ndjson)
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    if streamed:
+        return app.response_class(body, mimetype=mimetype)
+    return app.response_class(''.join(body) + '\n', mimetype=mimetype)
+
+
+def stream_frames(targets, observer, start_et, end_et, rate, period, ref_frame=DEFAULT_FRAME, abcorr=DEFAULT_ABCORR,
+                  pacing=None):
+    """
+    Generate the server-sent events of a frame stream (see
+    get_frame_stream()).
+
+    targets: list of (key, NAIF ID) pairs
+    end_et: ET after which the stream ends, or None
+    pacing: the async server's pacing dict (see
+        async_server.PACING_ENVIRON_KEY), or None to sleep between events
+    """
+    started = time.monotonic()
+    tick = 0
+    while True:
+        # Update times are fixed in advance, so the frames of several
+        # updates are computed together
+        ets = start_et + rate * period * numpy.arange(tick, tick + STREAM_TICKS_PER_BATCH, dtype=numpy.float64)
+        if end_et is not None:
+            ets = ets[ets <= end_et]
+        with kernel_pool_lock.reading():
+            states, valid = compute_frames_multi([obj_id for _, obj_id in targets], observer, ets, ref_frame, abcorr)
+            updates = multi_frames_to_dicts(targets, ets, states, valid)
+
+        for i, update in enumerate(updates):
+            send_at = started + (tick + i) * period
+            if pacing is not None:
+                pacing['send_at'] = send_at
+            elif send_at > time.monotonic():
+                time.sleep(send_at - time.monotonic())
+            yield 'data: ' + json.dumps(update) + '\n\n'
 
+        if len(ets) < STREAM_TICKS_PER_BATCH:
+            yield 'event: end\ndata: {}\n\n'
+            return
+        tick += STREAM_TICKS_PER_BATCH
 
-#
-# Helper Functions
-#
 
-def load_config(conf_data=None):
+def is_positive_number(value):
     """
-    Load the information from config/config.json into appropriate
-    global variables.
-    conf_data overrides the json data (used for automatic testing)
+    Return whether a value from a JSON request body is a number > 0.
     """
-    global main_subject_id
-    global main_subject_name
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and value > 0
 
-    if conf_data is None:
-        with open('config/config.json', 'r', encoding='utf-8') as conf_file:
-            conf_data = json.load(conf_file)
 
-    for kern in conf_data['kernels']:
-        kernel_filepath = os.path.normpath('config/kernels/' + kern)
-        spyce.add_kernel(kernel_filepath)
-        kernels.append(kernel_filepath)
+def request_body(list_fields=(), number_fields=(), bool_fields=()):
+    """
+    Return the parameters of a request that can be either a POST with a
+    JSON body, or a GET with the same parameters in its query string.
 
-    main_subject_id = conf_data['main_subject_id']
-    main_subject_name = conf_data['main_subject_name']
+    Query parameters are converted to what the JSON body would hold:
+    list_fields may be repeated or comma separated, number_fields are
+    parsed as numbers (including the items of list fields), and
+    bool_fields are false if they are "false" or "0". The format and
+    dtype parameters are left out, since they aren't part of the body.
 
+    Abort with a 400 if a POST has no JSON body or a number is malformed.
+    """
+    if request.method != 'GET':
+        req_json = parse_request_json()
+        if req_json == None:
+            abort(400, 'Missing json request body')
+        return req_json
 
-def get_object(identifier):
+    def to_number(key, value):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            abort(400, key + ' must be a number')
+
+    body = {}
+    for key in request.args:
+        if key in ('format', 'dtype'):
+            continue
+        values = request.args.getlist(key)
+        if key in list_fields:
+            value = [item for v in values for item in v.split(',') if item]
+            if key in number_fields:
+                value = [to_number(key, item) for item in value]
+        else:
+            value = values[-1]
+            if key in number_fields:
+                value = to_number(key, value)
+            elif key in bool_fields:
+                value = value.lower() not in ('false', '0')
+        body[key] = value
+    return body
+
+
+def cacheable(view=None, formats=False):
     """
-    Look up the object with the given ID (int or str) or name (str), and
-    return a dict containing its ID and name, as
-    {'id': id, 'name': name}
+    Decorator for routes whose GET responses only depend on the request
+    and the loaded kernels. Successful responses get a strong ETag derived
+    from kernel_fingerprint() and the request (path, query parameters,
+    negotiated format and content coding), and may be cached for CACHE_MAX_AGE seconds. A
+    request whose If-None-Match holds the current ETag is answered with a
+    304 without being recomputed.
 
-    Abort with a 404 if no such object can be found.
+    Routes answering in several formats (see frames_format()) are
+    decorated with @cacheable(formats=True); other routes ignore the
+    format parameter and Accept header.
     """
-    obj_name = None
-    obj_id = None
-    try:
-        obj_id = int(identifier)
-    except ValueError:
-        obj_name = identifier
+    if view is None:
+        return functools.partial(cacheable, formats=formats)
 
-    if obj_id == main_subject_id or obj_name == main_subject_name or obj_name == 'main':
-        return {'id': main_subject_id, 'name': main_subject_name}
-    else:
-        try:
-            if obj_id:
-                obj_name = spyce.id_to_str(obj_id)
-            else:
-                obj_id = spyce.str_to_id(obj_name)
-            return {'id': obj_id, 'name': obj_name}
-        except spyce.InternalError:
-            abort(404, 'SPICE object not found.')
-        except spyce.IDNotFoundError:
-            abort(404, 'SPICE object not found.')
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        key = json.dumps([CACHE_ETAG_VERSION, kernel_fingerprint(), main_subject_id, request.path,
+                          sorted(request.args.items(multi=True)), frames_format() if formats else None,
+                          compression.choose_encoding(request.accept_encodings)])
+        etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_MAX_AGE
+        if formats:
+            response.vary.add('Accept')
+        response.vary.add('Accept-Encoding')
+        return response
+    return wrapper
 
 
-def frame_to_dict(frame):
+def frame_to_dict(state):
     """
-    Return a dict containing the frame's x/y/z/dx/dy/dz attributes.
+    Return a dict containing the x/y/z/dx/dy/dz components of a state
+    vector (one row of the array returned by spyce.get_frames_batch),
+    and its light time if with_light_times() added one.
     """
-    return {
-        'x': frame.x,
-        'y': frame.y,
-        'z': frame.z,
-        'dx': frame.dx,
-        'dy': frame.dy,
-        'dz': frame.dz
+    return dict(zip(FRAME_FIELDS + (LIGHT_TIME_FIELD,), state))
+
+
+def multi_frames_to_dicts(targets, ets, states, valid):
+    """
+    Turn the (states, valid) arrays returned by compute_frames_multi()
+    (possibly with_light_times()) into one dict per time:
+    {
+        et: <float>,
+        date: <ISO_8601 string>,
+        frames: {<target key>: frame dict or None, ...}
     }
 
+    targets: list of (key, NAIF ID) pairs, in the order of `states`
+    """
+    utc_times, _ = et_to_utc_array(ets, 'ISOC')
+    states = states.tolist()
+    valid = valid.tolist()
+
+    updates = []
+    for i, (et, utc) in enumerate(zip(ets.tolist(), utc_times)):
+        frames = {}
+        for k, (key, _) in enumerate(targets):
+            frames[key] = frame_to_dict(states[k][i]) if valid[k][i] else None
+        updates.append({'et': et, 'date': utc, 'frames': frames})
+    return updates
+
 
 #
 # API Endpoints
 #
 
+@app.before_request
+def start_request_timer():
+    """
+    Note when a request started, for REQUEST_SECONDS.
+    """
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """
+    Count a handled request and how long it took, by URL rule (so that
+    object names and file paths don't each get their own series).
+    Streamed responses are counted once their headers are ready.
+    """
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    start = g.get('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Compress successful API responses (see COMPRESSED_MIMETYPES) with the
+    best content coding the client accepts: gzip, or brotli if it is
+    installed. Streamed responses are compressed chunk by chunk as they
+    are sent.
+    """
+    if not request.path.startswith('/api/') or response.status_code != 200:
+        return response
+    if response.mimetype not in COMPRESSED_MIMETYPES or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compression.compress_chunks(response.iter_encoded(), encoding)
+    else:
+        data = response.get_data()
+        if len(data) < compression.MIN_COMPRESSED_SIZE:
+            return response
+        response.set_data(compression.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@app.before_request
+def wait_for_kernels():
+    """
+    While the configured kernels are loading in the background, hold API
+    requests until the kernels they need are loaded: the text kernels for
+    time conversions, and every kernel for anything else.
+    """
+    if config_loader is None or config_loader.ready:
+        return
+    if not request.path.startswith('/api/') or request.path == '/api/status':
+        return
+
+    needed = None
+    if request.path.startswith('/api/convert/'):
+        needed = [k for k in config_loader.kernel_filepaths if kernel_loader.is_text_kernel(k)]
+    if not config_loader.wait(needed, KERNEL_WAIT_TIMEOUT):
+        abort(503, 'Kernels are still loading')
+
+
+@app.before_request
+def hold_kernel_pool():
+    """
+    Hold kernel_pool_lock for reading while an API request is handled, so
+    a kernel reload can't happen halfway through it. Frame streams take
+    the lock for each batch of frames instead, since they never end.
+    """
+    if not request.path.startswith('/api/'):
+        return
+    if request.path in ('/api/status', '/api/stream') or request.path.startswith('/api/admin/'):
+        return
+    kernel_pool_lock.acquire_read()
+    g.holds_kernel_pool = True
+
+
+@app.teardown_request
+def release_kernel_pool(exception=None):
+    """
+    Release the lock taken by hold_kernel_pool().
+    """
+    if g.pop('holds_kernel_pool', False):
+        kernel_pool_lock.release_read()
+
+
 @app.route('/')
 def root():
     """
@@ -104,22 +1316,108 @@ def get_file(filename):
 
 
 @app.route('/api/objects', methods=['GET'])
+@cacheable
 def get_all_objects():
     """
     Return an array of all available SPICE objects (as ID/name dicts)
     """
     jsonResponse = []
     for k in kernels:
-        try:
-            for obj_id in spyce.get_objects(k):
-                jsonResponse.append(get_object(obj_id))
-        except spyce.InternalError:
-            #Happens when trying get_objects on kernels that don't have objects: leapseconds for example
-            pass
+        for obj_id in get_kernel_objects(k):
+            jsonResponse.append(get_object(obj_id))
     return jsonify(jsonResponse)
 
 
+@app.route('/api/status', methods=['GET'])
+def get_status():
+    """
+    Return whether the server has finished loading its kernels, and how
+    long each one took (this is answered even while they are loading):
+    {
+        ready: <bool>,
+        seconds: <total load time, or null while loading>,
+        kernels: [
+            {
+                file: <kernel file name>,
+                bytes: <file size>,
+                seconds: <load time, or null if not loaded yet>,
+                status: <"pending", "loading", "loaded" or "failed">
+            },
+            ...
+        ],
+        fingerprint: <kernel_fingerprint(), or null while loading>
+    }
+    in the order the kernels are loaded.
+    """
+    if config_loader is None:
+        return jsonify({'ready': False, 'seconds': None, 'kernels': [], 'fingerprint': None})
+    fingerprint = None
+    if config_loader.ready:
+        with kernel_pool_lock.reading():
+            fingerprint = kernel_fingerprint()
+    return jsonify({
+        'ready': config_loader.ready,
+        'seconds': config_loader.seconds,
+        'kernels': config_loader.report(),
+        'fingerprint': fingerprint,
+    })
+
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Reload the kernels listed in config/config.json (see reload_config()),
+    and return the kernels that were unloaded and loaded:
+    {
+        unloaded: [<kernel file name>, ...],
+        loaded: [<kernel file name>, ...]
+    }
+
+    This endpoint only exists if the ADMIN_TOKEN environment variable is
+    set, and the request must have an "Authorization: Bearer <token>"
+    header with that token.
+    """
+    token = os.getenv('ADMIN_TOKEN', '')
+    if not token:
+        abort(404)
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode('utf-8'), ('Bearer ' + token).encode('utf-8')):
+        abort(403)
+
+    try:
+        return jsonify(reload_config())
+    except (OSError, ValueError, KeyError) as e:
+        abort(500, 'Unable to read the config: ' + str(e))
+    except spyce.InternalError as e:
+        abort(500, 'Unable to load the new kernels, the previous ones are still loaded: ' + str(e))
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Return the server's metrics (see METRICS) in the Prometheus text
+    exposition format.
+    """
+    return app.response_class(METRICS.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Return the hit/miss counters of the server's caches:
+    {
+        <cache name>: {
+            hits: <int>,
+            misses: <int>,
+            ...
+        }
+    }
+    """
+    return jsonify(cache_stats())
+
+
 @app.route('/api/objects/<object_identifier>', methods=['GET'])
+@cacheable
 def handle_get_object_request(object_identifier):
     """
     Return the ID/name dict for a single specified object
@@ -128,48 +1426,199 @@ def handle_get_object_request(object_identifier):
 
 
 @app.route('/api/objects/<object_identifier>/coverage', methods=['GET'])
+@cacheable
 def get_coverage_window(object_identifier):
     """
-    Return the coverage window for the specified object:
+    Return the coverage window for the specified object, and the windows
+    it is made of (between which there is no data), sorted by time:
     {
         start: <ISO_8601 string>,
         end: <ISO_8601 string>,
+        windows: [
+            {
+                start: <ISO_8601 string>,
+                end: <ISO_8601 string>,
+                start_et: <float>,
+                end_et: <float>
+            }
+        ]
     }
     """
 
     NAIF_id = get_object(object_identifier)['id']
-    windows_piecewise = []
-    for k in kernels:
-        try:
-            windows_piecewise += spyce.get_coverage_windows(k, NAIF_id)
-            windows_piecewise.sort(key=lambda x: x[0])
-        except spyce.InternalError:
-            # Object does not exist in this kernel.
-            pass
+    windows_piecewise = get_coverage_windows(NAIF_id)
     if len(windows_piecewise) > 0:
+        utc_times, _ = et_to_utc_array(numpy.array(windows_piecewise, dtype=numpy.float64).reshape(-1))
         return jsonify({
-            'start': spyce.et_to_utc(windows_piecewise[0][0], 'ISOC'),
-            'end': spyce.et_to_utc(windows_piecewise[-1][1], 'ISOC')
+            'start': utc_times[0],
+            'end': utc_times[-1],
+            'windows': [{'start': start, 'end': end, 'start_et': start_et, 'end_et': end_et}
+                        for (start_et, end_et), start, end
+                        in zip(windows_piecewise, utc_times[0::2], utc_times[1::2])],
         })
     else:
         abort(404, "No Coverage found")
 
 
-@app.route('/api/objects/<object_identifier>/frames', methods=['POST'])
+@app.route('/api/objects/<object_identifier>/events', methods=['GET', 'POST'])
+@cacheable
+def get_events(object_identifier):
+    """
+    Find every event of a kind involving the specified object over its
+    coverage (or the part of it between start and end), in a single
+    search by the SPICE geometry finder.
+
+    Request body:
+    {
+        type: <string: one of EVENT_TYPES>,
+        start: <ISO_8601 string>, (optional, with end)
+        end: <ISO_8601 string>, (optional, with start)
+        step: <float: seconds>, (optional, DEFAULT_EVENT_STEP)
+        abcorr: (optional, as for frames, without stellar aberration
+                 for occultations and eclipses)
+        ...
+    }
+    and depending on the type:
+      - periapsis, apoapsis: local minima/maxima of the distance to
+        observer (int or string: NAIF ID or name, default Earth)
+      - closest_approach: the minimum distance to observer
+      - distance: times when the distance to observer is relate ("<",
+        ">" or "=") distance <float: km>
+      - occultation: times when the object is hidden by occulter (ID or
+        name, required) as seen from observer (default Earth)
+      - eclipse: times when the Sun is hidden by occulter (default Earth)
+        as seen from the object
+    and for occultations and eclipses, occultation_type ("any" (default),
+    "full", "annular" or "partial").
+
+    The same parameters can be given in the query string of a GET
+    request instead, which can be cached.
+
+    Response: the events sorted by time. Instants (periapsis, apoapsis,
+    closest_approach) have start == end, and the distance at that time.
+    {
+        type: <string>,
+        events: [
+            {
+                start: <ISO_8601 string>,
+                end: <ISO_8601 string>,
+                start_et: <float>,
+                end_et: <float>,
+                distance: <float: km> (instants only)
+            }
+        ]
+    }
+    """
+    obj_id = get_object(object_identifier)['id']
+    req_json = request_body(number_fields=('step', 'distance'))
+
+    event_type = req_json.get('type', None)
+    if event_type not in EVENT_TYPES:
+        abort(400, 'type must be one of ' + ', '.join(EVENT_TYPES))
+    _, abcorr = parse_frame_options(req_json)
+
+    step = req_json.get('step', DEFAULT_EVENT_STEP)
+    if not is_positive_number(step):
+        abort(400, 'step must be a positive number of seconds')
+
+    windows = get_coverage_windows(obj_id)
+    if 'start' in req_json or 'end' in req_json:
+        windows = clip_windows(windows, *parse_time_range(req_json))
+    if not windows:
+        abort(404, 'No Coverage found')
+    if sum(end - start for start, end in windows) / step >= MAX_SAMPLED_TIMES:
+        abort(400, 'Too many times requested')
+
+    try:
+        if event_type in ('occultation', 'eclipse'):
+            if '+S' in abcorr:
+                abort(400, 'abcorr must not correct for stellar aberration')
+            occultation_type = req_json.get('occultation_type', 'any')
+            if occultation_type not in OCCULTATION_TYPES:
+                abort(400, 'occultation_type must be one of ' + ', '.join(OCCULTATION_TYPES))
+            if event_type == 'occultation':
+                if 'occulter' not in req_json:
+                    abort(400, 'occulter param missing')
+                front = get_object(req_json['occulter'])['id']
+                back, observer = obj_id, get_object(req_json.get('observer', EARTH))['id']
+            else:
+                front = get_object(req_json.get('occulter', EARTH))['id']
+                back, observer = SUN, obj_id
+            found = find_occultation_events(occultation_type.upper(), front, back, observer, windows, step, abcorr)
+        else:
+            observer = get_object(req_json.get('observer', EARTH))['id']
+            relate, distance = DISTANCE_EVENT_RELATIONS.get(event_type, None), 0.0
+            if event_type == 'distance':
+                relate, distance = req_json.get('relate', None), req_json.get('distance', None)
+                if relate not in ('<', '>', '='):
+                    abort(400, 'relate must be one of <, > or =')
+                if not is_positive_number(distance):
+                    abort(400, 'distance must be a positive number of km')
+            found = find_distance_events(obj_id, observer, relate, float(distance), windows, step, abcorr)
+    except spyce.InvalidArgumentError as e:
+        abort(400, str(e))
+    except spyce.InsufficientDataError:
+        abort(404, 'Insufficient data for the search')
+
+    events = [{'start_et': start, 'end_et': end} for start, end in found]
+    if found:
+        ets = numpy.array(found, dtype=numpy.float64).reshape(-1)
+        utc_times, _ = et_to_utc_array(ets)
+        for event, start, end in zip(events, utc_times[0::2], utc_times[1::2]):
+            event['start'], event['end'] = start, end
+    if found and event_type in DISTANCE_EVENT_RELATIONS:
+        states, valid = compute_frames(obj_id, observer, ets[0::2], DEFAULT_FRAME, abcorr)
+        distances = numpy.linalg.norm(states[:, :3], axis=1)
+        for event, distance, ok in zip(events, distances.tolist(), valid.tolist()):
+            event['distance'] = distance if ok else None
+    return jsonify({'type': event_type, 'events': events})
+
+
+@app.route('/api/objects/<object_identifier>/frames', methods=['GET', 'POST'])
+@cacheable(formats=True)
 def get_frame_data(object_identifier):
     """
     Get the frame data for the specified objects at the provided times.
 
-    Request body:
+    Request body, either with an explicit list of times:
     {
         times: array of <ISO_8601 strings>,
         observer: (int or string: NAIF ID or NAIF name),
     }
+    or with a time range for the server to sample:
+    {
+        start: <ISO_8601 string>,
+        end: <ISO_8601 string>,
+        step: <float: seconds between samples>,  (or count: <int>)
+        dates: <bool, optional: include date strings, default true>,
+        observer: (int or string: NAIF ID or NAIF name),
+    }
+    Both forms also accept these optional members:
+    {
+        frame: <reference frame name, default "J2000">,
+        abcorr: <aberration correction, default "NONE">,
+        light_time: <bool: add each frame's light time, default false>,
+    }
+
+    The same parameters can be given in the query string of a GET
+    request instead (times repeated or comma separated), which can be
+    cached (see cacheable()).
 
-    Response: array of frame data objects:
+    Query parameters (optional):
+        format: "json" (default), "binary" or "ndjson"; an Accept header
+            of application/octet-stream or application/x-ndjson also
+            selects "binary" or "ndjson"
+        dtype: "float64" (default) or "float32", for the binary format
+
+    Response: array of frame data objects ("et" is only present when
+    sampling a range, and "date" is left out if "dates" is false), the
+    same objects one per line for "ndjson", or the packed columns
+    described by BINARY_FRAMES_HEADER. JSON responses of more than
+    FRAMES_CHUNK_SIZE times are streamed as they are computed:
     [
         {
             date: <ISO_8601 string>,
+            et: <float>,
             frame: {
                 x: <float>,
                 y: <float>,
@@ -177,72 +1626,349 @@ def get_frame_data(object_identifier):
                 dx: <float>,
                 dy: <float>,
                 dz: <float>,
+                lt: <float: seconds, only if light_time is true>,
             }
         }
     ]
     """
     obj_id = get_object(object_identifier)['id']
-    req_json = request.get_json()
-    utc_times = req_json.get('times', None)
-    if utc_times == None or not isinstance(utc_times, list):
+    req_json = request_body(list_fields=('times',), number_fields=('step', 'count'),
+                            bool_fields=('dates', 'light_time'))
+    observer = get_object(req_json.get('observer', EARTH))['id']
+    ref_frame, abcorr = parse_frame_options(req_json)
+    compute = frames_computation(obj_id, observer, ref_frame, abcorr, req_json.get('light_time', False))
+
+    if 'times' not in req_json:
+        return get_sampled_frame_data(compute, req_json)
+
+    utc_times = req_json['times']
+    if not isinstance(utc_times, list):
+        abort(400, 'Invalid Argument')
+    if not all(isinstance(t, str) for t in utc_times):
         abort(400, 'Invalid Argument')
 
-    times_in_J2000 = {}
-    for t in utc_times:
-        #to handle empty strings
-        if not len(t):
-            continue
+    # Empty strings and duplicates are ignored.
+    utc_times = list(dict.fromkeys(strip_utc_suffix(t) for t in utc_times if t))
+    try:
+        ets, times_valid = utc_to_et_array(utc_times)
+    except spyce.InvalidArgumentError:
+        abort(400, 'Invalid time string')
+    utc_times = [t for t, ok in zip(utc_times, times_valid.tolist()) if ok]
 
-        #utc_to_et requires UTC strings but will not accept them if they
-        # are appended with the letter 'Z'(indicating UTC) despite this being part of the ISO 8601 spec
-        # we remove the letter if it exists
-        t = t[:-1] if t[-1] == 'Z' else t
-        try:
-            J2000time = spyce.utc_to_et(t)
-            times_in_J2000[t] = J2000time
-        except spyce.InvalidArgumentError:
-            abort(400, 'Invalid time strinet')
-        except spyce.InternalError:
-            print('[WARN]: unknown error parsing date: ', t)
+    ets = ets[times_valid]
+    response_format = frames_format()
+    if response_format == 'binary':
+        states, valid = compute(ets)
+        return binary_frames_response(ets[valid], states[valid])
+
+    # Epochs the object has no data for (not in this kernel or at this
+    # time) are flagged in `valid` and left out of the response.
+    def to_items(offset, ets, states, valid):
+        return [{'date': utc, 'frame': frame_to_dict(state)}
+                for utc, state, ok in zip(utc_times[offset:offset + len(ets)], states.tolist(), valid.tolist())
+                if ok]
+
+    return frames_json_response(ets, compute, to_items, response_format == 'ndjson')
+
+
+def frames_computation(obj_id, observer, ref_frame, abcorr, light_time):
+    """
+    Return a function computing the (states, valid) arrays of a frames
+    request at an array of ETs, with light times if it asked for them.
+    """
+    def compute(ets):
+        states, valid = compute_frames(obj_id, observer, ets, ref_frame, abcorr)
+        if light_time:
+            states = with_light_times(states)
+        return states, valid
+    return compute
+
+
+def get_sampled_frame_data(compute, req_json):
+    """
+    Handle a frames request that gives a time range rather than a list
+    of times (see get_frame_data()).
+    """
+    ets = sample_time_range(req_json)
+    response_format = frames_format()
+    if response_format == 'binary':
+        states, valid = compute(ets)
+        return binary_frames_response(ets[valid], states[valid])
+
+    dates = req_json.get('dates', True)
+
+    def to_items(offset, ets, states, valid):
+        ets = ets[valid]
+        frames = [{'et': et, 'frame': frame_to_dict(state)} for et, state in zip(ets.tolist(), states[valid].tolist())]
+        if dates:
+            utc_times, _ = et_to_utc_array(ets, 'ISOC')
+            for frame, utc in zip(frames, utc_times):
+                frame['date'] = utc
+        return frames
+
+    return frames_json_response(ets, compute, to_items, response_format == 'ndjson')
+
+
+@app.route('/api/objects/<object_identifier>/trail', methods=['GET', 'POST'])
+@cacheable(formats=True)
+def get_trail(object_identifier):
+    """
+    Get an adaptively sampled trail of the specified object over a time
+    range, with only the points needed to draw it as a polyline within
+    each of several tolerances (levels of detail).
+
+    Request body:
+    {
+        start: <ISO_8601 string>,
+        end: <ISO_8601 string>,
+        observer: (int or string: NAIF ID or NAIF name),
+        tolerances: array of <float: km>, (optional)
+        max_step: <float: seconds>, (optional)
+        min_step: <float: seconds>, (optional)
+        frame, abcorr, light_time: (optional, as for frames)
+    }
+
+    The same parameters can be given in the query string of a GET
+    request instead (tolerances comma separated), which can be cached.
+
+    Query parameters (optional): format ("json" or "binary") and dtype,
+    as for frames.
+
+    Response: the tolerances sorted from coarsest (level 0) to finest,
+    and the trail's points sorted by time, each with the coarsest level
+    it is part of; or the binary frames format with an extra "level"
+    column:
+    {
+        tolerances: array of <floats>,
+        frames: [
+            {
+                et: <float>,
+                level: <int>,
+                frame: {x, y, z, dx, dy, dz, lt (if light_time is true)}
+            }
+        ]
+    }
+    """
+    obj_id = get_object(object_identifier)['id']
+    req_json = request_body(list_fields=('tolerances',), number_fields=('tolerances', 'max_step', 'min_step'),
+                            bool_fields=('light_time',))
+    observer = get_object(req_json.get('observer', EARTH))['id']
+    ref_frame, abcorr = parse_frame_options(req_json)
+    start_et, end_et = parse_time_range(req_json)
+
+    tolerances = req_json.get('tolerances', list(trajectory_lod.DEFAULT_TOLERANCES))
+    if not isinstance(tolerances, list) or not tolerances or not all(is_positive_number(t) for t in tolerances):
+        abort(400, 'tolerances must be an array of positive numbers')
+    tolerances = tuple(sorted(set(tolerances), reverse=True))
+
+    max_step = req_json.get('max_step', trajectory_lod.DEFAULT_MAX_STEP)
+    min_step = req_json.get('min_step', trajectory_lod.DEFAULT_MIN_STEP)
+    if not is_positive_number(max_step) or not is_positive_number(min_step) or min_step > max_step:
+        abort(400, 'max_step and min_step must be positive numbers of seconds, with min_step <= max_step')
+    if (end_et - start_et) / max_step >= MAX_SAMPLED_TIMES:
+        abort(400, 'Too many times requested')
+
+    response_format = frames_format()
+    if response_format == 'ndjson':
+        abort(400, 'format must be json or binary')
+
+    ets, states, levels = get_trail_samples(obj_id, observer, start_et, end_et, tolerances, max_step, min_step,
+                                            ref_frame, abcorr)
+    if req_json.get('light_time', False):
+        states = with_light_times(states)
+
+    if response_format == 'binary':
+        return binary_frames_response(ets, states, levels)
+
+    # The samples are already computed, so only their serialization is
+    # done in chunks
+    def chunks():
+        for offset in range(0, len(ets), FRAMES_CHUNK_SIZE):
+            end = offset + FRAMES_CHUNK_SIZE
+            yield [{'et': et, 'level': level, 'frame': frame_to_dict(state)}
+                   for et, level, state in zip(ets[offset:end].tolist(), levels[offset:end].tolist(),
+                                               states[offset:end].tolist())]
+
+    body = serialize_json_chunks(chunks(), False, '{"frames":', ',"tolerances":' + json.dumps(tolerances) + '}')
+    if len(ets) > FRAMES_CHUNK_SIZE:
+        return app.response_class(body, mimetype='application/json')
+    return app.response_class(''.join(body) + '\n', mimetype='application/json')
+
+
+@app.route('/api/frames', methods=['POST'])
+def get_multi_frame_data():
+    """
+    Get the frame data for several objects at once, relative to the same
+    observer and at the same times.
+
+    Request body, with either an explicit list of times or a time range
+    (as for /api/objects/<id>/frames):
+    {
+        targets: array of (int or string: NAIF ID or NAIF name),
+        observer: (int or string: NAIF ID or NAIF name),
+        times: array of <ISO_8601 strings>,
+        (or start, end, and step or count)
+        frame, abcorr, light_time: (optional, as for
+            /api/objects/<id>/frames)
+    }
+
+    Query parameters (optional):
+        format: "json" (default) or "ndjson", for one entry per line
+
+    Response: array with one entry per time, sorted by time (streamed
+    if there are more than FRAMES_CHUNK_SIZE times):
+    [
+        {
+            et: <float>,
+            date: <ISO_8601 string>,
+            frames: {
+                <target as given in "targets">: {x, y, z, dx, dy, dz} or
+                    null if it has no data at this time,
+                ...
+            }
+        }
+    ]
+    """
+    req_json = parse_request_json()
+    if req_json == None:
+        abort(400, 'Missing json request body')
+
+    identifiers = req_json.get('targets', None)
+    if not isinstance(identifiers, list) or not identifiers:
+        abort(400, 'targets must be a non-empty array')
+    if not all(isinstance(t, (int, str)) and not isinstance(t, bool) for t in identifiers):
+        abort(400, 'Invalid Argument')
+    targets = [(str(t), get_object(t)['id']) for t in dict.fromkeys(identifiers)]
     observer = get_object(req_json.get('observer', EARTH))['id']
-    frames = []
+    ref_frame, abcorr = parse_frame_options(req_json)
+    light_time = req_json.get('light_time', False)
 
-    for utc, J2000 in times_in_J2000.items():
+    if 'times' in req_json:
+        utc_times = req_json['times']
+        if not isinstance(utc_times, list) or not all(isinstance(t, str) for t in utc_times):
+            abort(400, 'Invalid Argument')
+        utc_times = list(dict.fromkeys(strip_utc_suffix(t) for t in utc_times if t))
         try:
-            frame = frame_to_dict(spyce.get_frame_data(obj_id, observer, J2000))
-            frames.append({
-                'date': utc,
-                'frame': frame
-            })
-        except (spyce.InternalError, spyce.InsufficientDataError):
-            #object not found in this kernel or at this time.
-            pass
-    return jsonify(frames)
+            ets, valid = utc_to_et_array(utc_times)
+        except spyce.InvalidArgumentError:
+            abort(400, 'Invalid time string')
+        ets = numpy.sort(ets[valid])
+    else:
+        ets = sample_time_range(req_json)
+
+    target_ids = [obj_id for _, obj_id in targets]
+
+    def compute(ets):
+        states, valid = compute_frames_multi(target_ids, observer, ets, ref_frame, abcorr)
+        if light_time:
+            states = with_light_times(states)
+        return states, valid
+
+    return frames_json_response(ets, compute,
+                                lambda offset, ets, states, valid: multi_frames_to_dicts(targets, ets, states, valid),
+                                frames_format() == 'ndjson')
+
+
+@app.route('/api/stream', methods=['GET'])
+def get_frame_stream():
+    """
+    Stream the frames of several objects as server-sent events, instead
+    of having the client poll for them every tick.
+
+    Query parameters:
+        objects: comma-separated NAIF IDs or names
+        observer: NAIF ID or name (optional, default Earth)
+        start: <ISO_8601 string>, the time of the first update
+        end: <ISO_8601 string> (optional), the stream ends after it
+        rate: <float, optional>: simulation seconds per second, default 1
+        period: <float, optional>: seconds between updates, default 1
+        frame, abcorr: reference frame and aberration correction
+            (optional, as for /api/objects/<id>/frames)
+
+    Each event's data:
+    {
+        et: <float>,
+        date: <ISO_8601 string>,
+        frames: {
+            <object as given in "objects">: {x, y, z, dx, dy, dz} or
+                null if it has no data at this time,
+            ...
+        }
+    }
+    followed by an "end" event once past the end time.
+    """
+    args = request.args
+    identifiers = [o for o in args.get('objects', '').split(',') if o]
+    if not identifiers:
+        abort(400, 'objects param missing')
+    targets = [(o, get_object(o)['id']) for o in dict.fromkeys(identifiers)]
+    observer = get_object(args.get('observer', EARTH))['id']
+    ref_frame, abcorr = parse_frame_options(args)
+
+    try:
+        rate = float(args.get('rate', 1))
+        period = float(args.get('period', STREAM_DEFAULT_PERIOD))
+    except ValueError:
+        abort(400, 'rate and period must be numbers')
+    if not rate >= 0 or not STREAM_MIN_PERIOD <= period <= STREAM_MAX_PERIOD:
+        abort(400, 'rate or period out of range')
+
+    if 'start' not in args:
+        abort(400, 'start param missing')
+    utc_times = [strip_utc_suffix(args['start'])]
+    if 'end' in args:
+        utc_times.append(strip_utc_suffix(args['end']))
+    try:
+        ets, valid = utc_to_et_array(utc_times)
+    except spyce.InvalidArgumentError:
+        abort(400, 'Invalid time string')
+    if not valid.all():
+        abort(500)
+    end_et = ets[1] if len(ets) > 1 else None
+
+    return app.response_class(
+        stream_frames(targets, observer, ets[0], end_et, rate, period, ref_frame, abcorr,
+                      request.environ.get(async_server.PACING_ENVIRON_KEY)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/convert/et', methods=['POST'])
 def toJ2000():
     """
-    Convert a time from UTC to ET (J2000).
+    Convert a time (or an array of times) from UTC to ET (J2000).
 
     Request body:
     {
-        utc_time: <ISO_8601 string>,
+        utc_time: <ISO_8601 string> or array of <ISO_8601 strings>,
     }
 
-    Response:
+    Response (with arrays in place of single values if an array was
+    given):
     {
         UTC: <ISO_8601 string>,
         J2000: <float>,
     }
     """
-    req_json = request.get_json()
+    req_json = parse_request_json()
     if req_json == None:
         abort(400, 'Missing json request body')
     time = req_json.get("utc_time", None)
     if time == None:
         abort(400, 'utc_time param missing')
 
+    if isinstance(time, list):
+        try:
+            ets, valid = utc_to_et_array([str(t) for t in time])
+        except spyce.InvalidArgumentError:
+            abort(400, 'Invalid Time String')
+        if not valid.all():
+            abort(500)
+        return jsonify({
+            'UTC': time,
+            'J2000': ets.tolist()
+        })
+
     try:
         return jsonify({
             'UTC': time,
@@ -257,26 +1983,45 @@ def toJ2000():
 @app.route('/api/convert/utc', methods=['POST'])
 def toUTC():
     """
-    Convert a time from ET (J2000) to UTC.
+    Convert a time (or an array of times) from ET (J2000) to UTC.
 
     Request body:
     {
-        et_time: <float>,
+        et_time: <float> or array of <floats>,
     }
 
-    Response:
+    Response (with arrays in place of single values if an array was
+    given):
     {
         UTC: <ISO_8601 string>,
         J2000: <float>,
     }
     """
-    req_json = request.get_json()
+    req_json = parse_request_json()
     if req_json == None:
         abort(400, 'missing json request body')
     time = req_json.get("et_time", None)
     if time == None:
         abort(400, 'et_time field missing')
 
+    if isinstance(time, list):
+        try:
+            ets = numpy.array(time, dtype=numpy.float64)
+        except (ValueError, TypeError):
+            abort(400, 'et_time param malformed')
+        if ets.ndim != 1:
+            abort(400, 'et_time param malformed')
+        try:
+            utc_times, valid = et_to_utc_array(ets, 'ISOC')
+        except spyce.InvalidArgumentError:
+            abort(400, 'J2000 value is inappropriate.')
+        if not valid.all():
+            abort(500)
+        return jsonify({
+            'UTC': utc_times,
+            'J2000': ets.tolist()
+        })
+
     try:
         float(time)
     except ValueError:
@@ -297,11 +2042,25 @@ def toUTC():
 
 if __name__ == '__main__':
     try:
-        load_config()
+        # KERNEL_LOADING=background starts serving before the kernels are
+        # loaded, instead of after
+        load_config(background=os.getenv('KERNEL_LOADING', 'startup') == 'background')
     except Exception as e:
         print ('[ERROR]: Unable to load config')
 
+    # KERNEL_WATCH_PERIOD=<seconds> reloads the kernels whenever the
+    # config or a kernel file changes
+    watch_period = os.getenv('KERNEL_WATCH_PERIOD', None)
+    if watch_period:
+        watch_config(float(watch_period))
+
     port = os.getenv('PORT', 5000)
     host = '0.0.0.0'
 
-    app.run(host=host, port=port)
+    if os.getenv('SERVER_MODE', 'flask') == 'async':
+        threads = os.getenv('THREADS', None)
+        async_server.serve(app, host, port, int(threads) if threads else None)
+    else:
+        # spyce serializes access to CSPICE, so requests can safely be
+        # handled on several threads
+        app.run(host=host, port=port, threaded=True)
@@ -0,0 +1,339 @@
+import asyncio
+import collections
+import concurrent.futures
+import io
+import sys
+import time
+
+
+# Requests to paths ending in one of these are coalesced
+COALESCED_PATH_SUFFIXES = ('/frames', '/trail', '/events')
+
+# Request headers that can change a coalesced response, and so are part of
+# the key identical requests are matched on
+COALESCE_KEY_HEADERS = (b'accept', b'accept-encoding', b'if-none-match')
+
+# Environ key of the dict a streaming response can set 'send_at' in (a
+# time.monotonic() time) before yielding a chunk, to have the chunk sent
+# at that time instead of sleeping in its thread until then
+PACING_ENVIRON_KEY = 'lunah.pacing'
+
+
+#
+# Helper Functions
+#
+
+async def read_body(receive):
+    """
+    Read the whole body of an ASGI HTTP request.
+    """
+    body = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        body.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(body)
+
+
+async def wait_for_disconnect(receive):
+    """
+    Wait until the client of an ASGI HTTP request disconnects, once its
+    body has been read.
+    """
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def build_environ(scope, body):
+    """
+    Build a WSGI environ dict for an ASGI HTTP request.
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def start_wsgi(wsgi_app, environ):
+    """
+    Call a WSGI app, returning (status code, ASGI headers, iterable).
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    iterable = wsgi_app(environ, start_response)
+    return response['status'], response['headers'], iterable
+
+
+class SharedResponse:
+    """
+    Response of one WSGI call, sent to every client that asked for it as
+    its chunks are produced.
+
+    Clients can join until the first chunk is produced, so each chunk is
+    only kept until every client has sent it, and a response streamed in
+    many chunks is never held whole.
+    """
+
+    def __init__(self):
+        self.status = None
+        self.headers = None
+        self.error = None
+        self.done = False
+        self.readers = 0
+        # [chunk, number of readers yet to send it], from chunk number `_first`
+        self._chunks = collections.deque()
+        self._first = 0
+        self._updated = asyncio.get_running_loop().create_future()
+
+    def _notify(self):
+        self._updated.set_result(None)
+        self._updated = asyncio.get_running_loop().create_future()
+
+    def start(self, status, headers):
+        self.status = status
+        self.headers = headers
+        self._notify()
+
+    def append(self, chunk):
+        self._chunks.append([chunk, self.readers])
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _release(self, index):
+        """
+        Record that a reader is done with chunk number `index`, dropping
+        the chunks every reader is done with.
+        """
+        self._chunks[index - self._first][1] -= 1
+        while self._chunks and self._chunks[0][1] <= 0:
+            self._chunks.popleft()
+            self._first += 1
+
+    async def send_to(self, send):
+        """
+        Send the response to an ASGI client, as it is produced.
+        """
+        self.readers += 1
+        index = self._first + len(self._chunks)
+        try:
+            # Waiting is shielded, so a client disconnecting doesn't
+            # cancel the others' wait
+            while self.status is None and not self.done:
+                await asyncio.shield(self._updated)
+            if self.status is None:
+                raise self.error
+
+            await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+            while True:
+                while index < self._first + len(self._chunks):
+                    chunk = self._chunks[index - self._first][0]
+                    self._release(index)
+                    index += 1
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if self.done:
+                    break
+                await asyncio.shield(self._updated)
+            if self.error is not None:
+                raise self.error
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            self.readers -= 1
+            while index < self._first + len(self._chunks):
+                self._release(index)
+                index += 1
+
+
+#
+# ASGI App
+#
+
+class AsyncWSGIApp:
+    """
+    ASGI app serving a WSGI app (the Flask server) from an asyncio event
+    loop, with every call into the WSGI app dispatched to `executor`.
+
+    Identical frames requests (same method, path, query, body and
+    relevant headers) that arrive while one is already being computed
+    don't start another computation; they join the one in flight and
+    all get its response, chunk by chunk as it is streamed. Many viewers
+    tick at the same rate and ask for the same objects at the same
+    epochs, so this collapses most of the load into one SPICE call per
+    distinct request.
+    """
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+        self.in_flight = {}
+        self.coalesced = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = await read_body(receive)
+        environ = build_environ(scope, body)
+
+        if scope['path'].endswith(COALESCED_PATH_SUFFIXES):
+            await self.coalesced_call(scope, body, environ, send)
+        else:
+            await self.streamed_call(environ, receive, send)
+
+    async def lifespan(self, receive, send):
+        """
+        Answer ASGI lifespan events. There is nothing to set up or tear
+        down besides the executor, which is owned by the caller.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def coalesced_call(self, scope, body, environ, send):
+        """
+        Run a WSGI call, sharing it with identical requests already in
+        flight, and send its response as it is produced.
+        """
+        headers = dict(scope['headers'])
+        key = (scope['method'], scope['path'], scope['query_string'], body,
+               tuple(headers.get(h, b'') for h in COALESCE_KEY_HEADERS))
+
+        shared = self.in_flight.get(key, None)
+        if shared is None:
+            shared = SharedResponse()
+            self.in_flight[key] = shared
+            # The call doesn't belong to this client, so that it goes on
+            # if this one disconnects
+            asyncio.ensure_future(self.produce(key, shared, environ))
+        else:
+            self.coalesced += 1
+        await shared.send_to(send)
+
+    def stop_coalescing(self, key, shared):
+        """
+        Start identical requests over from now on, rather than joining
+        `shared`.
+        """
+        if self.in_flight.get(key, None) is shared:
+            del self.in_flight[key]
+
+    async def produce(self, key, shared, environ):
+        """
+        Run the WSGI call of a SharedResponse, until it is done or none of
+        its clients are left.
+        """
+        loop = asyncio.get_running_loop()
+        error = None
+        try:
+            status, headers, iterable = await loop.run_in_executor(
+                self.executor, start_wsgi, self.wsgi_app, environ)
+            shared.start(status, headers)
+
+            iterator = iter(iterable)
+            try:
+                while shared.readers:
+                    chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        # Requests joining later would need every chunk kept
+                        self.stop_coalescing(key, shared)
+                        shared.append(chunk)
+            finally:
+                self.stop_coalescing(key, shared)
+                if hasattr(iterable, 'close'):
+                    await loop.run_in_executor(self.executor, iterable.close)
+        except Exception as e:
+            error = e
+        finally:
+            self.stop_coalescing(key, shared)
+            shared.finish(error)
+
+    async def streamed_call(self, environ, receive, send):
+        """
+        Run a WSGI call, sending its response chunks as they are produced
+        (so streaming endpoints keep working).
+
+        Chunks paced through PACING_ENVIRON_KEY are held back on the event
+        loop, so a long-lived stream only takes a thread while its next
+        chunk is computed. The response is stopped, and its iterable
+        closed, as soon as the client disconnects.
+        """
+        loop = asyncio.get_running_loop()
+        pacing = environ[PACING_ENVIRON_KEY] = {}
+        status, headers, iterable = await loop.run_in_executor(
+            self.executor, start_wsgi, self.wsgi_app, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        iterator = iter(iterable)
+        try:
+            while True:
+                # A chunk being computed can't be interrupted, the iterable
+                # is only closed once it is done
+                chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+                if chunk is None or disconnected.done():
+                    break
+                send_at = pacing.pop('send_at', None)
+                if send_at is not None and send_at > time.monotonic():
+                    await asyncio.wait([disconnected], timeout=send_at - time.monotonic())
+                    if disconnected.done():
+                        break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(self.executor, iterable.close)
+
+
+def serve(wsgi_app, host, port, threads=None):
+    """
+    Serve a WSGI app with uvicorn's asyncio event loop, running the app
+    itself on a pool of `threads` threads.
+    """
+    import uvicorn
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        uvicorn.run(AsyncWSGIApp(wsgi_app, executor), host=host, port=int(port))
@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import json
+import os, os.path
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy
+
+import FlaskServer
+import spyce
+
+
+#
+# Constants
+#
+
+CONFIG_KERNELS = pathlib.Path('config/kernels').resolve()
+STATIC_FOLDER = pathlib.Path('tests_static').resolve()
+
+KERNEL_FILES = [
+    STATIC_FOLDER / 'latest_leapseconds.tls',
+    STATIC_FOLDER / 'de430.bsp',
+    STATIC_FOLDER / 'apollo15-1.bsp',
+    STATIC_FOLDER / 'apollo_naif_ids.tf',
+]
+
+BENCHMARK_CONFIG = {
+    # Paths relative to "config/kernels", as in the real config
+    'kernels': [os.path.relpath(k, CONFIG_KERNELS) for k in KERNEL_FILES],
+    'main_subject_id': -915,
+    'main_subject_name': 'APOLLO15',
+}
+
+APOLLO15_INT_ID = -915
+EARTH_INT_ID = 399
+
+# Trail-sized inputs
+EPOCH_COUNTS = (10, 1000, 100000)
+
+# Calling spyce once per epoch is slow, so those benchmarks stop here
+MAX_SINGLE_CALL_COUNT = 10000
+
+
+#
+# Helper Functions
+#
+
+def apollo_epochs(count):
+    """
+    Return `count` ETs spread over Apollo 15's first coverage window.
+    """
+    start, end = spyce.get_coverage_windows(str(STATIC_FOLDER / 'apollo15-1.bsp'), APOLLO15_INT_ID)[0]
+    return numpy.linspace(start, end, count)
+
+
+def run_benchmark(function, repeat):
+    """
+    Call `function` once to warm up and then `repeat` times, and return
+    the list of durations in seconds.
+    """
+    function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summarize(durations, items):
+    """
+    Return the JSON summary of a benchmark's durations.
+    """
+    median = statistics.median(durations)
+    return {
+        'items': items,
+        'repeat': len(durations),
+        'min': min(durations),
+        'median': median,
+        'mean': statistics.mean(durations),
+        'per_item': median / items,
+    }
+
+
+def git_commit():
+    """
+    Return the current git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+#
+# Benchmarks
+#
+# Each returns a list of (name, items, function) to time.
+#
+
+def spyce_frame_benchmarks():
+    benchmarks = []
+    for count in EPOCH_COUNTS:
+        ets = apollo_epochs(count)
+        if count <= MAX_SINGLE_CALL_COUNT:
+            benchmarks.append(('spyce.get_frame_data[{}]'.format(count), count,
+                               lambda ets=ets: [spyce.get_frame_data(APOLLO15_INT_ID, EARTH_INT_ID, float(et)) for et in ets]))
+        benchmarks.append(('spyce.get_frames_batch[{}]'.format(count), count,
+                           lambda ets=ets: spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)))
+    return benchmarks
+
+
+def spyce_time_benchmarks():
+    benchmarks = []
+    for count in EPOCH_COUNTS:
+        utc_times, _ = spyce.et_to_utc_batch(apollo_epochs(count), 'ISOC')
+        if count <= MAX_SINGLE_CALL_COUNT:
+            benchmarks.append(('spyce.utc_to_et[{}]'.format(count), count,
+                               lambda utc_times=utc_times: [spyce.utc_to_et(t) for t in utc_times]))
+        benchmarks.append(('spyce.utc_to_et_batch[{}]'.format(count), count,
+                           lambda utc_times=utc_times: spyce.utc_to_et_batch(utc_times)))
+    return benchmarks
+
+
+def spyce_kernel_benchmarks():
+    kernel_filepaths = [str(k) for k in KERNEL_FILES if k.suffix == '.bsp']
+
+    def scan_objects():
+        for k in kernel_filepaths:
+            spyce.get_objects(k)
+
+    def scan_coverage():
+        for k in kernel_filepaths:
+            for obj_id in spyce.get_objects(k):
+                spyce.get_coverage_windows(k, obj_id)
+
+    objects = sum(len(spyce.get_objects(k)) for k in kernel_filepaths)
+    return [
+        ('spyce.get_objects[all kernels]', len(kernel_filepaths), scan_objects),
+        ('spyce.get_coverage_windows[all objects]', objects, scan_coverage),
+    ]
+
+
+def http_frames_benchmarks():
+    client = FlaskServer.app.test_client()
+    url = '/api/objects/{}/frames'.format(APOLLO15_INT_ID)
+
+    def post(body, **kwargs):
+        response = client.post(url, json=body, **kwargs)
+        assert response.status_code == 200, response.status
+        return response.get_data()
+
+    benchmarks = []
+    for count in EPOCH_COUNTS:
+        ets = apollo_epochs(count)
+        utc_times, _ = spyce.et_to_utc_batch(ets, 'ISOC')
+        range_body = {'start': utc_times[0], 'end': utc_times[-1], 'count': count}
+        benchmarks += [
+            ('http.frames.times[{}]'.format(count), count,
+             lambda body={'times': utc_times}: post(body)),
+            ('http.frames.range[{}]'.format(count), count,
+             lambda body=range_body: post(body)),
+            ('http.frames.range.binary[{}]'.format(count), count,
+             lambda body=range_body: post(body, headers={'Accept': FlaskServer.BINARY_FRAMES_MIMETYPE})),
+        ]
+    return benchmarks
+
+
+BENCHMARK_GROUPS = [
+    spyce_frame_benchmarks,
+    spyce_time_benchmarks,
+    spyce_kernel_benchmarks,
+    http_frames_benchmarks,
+]
+
+
+#
+# Command Line
+#
+
+def compare(results, baseline, threshold):
+    """
+    Print how each benchmark's median changed against a baseline results
+    dict, and return the names of those slower than threshold times it.
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline['results'].get(name, None)
+        if old is None:
+            print('{:45} {:>12.6f} s   (new)'.format(name, result['median']))
+            continue
+        ratio = result['median'] / old['median']
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print('{:45} {:>12.6f} s   x{:.2f}{}'.format(name, result['median'], ratio, flag))
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    """
+    python3 benchmarks.py [--output results.json] [--repeat 5] [--only NAME]
+    python3 benchmarks.py --compare baseline.json [--threshold 1.25]
+
+    Run every benchmark `repeat` times (after one warm-up run) and write
+    the results as JSON, so runs can be compared between builds:
+    {
+        meta: {python, platform, machine, commit, time},
+        results: {
+            <name>: {
+                items: <epochs (or calls) per run>,
+                repeat: <int>,
+                min: <seconds>,
+                median: <seconds>,
+                mean: <seconds>,
+                per_item: <median seconds per item>
+            },
+            ...
+        }
+    }
+    With --compare, the median of every benchmark is compared with a
+    previous results file, and the exit status is 1 if any got slower
+    than --threshold times the baseline.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark spyce and the HTTP API.')
+    parser.add_argument('--output', default=None, help='write the JSON results to this file (default: stdout)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--only', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--compare', default=None, help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio counted as a regression by --compare')
+    args = parser.parse_args(argv)
+
+    # Progress and the server's own messages go to stderr, so stdout is
+    # only the JSON results
+    results = {}
+    with contextlib.redirect_stdout(sys.stderr):
+        FlaskServer.load_config(BENCHMARK_CONFIG)
+        for group in BENCHMARK_GROUPS:
+            for name, items, function in group():
+                if args.only and args.only not in name:
+                    continue
+                results[name] = summarize(run_benchmark(function, args.repeat), items)
+                print('[INFO]: {:45} {:>12.6f} s'.format(name, results[name]['median']))
+
+    output = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    elif not args.compare:
+        json.dump(output, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
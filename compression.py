@@ -0,0 +1,68 @@
+import zlib
+
+# Brotli is optional: without it, responses are only offered with gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Responses smaller than this (in bytes) aren't worth compressing
+MIN_COMPRESSED_SIZE = 1024
+
+# gzip level and brotli quality: both favor speed, since responses are
+# compressed on every request
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+#
+# Helper Functions
+#
+
+def supported_encodings():
+    """
+    Return the content codings this server can produce, preferred first.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encodings):
+    """
+    Return the content coding to compress a response with, given the
+    request's parsed Accept-Encoding header (a werkzeug Accept object),
+    or None to send it uncompressed.
+    """
+    return accept_encodings.best_match(supported_encodings(), default=None)
+
+
+def compress(data, encoding):
+    """
+    Compress a whole response body with the given content coding.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_chunks(chunks, encoding):
+    """
+    Compress a streamed response body chunk by chunk. Every chunk is
+    flushed, so the client can start decoding each one as soon as it is
+    produced, instead of only once the compressor's buffer fills up.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,267 @@
+import collections
+import threading
+
+import numpy
+import spyce
+
+
+#
+# Helper Functions
+#
+
+def chebyshev_nodes(count):
+    """
+    Return the `count` Chebyshev points of the first kind on [-1, 1].
+    """
+    return numpy.cos(numpy.pi * (numpy.arange(count) + 0.5) / count)
+
+
+def check_points(count):
+    """
+    Return the points on [-1, 1] halfway (in angle) between the
+    `count` Chebyshev nodes, plus both endpoints. Interpolation error is
+    largest around these points, so they are used to measure it.
+    """
+    return numpy.cos(numpy.pi * numpy.arange(count + 1) / count)
+
+
+def evaluate_chebyshev(x, coeffs):
+    """
+    Evaluate one Chebyshev series per point with Clenshaw's recurrence.
+
+    x: (M,) array of points on [-1, 1]
+    coeffs: (M, degree + 1, 6) array of coefficients for each point
+    Return an (M, 6) array.
+    """
+    b1 = numpy.zeros((len(x), coeffs.shape[2]))
+    b2 = numpy.zeros_like(b1)
+    x = x[:, numpy.newaxis]
+    for k in range(coeffs.shape[1] - 1, 0, -1):
+        b1, b2 = coeffs[:, k] + 2 * x * b1 - b2, b1
+    return coeffs[:, 0] + x * b1 - b2
+
+
+#
+# Cache
+#
+
+class Segment:
+    """
+    Piecewise Chebyshev fit to the state of one target, relative to one
+    observer, over one fixed-length span of its coverage window.
+
+    The span is split into pieces (sorted by start time), each with its
+    own set of coefficients. Pieces whose fit could not be brought under
+    the cache's tolerance are marked as not `usable`, and queries that land
+    in them fall back to spyce.
+    """
+
+    def __init__(self, starts, ends, coeffs, usable):
+        self.starts = numpy.asarray(starts)
+        self.ends = numpy.asarray(ends)
+        self.coeffs = numpy.asarray(coeffs)
+        self.usable = numpy.asarray(usable, dtype=bool)
+
+    @property
+    def nbytes(self):
+        return self.starts.nbytes + self.ends.nbytes + self.coeffs.nbytes + self.usable.nbytes
+
+    def evaluate(self, ets):
+        """
+        Return (states, usable) for ETs that lie inside this segment.
+        """
+        piece = numpy.searchsorted(self.starts, ets, side='right') - 1
+        piece = numpy.clip(piece, 0, len(self.starts) - 1)
+        starts = self.starts[piece]
+        ends = self.ends[piece]
+        # Zero-width pieces are never usable, so their NaNs are discarded
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            x = (2 * ets - starts - ends) / (ends - starts)
+        return evaluate_chebyshev(x, self.coeffs[piece]), self.usable[piece]
+
+
+class EphemerisCache:
+    """
+    In-process cache of compact piecewise polynomial fits to SPICE state
+    vectors, answering frame queries without calling spkez_c each time.
+
+    Each target's coverage window is divided into segments of
+    `segment_length` seconds. The first query that lands in a segment
+    samples spyce at Chebyshev nodes across it and fits a series of
+    `degree` to every state component. The fit is checked against spyce
+    between the nodes, and the segment is halved (down to
+    `min_segment_length`) until the error is under `tolerance` (km) for
+    positions and `velocity_tolerance` (km/s) for velocities. Parts that
+    still don't meet the tolerance are answered by spyce directly.
+
+    Segments are evicted least-recently-used first once they take up more
+    than `max_bytes`. Call clear() whenever the kernel pool changes.
+
+    coverage_windows: function taking a NAIF ID and returning its sorted
+        list of (start, end) coverage windows in ET
+    compute: function with the same signature and return value as
+        spyce.get_frames_batch, used to sample and as the fallback
+    """
+
+    def __init__(self, coverage_windows, tolerance=1e-3, velocity_tolerance=1e-6,
+                 max_bytes=64 * 1024 * 1024, segment_length=86400.0,
+                 min_segment_length=600.0, degree=12, compute=spyce.get_frames_batch):
+        self.coverage_windows = coverage_windows
+        self.tolerance = tolerance
+        self.velocity_tolerance = velocity_tolerance
+        self.max_bytes = max_bytes
+        self.segment_length = segment_length
+        self.min_segment_length = min_segment_length
+        self.degree = degree
+        self.compute = compute
+
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._segments = collections.OrderedDict()
+        self._lock = threading.RLock()
+        # Events of the segments being fitted, set once each fit is done,
+        # and the number of clear() calls, so fits started before one
+        # aren't cached after it
+        self._fitting = {}
+        self._generation = 0
+
+        self._nodes = chebyshev_nodes(degree + 1)
+        self._check_points = check_points(degree + 1)
+
+    def clear(self):
+        """
+        Drop every cached fit. This must be called whenever the kernel
+        pool changes.
+        """
+        with self._lock:
+            self._segments.clear()
+            self.nbytes = 0
+            self._generation += 1
+
+    def get_frames_batch(self, target_id, observer_id, ets):
+        """
+        Drop-in replacement for spyce.get_frames_batch() that answers from
+        the cached fits wherever they are within tolerance.
+        """
+        ets = numpy.ascontiguousarray(ets, dtype=numpy.float64)
+        states = numpy.zeros((len(ets), 6))
+        valid = numpy.zeros(len(ets), dtype=bool)
+        fallback = numpy.ones(len(ets), dtype=bool)
+
+        windows = self.coverage_windows(target_id)
+        if len(windows) and len(ets):
+            window_starts = numpy.array([w[0] for w in windows])
+            window_ends = numpy.array([w[1] for w in windows])
+            window = numpy.searchsorted(window_starts, ets, side='right') - 1
+            inside = window >= 0
+            inside[inside] = ets[inside] <= window_ends[window[inside]]
+
+            # Index of the fixed-length segment of its window each ET falls in
+            # (an ET exactly at the end of a window belongs to the last one)
+            idx = numpy.flatnonzero(inside)
+            window = window[idx]
+            num_segments = numpy.maximum(numpy.ceil((window_ends - window_starts) / self.segment_length), 1)
+            segment = (ets[idx] - window_starts[window]) // self.segment_length
+            segment = numpy.minimum(segment, num_segments[window] - 1).astype(numpy.int64)
+
+            keys, inverse = numpy.unique(numpy.stack([window, segment], axis=1), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            groups = numpy.split(idx[numpy.argsort(inverse, kind='stable')], numpy.cumsum(numpy.bincount(inverse))[:-1])
+            for (w, k), in_segment in zip(keys.tolist(), groups):
+                seg = self._get_segment(target_id, observer_id, windows[w], k)
+                seg_states, usable = seg.evaluate(ets[in_segment])
+
+                answered = in_segment[usable]
+                states[answered] = seg_states[usable]
+                valid[answered] = True
+                fallback[answered] = False
+
+        with self._lock:
+            self.hits += int(len(ets) - fallback.sum())
+            self.misses += int(fallback.sum())
+
+        if fallback.any():
+            states[fallback], valid[fallback] = self.compute(target_id, observer_id, ets[fallback])
+        return states, valid
+
+    def get_frames_multi(self, target_ids, observer_id, ets):
+        """
+        Drop-in replacement for spyce.get_frames_multi(), answering each
+        target from the cached fits as get_frames_batch() does.
+        """
+        ets = numpy.ascontiguousarray(ets, dtype=numpy.float64)
+        results = [self.get_frames_batch(target_id, observer_id, ets) for target_id in target_ids]
+        if not results:
+            return numpy.zeros((0, len(ets), 6)), numpy.zeros((0, len(ets)), dtype=bool)
+        return (numpy.stack([states for states, _ in results]),
+                numpy.stack([valid for _, valid in results]))
+
+    def _get_segment(self, target_id, observer_id, window, index):
+        """
+        Return the fitted Segment for a span of a coverage window, fitting
+        it (and evicting others to make room) if it isn't cached.
+
+        The lock is only held to look segments up and insert them, not
+        while fitting. Threads missing the same segment at once wait for
+        the first one's fit instead of each fitting it.
+        """
+        key = (target_id, observer_id, window[0], index)
+        while True:
+            with self._lock:
+                seg = self._segments.get(key, None)
+                if seg is not None:
+                    self._segments.move_to_end(key)
+                    return seg
+                fitting = self._fitting.get(key, None)
+                if fitting is None:
+                    fitting = self._fitting[key] = threading.Event()
+                    generation = self._generation
+                    break
+            # Look the segment up again once the other fit is done, and fit
+            # it here if that one failed or was dropped
+            fitting.wait()
+
+        try:
+            start = window[0] + index * self.segment_length
+            end = min(start + self.segment_length, window[1])
+            seg = Segment(*zip(*self._fit(target_id, observer_id, start, end)))
+
+            with self._lock:
+                if generation == self._generation:
+                    self._segments[key] = seg
+                    self.nbytes += seg.nbytes
+                    while self.nbytes > self.max_bytes and len(self._segments) > 1:
+                        _, evicted = self._segments.popitem(last=False)
+                        self.nbytes -= evicted.nbytes
+            return seg
+        finally:
+            with self._lock:
+                del self._fitting[key]
+            fitting.set()
+
+    def _fit(self, target_id, observer_id, start, end):
+        """
+        Fit [start, end], splitting it in half until the fit is within
+        tolerance. Return a list of (start, end, coeffs, usable) pieces.
+        """
+        midpoint = (start + end) / 2
+        half_width = (end - start) / 2
+
+        node_states, node_valid = self.compute(target_id, observer_id, midpoint + half_width * self._nodes)
+        check_states, check_valid = self.compute(target_id, observer_id, midpoint + half_width * self._check_points)
+
+        coeffs = numpy.zeros((self.degree + 1, 6))
+        usable = False
+        if half_width > 0 and node_valid.all() and check_valid.all():
+            coeffs = numpy.polynomial.chebyshev.chebfit(self._nodes, node_states, self.degree)
+            error = numpy.polynomial.chebyshev.chebval(self._check_points, coeffs).T - check_states
+            position_error = numpy.linalg.norm(error[:, :3], axis=1).max()
+            velocity_error = numpy.linalg.norm(error[:, 3:], axis=1).max()
+            usable = position_error <= self.tolerance and velocity_error <= self.velocity_tolerance
+
+        # Give up on splitting if the data has gaps, since the fit will
+        # never be usable across them, or once the pieces get too small.
+        if usable or not node_valid.any() or end - start < 2 * self.min_segment_length:
+            return [(start, end, coeffs, usable)]
+        return self._fit(target_id, observer_id, start, midpoint) + self._fit(target_id, observer_id, midpoint, end)
@@ -0,0 +1,379 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import struct
+import threading
+
+import numpy
+import spyce
+
+
+STORE_VERSION = 1
+
+# The file ends with a trailer giving the location of the JSON header:
+#   header offset in bytes (uint64), header length (uint32), magic (4 bytes)
+# Everything before the header is little-endian float64 data.
+STORE_TRAILER = struct.Struct('<QI4s')
+STORE_MAGIC = b'EPHS'
+
+DEFAULT_STORE_PATH = 'config/ephemeris.store'
+DEFAULT_STEP = 60.0
+
+# Objects are sampled and written this many samples at a time, so baking
+# long coverage (such as the centuries of de430.bsp) doesn't hold it all
+# in memory
+BAKE_CHUNK_SIZE = 100000
+
+# Objects with more samples than this (about 19 years at the default
+# step, 560 MB in the store) are skipped unless the command line asks for
+# more, or for a shorter time range
+DEFAULT_MAX_SAMPLES = 10000000
+
+# Samples are read in this order for each object, one column after another
+STORE_COLUMNS = ('et', 'x', 'y', 'z', 'dx', 'dy', 'dz')
+
+
+#
+# Helper Functions
+#
+
+@functools.lru_cache(maxsize=256)
+def _file_sha256(filepath, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_sha256(filepath):
+    """
+    Return the SHA-256 of a file, as a hex string. Hashes are memoized
+    for as long as the file's size and modification time don't change.
+    """
+    stat = os.stat(filepath)
+    return _file_sha256(os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+
+def hermite(start_states, end_states, h, s):
+    """
+    Interpolate states with cubic Hermite polynomials, from the states at
+    both ends of intervals of length `h` seconds, at fractions `s` of the
+    way through them.
+    """
+    s = s[:, numpy.newaxis]
+    h = h[:, numpy.newaxis]
+    s2 = s * s
+    s3 = s2 * s
+    p0, v0 = start_states[:, :3], start_states[:, 3:]
+    p1, v1 = end_states[:, :3], end_states[:, 3:]
+
+    position = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0 +
+                (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * h * v1)
+    velocity = ((6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * h * v0 +
+                (-6 * s2 + 6 * s) * p1 + (3 * s2 - 2 * s) * h * v1) / h
+    return numpy.concatenate([position, velocity], axis=1)
+
+
+def clip_windows(windows, start=None, end=None):
+    """
+    Return the parts of a list of (start, end) coverage windows between
+    `start` and `end` (either may be None for no limit).
+    """
+    clipped = []
+    for window_start, window_end in windows:
+        if start is not None:
+            window_start = max(window_start, start)
+        if end is not None:
+            window_end = min(window_end, end)
+        if window_start <= window_end:
+            clipped.append((window_start, window_end))
+    return clipped
+
+
+def window_sample_count(start, end, step):
+    """
+    Return the number of samples sample_windows() takes in a window.
+    """
+    count = int((end - start) // step) + 1
+    return count + 1 if start + step * (count - 1) < end else count
+
+
+def sample_windows(windows, step, chunk_size=BAKE_CHUNK_SIZE):
+    """
+    Generate the ETs at which to sample a list of (start, end) coverage
+    windows, in arrays of at most `chunk_size`: every `step` seconds from
+    each start, followed by its end.
+    """
+    for start, end in windows:
+        count = window_sample_count(start, end, step)
+        for first in range(0, count, chunk_size):
+            times = start + step * numpy.arange(first, min(first + chunk_size, count), dtype=numpy.float64)
+            if first + chunk_size >= count and times[-1] > end:
+                times[-1] = end
+            yield times
+
+
+#
+# Baking
+#
+
+def bake(output_path, kernel_filepaths, object_ids, coverage_windows, observer_id,
+         step=DEFAULT_STEP, compute=spyce.get_frames_batch, start=None, end=None,
+         max_samples=DEFAULT_MAX_SAMPLES, chunk_size=BAKE_CHUNK_SIZE):
+    """
+    Sample the state of every object relative to `observer_id` every
+    `step` seconds over its coverage windows, and write it to a store
+    file at `output_path`.
+
+    The largest error of interpolating between samples (measured at the
+    middle of every interval) is recorded for each object, so that the
+    server only uses the store where it is accurate enough.
+
+    Objects are sampled, checked and written `chunk_size` samples at a
+    time, so memory use doesn't grow with their coverage.
+
+    coverage_windows: function taking a NAIF ID and returning its sorted
+        list of (start, end) coverage windows in ET
+    compute: function with the same signature and return value as
+        spyce.get_frames_batch
+    start, end: ETs to limit the baked coverage to, or None
+    max_samples: objects that would take more samples than this are
+        skipped with a warning, or None for no limit
+    """
+    entries = []
+    offset = 0
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        for obj_id in object_ids:
+            if obj_id == observer_id:
+                continue
+            windows = clip_windows(coverage_windows(obj_id), start, end)
+            count = sum(window_sample_count(w_start, w_end, step) for w_start, w_end in windows)
+            if count < 2:
+                continue
+            if max_samples is not None and count > max_samples:
+                print('[WARN]: not baking', obj_id, '-', count, 'samples is over the limit of', max_samples,
+                      '(use --start/--end, --step or --max-samples)')
+                continue
+
+            # Columns are written where they go as each chunk is done; the
+            # gaps are filled in by the later chunks
+            base = offset * 8
+            written = 0
+            max_error = 0.0
+            max_velocity_error = 0.0
+            previous = None
+            for ets in sample_windows(windows, step, chunk_size):
+                states, valid = compute(obj_id, observer_id, ets)
+                states[~valid] = numpy.nan
+
+                out.seek(base + written * 8)
+                out.write(ets.astype('<f8').tobytes())
+                for column in range(6):
+                    out.seek(base + ((column + 1) * count + written) * 8)
+                    out.write(states[:, column].astype('<f8').tobytes())
+                written += len(ets)
+
+                # Check interpolation at the middle of every interval inside a
+                # window (the ones between windows are never interpolated),
+                # including the one from the last sample of the previous chunk
+                check_ets, check_states, check_valid = ets, states, valid
+                if previous is not None:
+                    check_ets = numpy.concatenate([previous[0], ets])
+                    check_states = numpy.concatenate([previous[1], states])
+                    check_valid = numpy.concatenate([previous[2], valid])
+                previous = (ets[-1:], states[-1:], valid[-1:])
+
+                h = numpy.diff(check_ets)
+                inner = numpy.flatnonzero((h <= step * (1 + 1e-9)) & check_valid[:-1] & check_valid[1:])
+                if len(inner) == 0:
+                    continue
+                mid_states, mid_valid = compute(obj_id, observer_id, check_ets[inner] + h[inner] / 2)
+                error = hermite(check_states[inner], check_states[inner + 1], h[inner],
+                                numpy.full(len(inner), 0.5)) - mid_states
+                error = error[mid_valid]
+                if len(error):
+                    max_error = max(max_error, float(numpy.linalg.norm(error[:, :3], axis=1).max()))
+                    max_velocity_error = max(max_velocity_error, float(numpy.linalg.norm(error[:, 3:], axis=1).max()))
+
+            entries.append({
+                'id': int(obj_id),
+                'offset': offset,
+                'count': count,
+                'max_error': max_error,
+                'max_velocity_error': max_velocity_error,
+            })
+            offset += count * len(STORE_COLUMNS)
+            print('[INFO]: baked', obj_id, count, 'samples, max error', max_error, 'km')
+
+        header = json.dumps({
+            'version': STORE_VERSION,
+            'observer': int(observer_id),
+            'step': step,
+            'kernels': [{'file': os.path.basename(k), 'sha256': file_sha256(k)} for k in kernel_filepaths],
+            'objects': entries,
+        }).encode('utf-8')
+        header_offset = offset * 8
+        out.seek(header_offset)
+        out.write(header)
+        out.write(STORE_TRAILER.pack(header_offset, len(header), STORE_MAGIC))
+    os.replace(tmp_path, output_path)
+
+
+#
+# Store
+#
+
+class EphemerisStore:
+    """
+    Read-only, memory-mapped store of precomputed states written by
+    bake(), answering frame queries by binary search and cubic Hermite
+    interpolation between samples instead of calling spkez_c.
+
+    The file is mapped rather than read, so several server processes
+    share the same pages, and queries only touch the samples they need.
+
+    Objects whose recorded interpolation error is over `tolerance` (km)
+    or `velocity_tolerance` (km/s), other observers, and times outside
+    the stored samples are passed on to `compute` (same signature and
+    return value as spyce.get_frames_batch).
+    """
+
+    def __init__(self, path, tolerance=1e-3, velocity_tolerance=1e-6, compute=spyce.get_frames_batch):
+        self.path = path
+        self.compute = compute
+
+        with open(path, 'rb') as f:
+            f.seek(-STORE_TRAILER.size, os.SEEK_END)
+            header_offset, header_length, magic = STORE_TRAILER.unpack(f.read(STORE_TRAILER.size))
+            if magic != STORE_MAGIC:
+                raise ValueError('not an ephemeris store: ' + path)
+            f.seek(header_offset)
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+        if self.header['version'] != STORE_VERSION:
+            raise ValueError('unsupported ephemeris store version: ' + str(self.header['version']))
+
+        self.observer = self.header['observer']
+        self.step = self.header['step']
+        self.kernel_hashes = [k['sha256'] for k in self.header['kernels']]
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._objects = {}
+        if header_offset == 0:
+            return
+        data = numpy.memmap(path, dtype='<f8', mode='r', shape=(header_offset // 8,))
+        for entry in self.header['objects']:
+            if entry['max_error'] > tolerance or entry['max_velocity_error'] > velocity_tolerance:
+                print('[WARN]: ephemeris store is not accurate enough for object', entry['id'])
+                continue
+            start, count = entry['offset'], entry['count']
+            # (7, count) view of the mapped columns
+            self._objects[entry['id']] = data[start:start + count * len(STORE_COLUMNS)].reshape(len(STORE_COLUMNS), count)
+
+    def is_current(self, kernel_filepaths):
+        """
+        Return whether the store was baked from exactly these kernel files
+        (by content, in this order).
+        """
+        try:
+            return [file_sha256(k) for k in kernel_filepaths] == self.kernel_hashes
+        except OSError:
+            return False
+
+    def get_frames_batch(self, target_id, observer_id, ets):
+        """
+        Drop-in replacement for spyce.get_frames_batch() that answers from
+        the store wherever it can.
+        """
+        ets = numpy.ascontiguousarray(ets, dtype=numpy.float64)
+        columns = self._objects.get(target_id, None) if observer_id == self.observer else None
+        if columns is None or len(ets) == 0:
+            with self._lock:
+                self.misses += len(ets)
+            return self.compute(target_id, observer_id, ets)
+
+        stored_ets = columns[0]
+        i = numpy.clip(numpy.searchsorted(stored_ets, ets, side='right') - 1, 0, len(stored_ets) - 2)
+        start_ets = stored_ets[i]
+        h = stored_ets[i + 1] - start_ets
+        s = (ets - start_ets) / h
+        # Intervals longer than a step are gaps between coverage windows
+        inside = (s >= 0) & (s <= 1) & (h <= self.step * (1 + 1e-9))
+
+        states = hermite(numpy.asarray(columns[1:, i].T), numpy.asarray(columns[1:, i + 1].T), h, s)
+        usable = inside & ~numpy.isnan(states).any(axis=1)
+        valid = usable.copy()
+        states[~usable] = 0
+
+        fallback = ~usable
+        with self._lock:
+            self.hits += int(usable.sum())
+            self.misses += int(fallback.sum())
+        if fallback.any():
+            states[fallback], valid[fallback] = self.compute(target_id, observer_id, ets[fallback])
+        return states, valid
+
+    def get_frames_multi(self, target_ids, observer_id, ets):
+        """
+        Drop-in replacement for spyce.get_frames_multi(), answering each
+        target as get_frames_batch() does.
+        """
+        ets = numpy.ascontiguousarray(ets, dtype=numpy.float64)
+        results = [self.get_frames_batch(target_id, observer_id, ets) for target_id in target_ids]
+        if not results:
+            return numpy.zeros((0, len(ets), 6)), numpy.zeros((0, len(ets)), dtype=bool)
+        return (numpy.stack([states for states, _ in results]),
+                numpy.stack([valid for _, valid in results]))
+
+
+#
+# Command Line
+#
+
+def main(argv=None):
+    """
+    python3 ephemeris_store.py bake [--step SECONDS] [--observer ID] [--output PATH]
+        [--objects ID,...] [--start UTC] [--end UTC] [--max-samples N]
+
+    Bake a store for every object in the kernels of config/config.json
+    (or the ones listed).
+    """
+    parser = argparse.ArgumentParser(description='Precompute an ephemeris store from the configured kernels.')
+    parser.add_argument('command', choices=['bake'])
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP, help='seconds between samples')
+    parser.add_argument('--observer', type=int, default=399, help='NAIF ID of the observer (default Earth)')
+    parser.add_argument('--output', default=None, help='store path (default: from the config, or ' + DEFAULT_STORE_PATH + ')')
+    parser.add_argument('--objects', default=None,
+                        help='comma-separated NAIF IDs of the objects to bake (default: every object in the kernels)')
+    parser.add_argument('--start', default=None, help='UTC time to start baking at (default: start of coverage)')
+    parser.add_argument('--end', default=None, help='UTC time to stop baking at (default: end of coverage)')
+    parser.add_argument('--max-samples', type=int, default=DEFAULT_MAX_SAMPLES,
+                        help='skip objects that would take more samples than this (default %(default)s)')
+    args = parser.parse_args(argv)
+
+    # Imported here since FlaskServer imports this module
+    import FlaskServer
+
+    with open('config/config.json', 'r', encoding='utf-8') as conf_file:
+        conf_data = json.load(conf_file)
+    output = args.output or conf_data.get('ephemeris_store', {}).get('path', DEFAULT_STORE_PATH)
+
+    FlaskServer.load_config({k: conf_data[k] for k in ('kernels', 'main_subject_id', 'main_subject_name')})
+    if args.objects:
+        object_ids = [int(obj_id) for obj_id in args.objects.split(',')]
+    else:
+        object_ids = list(dict.fromkeys(obj_id for k in FlaskServer.kernels for obj_id in FlaskServer.get_kernel_objects(k)))
+    start = spyce.utc_to_et(args.start) if args.start else None
+    end = spyce.utc_to_et(args.end) if args.end else None
+    bake(output, FlaskServer.kernels, object_ids, FlaskServer.get_coverage_windows, args.observer, args.step,
+         start=start, end=end, max_samples=args.max_samples)
+
+
+if __name__ == '__main__':
+    main()
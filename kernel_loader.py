@@ -0,0 +1,235 @@
+import contextlib
+import os
+import threading
+import time
+
+
+# Text kernels (leapseconds, frames, planetary constants, ...) are small
+# and are what time conversions and name lookups need, so they are loaded
+# before binary kernels. SPICE only gives priority between kernels of the
+# same type, so this doesn't change any answers.
+TEXT_KERNEL_EXTENSIONS = ('.tls', '.tpc', '.tf', '.ti', '.tsc')
+
+
+#
+# Helper Functions
+#
+
+def is_text_kernel(kernel_filepath):
+    """
+    Return whether a kernel file is a text kernel, from its extension.
+    """
+    return os.path.splitext(kernel_filepath)[1].lower() in TEXT_KERNEL_EXTENSIONS
+
+
+def load_order(kernel_filepaths):
+    """
+    Return the kernels in the order they should be loaded: text kernels
+    first, otherwise keeping the configured order.
+    """
+    return ([k for k in kernel_filepaths if is_text_kernel(k)] +
+            [k for k in kernel_filepaths if not is_text_kernel(k)])
+
+
+def file_signature(filepath):
+    """
+    Return a value that changes whenever a file is replaced or modified
+    (its modification time and size), or None if it doesn't exist.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+#
+# Kernel Pool Lock
+#
+
+class ReadWriteLock:
+    """
+    Lock letting any number of readers in at once, or one writer alone.
+    Requests read the kernel pool, and reloading kernels writes it, so a
+    request never sees a half-updated pool.
+
+    Waiting writers keep new readers out, so a reload isn't starved by a
+    steady stream of requests. Readers must not nest.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writing or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+
+    def release_write(self):
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reading(self):
+        """
+        Context manager holding the lock as a reader.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def writing(self):
+        """
+        Context manager holding the lock as the writer.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+#
+# Loader
+#
+
+class KernelLoader:
+    """
+    Loads a list of kernel files, either right away with run() or on a
+    background thread with start(), recording how long each one took.
+
+    While kernels are loading in the background, wait() blocks until the
+    given kernels (or all of them) are loaded, so the server can accept
+    requests immediately and each one only waits for what it needs.
+
+    load: function furnishing one kernel file (FlaskServer.add_kernel)
+    finished: optional function called once every kernel has been
+        attempted, on the loading thread
+    """
+
+    def __init__(self, kernel_filepaths, load, finished=None):
+        self.kernel_filepaths = load_order(kernel_filepaths)
+        self.load = load
+        self.finished = finished
+        self.start_time = None
+        self.seconds = None
+        self.thread = None
+
+        self._done = {k: threading.Event() for k in self.kernel_filepaths}
+        self._all_done = threading.Event()
+        self._report = {k: {
+            'file': os.path.basename(k),
+            'bytes': None,
+            'seconds': None,
+            'status': 'pending',
+        } for k in self.kernel_filepaths}
+
+    def start(self):
+        """
+        Load the kernels on a background thread.
+        """
+        self.thread = threading.Thread(target=self.run, name='kernel-loader', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """
+        Load the kernels on the calling thread.
+        """
+        self.start_time = time.monotonic()
+        try:
+            for kernel_filepath in self.kernel_filepaths:
+                self._load_one(kernel_filepath)
+            if self.finished is not None:
+                self.finished()
+        finally:
+            self.seconds = time.monotonic() - self.start_time
+            self._all_done.set()
+            self.print_report()
+
+    def _load_one(self, kernel_filepath):
+        entry = self._report[kernel_filepath]
+        entry['status'] = 'loading'
+        try:
+            entry['bytes'] = os.path.getsize(kernel_filepath)
+        except OSError:
+            pass
+
+        start = time.monotonic()
+        try:
+            self.load(kernel_filepath)
+        except Exception as e:
+            entry['status'] = 'failed'
+            print('[ERROR]: Unable to load kernel', kernel_filepath, '-', e)
+        else:
+            entry['status'] = 'loaded'
+        finally:
+            entry['seconds'] = time.monotonic() - start
+            self._done[kernel_filepath].set()
+
+    def wait(self, kernel_filepaths=None, timeout=None):
+        """
+        Block until the given kernels (all of them by default) have been
+        attempted, or `timeout` seconds have passed. Kernels the loader
+        doesn't know about don't need waiting for.
+
+        Return whether everything waited for is done.
+        """
+        if kernel_filepaths is None:
+            return self._all_done.wait(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for kernel_filepath in kernel_filepaths:
+            event = self._done.get(kernel_filepath, None)
+            if event is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    @property
+    def ready(self):
+        """
+        Whether every kernel has been attempted.
+        """
+        return self._all_done.is_set()
+
+    def report(self):
+        """
+        Return the per-kernel load report, in load order, as a list of
+        {file, bytes, seconds, status} dicts.
+        """
+        return [dict(self._report[k]) for k in self.kernel_filepaths]
+
+    def print_report(self):
+        """
+        Print the load report to stdout.
+        """
+        for entry in self.report():
+            size = '?' if entry['bytes'] is None else '{:.1f} MB'.format(entry['bytes'] / 1e6)
+            print('[INFO]: kernel {} ({}) {} in {:.3f} s'.format(
+                entry['file'], size, entry['status'], entry['seconds'] or 0.0))
+        print('[INFO]: kernels loaded in {:.3f} s'.format(self.seconds or 0.0))
@@ -0,0 +1,181 @@
+import bisect
+import contextlib
+import threading
+import time
+
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Default histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+#
+# Helper Functions
+#
+
+def format_value(value):
+    """
+    Format a sample value the way Prometheus expects.
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    """
+    Format a sequence of (name, value) label pairs as {name="value",...}.
+    """
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join('{}="{}"'.format(name, value) for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def format_family(name, kind, help_text, samples):
+    """
+    Format one metric family in the text exposition format.
+
+    samples: list of (sample name, label pairs, value)
+    """
+    lines = ['# HELP {} {}'.format(name, help_text), '# TYPE {} {}'.format(name, kind)]
+    for sample_name, labels, value in samples:
+        lines.append(sample_name + format_labels(labels) + ' ' + format_value(value))
+    return '\n'.join(lines) + '\n'
+
+
+#
+# Metrics
+#
+
+class Counter:
+    """
+    Monotonically increasing count, one per combination of label values.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """
+        Return the current count for the given label values.
+        """
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, list(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Histogram:
+    """
+    Distribution of observed values (durations in seconds), counted in
+    cumulative buckets, one per combination of label values.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key, None)
+            if entry is None:
+                # per-bucket (non-cumulative) counts, +Inf last, then the sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Context manager observing how long its block takes.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get_count(self, **labels):
+        """
+        Return the number of observations for the given label values.
+        """
+        entry = self._values.get(tuple(str(labels[name]) for name in self.labelnames), None)
+        return 0 if entry is None else sum(entry[0])
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + [('le', format_value(float(bound)))], cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Set of metrics rendered together by render(). Collectors are
+    functions called at render time, returning a list of
+    (name, kind, help, samples) families for values kept elsewhere.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, function):
+        """
+        Register a collector function (usable as a decorator).
+        """
+        self.collectors.append(function)
+        return function
+
+    def render(self):
+        """
+        Return every metric in the text exposition format.
+        """
+        families = [(m.name, m.kind, m.help_text, m.samples()) for m in self.metrics]
+        for collect in self.collectors:
+            families += collect()
+        return ''.join(format_family(*family) for family in families)
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
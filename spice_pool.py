@@ -0,0 +1,117 @@
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy
+import spyce
+
+
+# Batches larger than this are split across several workers
+DEFAULT_CHUNK_SIZE = 4096
+
+
+#
+# Worker Process Functions
+#
+
+def init_worker(kernel_filepaths):
+    """
+    Furnish each worker process's own kernel pool when it starts.
+    """
+    for kernel_filepath in kernel_filepaths:
+        spyce.add_kernel(kernel_filepath)
+
+
+def worker_get_frames_batch(target_id, observer_id, ets, frame, abcorr, light_time):
+    """
+    Run spyce.get_frames_batch() inside a worker process.
+    """
+    return spyce.get_frames_batch(target_id, observer_id, ets, frame, abcorr, light_time)
+
+
+def worker_get_frames_multi(target_ids, observer_id, ets, frame, abcorr, light_time):
+    """
+    Run spyce.get_frames_multi() inside a worker process.
+    """
+    return spyce.get_frames_multi(target_ids, observer_id, ets, frame, abcorr, light_time)
+
+
+#
+# Pool
+#
+
+class SpicePool:
+    """
+    Pool of worker processes, each with its own CSPICE instance and its
+    own copy of the kernel pool, for spreading SPICE computations over
+    every core of the host.
+
+    CSPICE itself is serialized per process (spyce holds a lock around
+    every call), so within one process only one computation can run at a
+    time; the pool is what lets several run at once.
+
+    Call restart() with the new list of kernels whenever the kernel pool
+    changes, since the workers keep the kernels they were started with.
+    """
+
+    def __init__(self, kernel_filepaths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = None
+        self.restart(kernel_filepaths)
+
+    def restart(self, kernel_filepaths):
+        """
+        Replace the workers with new ones that have `kernel_filepaths`
+        loaded. Computations already submitted finish on the old workers.
+        """
+        old_executor = self._executor
+        # "spawn" avoids forking a process that has other threads running
+        # (and CSPICE state in an unknown state)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(list(kernel_filepaths),))
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        self._executor.shutdown()
+
+    def get_frames_batch(self, target_id, observer_id, ets, frame='J2000', abcorr='NONE', light_time=False):
+        """
+        Drop-in replacement for spyce.get_frames_batch() that runs in the
+        worker processes, splitting large batches across several of them.
+        """
+        return self._run_split(worker_get_frames_batch, target_id, observer_id, ets, 0,
+                               frame, abcorr, light_time)
+
+    def get_frames_multi(self, target_ids, observer_id, ets, frame='J2000', abcorr='NONE', light_time=False):
+        """
+        Drop-in replacement for spyce.get_frames_multi() that runs in the
+        worker processes, splitting large batches across several of them.
+        """
+        return self._run_split(worker_get_frames_multi, list(target_ids), observer_id, ets, 1,
+                               frame, abcorr, light_time)
+
+    def _run_split(self, function, targets, observer_id, ets, axis, *args):
+        """
+        Run `function` on chunks of `ets` in the workers (with the extra
+        `args`), and join each array of the results (states, valid and
+        possibly light times) back together along the time `axis`.
+        """
+        ets = numpy.ascontiguousarray(ets, dtype=numpy.float64)
+        num_chunks = max(1, min(self.workers, -(-len(ets) // self.chunk_size)))
+
+        futures = [
+            self._executor.submit(function, targets, observer_id, chunk, *args)
+            for chunk in numpy.array_split(ets, num_chunks)
+        ]
+        results = [future.result() for future in futures]
+        if len(results) == 1:
+            return results[0]
+        return tuple(numpy.concatenate(arrays, axis=axis) for arrays in zip(*results))
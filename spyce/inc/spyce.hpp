@@ -5,9 +5,9 @@
 #include "SpiceUsr.h"
 
 struct Frame {
-    double x,y,z,dx,dy,dz;
+    double x,y,z,dx,dy,dz,lt;
 
-    Frame(SpiceDouble *frame);
+    Frame(SpiceDouble *frame, SpiceDouble lt);
     Frame();
 };
 
@@ -15,11 +15,14 @@ namespace py = boost::python;
 
 void        spyce_init();
 
+int         spyce_frame_to_id(std::string frame_name);
 int         spyce_str_to_id(std::string naif_id);
 std::string spyce_id_to_str(int naif_id);
 
 double      spyce_utc_to_et(std::string date);
 std::string spyce_et_to_utc(double et, std::string format);
+py::tuple   spyce_utc_to_et_batch(py::object dates);
+py::tuple   spyce_et_to_utc_batch(py::object e_times, std::string format);
 
 void        spyce_add_kernel(std::string s);
 void        spyce_remove_kernel(std::string s);
@@ -27,4 +30,10 @@ void        spyce_remove_kernel(std::string s);
 py::list    spyce_get_objects(std::string file);
 py::list    spyce_get_coverage_windows(std::string file, int obj_id);
 
-Frame       spyce_get_frame_data(int target_id, int observer_id, double e_time);
+Frame       spyce_get_frame_data(int target_id, int observer_id, double e_time, std::string ref_frame, std::string abcorr);
+py::tuple   spyce_get_frames_batch(int target_id, int observer_id, py::object e_times, std::string ref_frame, std::string abcorr, bool light_time);
+py::tuple   spyce_get_frames_multi(py::object target_ids, int observer_id, py::object e_times, std::string ref_frame, std::string abcorr, bool light_time);
+
+py::list    spyce_find_distance_windows(int target_id, int observer_id, std::string relate, double distance, py::object windows, double step, std::string abcorr);
+py::list    spyce_find_occultation_windows(std::string occultation_type, int front_id, int back_id, int observer_id, py::object windows, double step, std::string abcorr);
+py::dict    spyce_get_stats();
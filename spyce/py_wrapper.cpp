@@ -1,4 +1,5 @@
 #include <boost/python.hpp>
+#include <boost/python/numpy.hpp>
 
 #include "spyce_exceptions.hpp"
 #include "spyce.hpp"
@@ -41,6 +42,7 @@ BOOST_PYTHON_MODULE(spyce) {
      * Initialization
      **/
     spyce_init();
+    boost::python::numpy::initialize();
 
     /**
      * Declarations
@@ -52,11 +54,14 @@ BOOST_PYTHON_MODULE(spyce) {
     exception(IDNotFound);
     exception(InsufficientData);
 
+    def("frame_to_id", &spyce_frame_to_id);
     def("str_to_id", &spyce_str_to_id);
     def("id_to_str", &spyce_id_to_str);
 
     def("utc_to_et", &spyce_utc_to_et);
     def("et_to_utc", &spyce_et_to_utc);
+    def("utc_to_et_batch", &spyce_utc_to_et_batch);
+    def("et_to_utc_batch", &spyce_et_to_utc_batch);
 
     def("add_kernel", &spyce_add_kernel);
     def("remove_kernel", &spyce_remove_kernel);
@@ -64,7 +69,20 @@ BOOST_PYTHON_MODULE(spyce) {
     def("get_objects", &spyce_get_objects);
     def("get_coverage_windows", &spyce_get_coverage_windows);
 
-    def("get_frame_data", &spyce_get_frame_data);
+    //reference frame and aberration correction default to geometric J2000 states
+    def("get_frame_data", &spyce_get_frame_data,
+        (arg("target_id"), arg("observer_id"), arg("e_time"), arg("frame")="J2000", arg("abcorr")="NONE"));
+    def("get_frames_batch", &spyce_get_frames_batch,
+        (arg("target_id"), arg("observer_id"), arg("e_times"), arg("frame")="J2000", arg("abcorr")="NONE", arg("light_time")=false));
+    def("get_frames_multi", &spyce_get_frames_multi,
+        (arg("target_ids"), arg("observer_id"), arg("e_times"), arg("frame")="J2000", arg("abcorr")="NONE", arg("light_time")=false));
+
+    def("find_distance_windows", &spyce_find_distance_windows,
+        (arg("target_id"), arg("observer_id"), arg("relate"), arg("distance"), arg("windows"), arg("step"), arg("abcorr")="NONE"));
+    def("find_occultation_windows", &spyce_find_occultation_windows,
+        (arg("occultation_type"), arg("front_id"), arg("back_id"), arg("observer_id"), arg("windows"), arg("step"), arg("abcorr")="LT"));
+
+    def("get_stats", &spyce_get_stats);
 
     class_<Frame>("Frame")
         .def_readonly("x",  &Frame::x)
@@ -72,5 +90,6 @@ BOOST_PYTHON_MODULE(spyce) {
         .def_readonly("z",  &Frame::z)
         .def_readonly("dx", &Frame::dx)
         .def_readonly("dy", &Frame::dy)
-        .def_readonly("dz", &Frame::dz);
+        .def_readonly("dz", &Frame::dz)
+        .def_readonly("lt", &Frame::lt);
 }
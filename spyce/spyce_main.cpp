@@ -1,5 +1,11 @@
 #include <boost/filesystem.hpp>
+#include <boost/python/numpy.hpp>
+#include <chrono>
+#include <cstring>
 #include <iostream>
+#include <map>
+#include <mutex>
+#include <vector>
 
 #include "SpiceUsr.h"
 
@@ -9,6 +15,78 @@
 #define SPYCE_OBJECTS_MAX 100
 #define NAIF_NAME_MAX     33
 #define DATE_STR_MAX      81
+#define FRAME_SIZE        6
+#define FRAME_NAME_MAX    33
+#define GF_MAX_WINDOWS    10000
+
+//aberration corrections accepted by spkez_c
+static const char *ABERRATION_CORRECTIONS[] = {
+    "NONE", "LT", "LT+S", "CN", "CN+S", "XLT", "XLT+S", "XCN", "XCN+S"
+};
+
+//distance relations accepted by gfdist_c, and occultation types by gfoclt_c
+static const char *DISTANCE_RELATIONS[] = {
+    "=", "<", ">", "LOCMIN", "ABSMIN", "LOCMAX", "ABSMAX"
+};
+static const char *OCCULTATION_TYPES[] = {
+    "FULL", "ANNULAR", "PARTIAL", "ANY"
+};
+
+//(start, end) ET pairs of a SPICE window, copied out of or into python
+typedef std::vector<std::pair<double, double>> Windows;
+
+namespace np = boost::python::numpy;
+
+/**
+ * Thread Safety
+ *
+ * CSPICE keeps global state (the kernel pool, error status, and the static
+ * cells below), so every call into it has to hold `spice_mutex`.
+ *
+ * The mutex is never waited on while holding the GIL: a thread blocked on
+ * it behind a long batch would otherwise stop every other python thread.
+ * Every function releases the GIL first (ReleaseGIL), then takes the mutex,
+ * and only builds the python objects it returns once both are back to how
+ * they started. The GIL must never be waited on while holding the mutex.
+ **/
+static std::mutex spice_mutex;
+
+class ReleaseGIL {
+    PyThreadState *state;
+public:
+    ReleaseGIL() : state(PyEval_SaveThread()) {}
+    ~ReleaseGIL() { PyEval_RestoreThread(state); }
+};
+
+/**
+ * Statistics
+ *
+ * Calls, evaluated items and time spent in the batch functions, and the
+ * CSPICE errors they report through their masks instead of raising, by
+ * the name of the exception they would have raised. Only touched while
+ * holding `spice_mutex`.
+ **/
+struct CallStats {
+    unsigned long long calls   = 0;
+    unsigned long long items   = 0;
+    double             seconds = 0;
+    std::map<std::string, unsigned long long> errors;
+};
+static std::map<std::string, CallStats> call_stats;
+
+class CallTimer {
+    CallStats &stats;
+    std::chrono::steady_clock::time_point start;
+public:
+    CallTimer(const char *function, Py_intptr_t items) : stats(call_stats[function]), start(std::chrono::steady_clock::now()) {
+        stats.calls++;
+        stats.items += items;
+    }
+    ~CallTimer() {
+        stats.seconds += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    }
+    void swallow_spice_error();
+};
 
 /**
  * Internal Functions
@@ -39,21 +117,144 @@ void check_spice_errors() {
         throw InvalidArgumentException("Invalid Time String");
     } else if(eqstr_c(mesg, "SPICE(INVALIDTIMEFORMAT)")) {
         throw InvalidArgumentException("Invalid Time Format");
+    } else if(eqstr_c(mesg, "SPICE(BADENDPOINTS)")) {
+        throw InvalidArgumentException("Invalid Window");
+    } else if(eqstr_c(mesg, "SPICE(INVALIDSTEPSIZE)")) {
+        throw InvalidArgumentException("Invalid Step Size");
+    } else if(eqstr_c(mesg, "SPICE(WINDOWEXCESS)") || eqstr_c(mesg, "SPICE(OUTOFROOM)")) {
+        throw InvalidArgumentException("Too Many Events");
+    } else if(eqstr_c(mesg, "SPICE(KERNELVARNOTFOUND)")) {
+        //e.g. the radii of a body, which are in a PCK
+        throw InsufficientDataException();
     } else {
         //any other errors throw and InternalException
         throw InternalException(mesg);
     }
 }
+//clear a CSPICE error that a batch function reports through its mask, counting it
+void CallTimer::swallow_spice_error() {
+    char mesg[26] = {0};
+
+    getmsg_c("SHORT", 26, mesg);
+
+    reset_c();
+    if       (eqstr_c(mesg, "SPICE(SPKINSUFFDATA)")) {
+        stats.errors["InsufficientDataError"]++;
+    } else if(eqstr_c(mesg, "SPICE(IDCODENOTFOUND)")) {
+        stats.errors["IDNotFoundError"]++;
+    } else if(eqstr_c(mesg, "SPICE(EMPTYSTRING)") || eqstr_c(mesg, "SPICE(INVALIDTIMESTRING)") || eqstr_c(mesg, "SPICE(INVALIDTIMEFORMAT)")) {
+        stats.errors["InvalidArgumentError"]++;
+    } else {
+        stats.errors["InternalError"]++;
+    }
+}
+
+//check an aberration correction, optionally refusing stellar aberration (+S)
+void check_abcorr(const std::string &abcorr, bool allow_stellar) {
+    for(const char *correction : ABERRATION_CORRECTIONS) {
+        if(eqstr_c(abcorr.c_str(), correction) && (allow_stellar || !std::strchr(correction, 'S')))
+            return;
+    }
+    throw InvalidArgumentException("Invalid Aberration Correction");
+}
+
+//check the reference frame and aberration correction of a state query once,
+// so batch functions don't fail the same way for every epoch
+void check_frame_args(const std::string &ref_frame, const std::string &abcorr) {
+    SpiceInt frame_code;
+    namfrm_c(ref_frame.c_str(), &frame_code);
+    check_spice_errors();
+    if(frame_code == 0)
+        throw InvalidArgumentException("Unknown Reference Frame");
+
+    check_abcorr(abcorr, true);
+}
+
+//check that `value` is one of `options` (ignoring case and blanks)
+template <size_t N> void check_option(const std::string &value, const char *(&options)[N], const char *error) {
+    for(const char *option : options) {
+        if(eqstr_c(value.c_str(), option))
+            return;
+    }
+    throw InvalidArgumentException(error);
+}
+
+//copy a python sequence of (start, end) pairs
+Windows windows_from_python(py::object windows) {
+    Windows copied;
+    for(py::stl_input_iterator<py::object> it(windows), end; it != end; ++it) {
+        py::object window = *it;
+        copied.emplace_back(py::extract<double>(window[0]), py::extract<double>(window[1]));
+    }
+    if(copied.size() > GF_MAX_WINDOWS)
+        throw InvalidArgumentException("Too Many Windows");
+    return copied;
+}
+
+py::list windows_to_python(const Windows &windows) {
+    py::list ret_obj;
+    for(const auto &window : windows) {
+        ret_obj.append(py::make_tuple(window.first, window.second));
+    }
+    return ret_obj;
+}
+
+//fill the confinement window of a geometry finder search
+void set_confinement_window(const Windows &windows, SpiceCell *cnfine) {
+    scard_c(0, cnfine);
+    check_spice_errors();
+    for(const auto &window : windows) {
+        wninsd_c(window.first, window.second, cnfine);
+        check_spice_errors();
+    }
+}
+
+Windows get_result_windows(SpiceCell *result) {
+    Windows windows;
+    int limit = wncard_c(result);
+    check_spice_errors();
+
+    double beg, end;
+    for(int i = 0; i < limit; i++) {
+        wnfetd_c(result, i, &beg, &end);
+        check_spice_errors();
+        windows.emplace_back(beg, end);
+    }
+    return windows;
+}
+
+//shape and body-fixed frame of a body in an occultation search: an
+// ellipsoid if the kernel pool has its radii, or else a point
+void occultation_shape(int body_id, std::string &shape, std::string &frame) {
+    SpiceInt     frame_code;
+    SpiceChar    frame_name[FRAME_NAME_MAX] = {0};
+    SpiceBoolean found;
+
+    if(!bodfnd_c(body_id, "RADII")) {
+        check_spice_errors();
+        shape = "POINT";
+        frame = " ";
+        return;
+    }
+    cidfrm_c(body_id, FRAME_NAME_MAX, &frame_code, frame_name, &found);
+    check_spice_errors();
+    if(!found)
+        throw InsufficientDataException();
+    shape = "ELLIPSOID";
+    frame = frame_name;
+}
+
 /**
  * Frame class
  **/
-Frame::Frame(SpiceDouble *frame) {
+Frame::Frame(SpiceDouble *frame, SpiceDouble lt) {
     this->x  = frame[0];
     this->y  = frame[1];
     this->z  = frame[2];
     this->dx = frame[3];
     this->dy = frame[4];
     this->dz = frame[5];
+    this->lt = lt;
 }
 
 Frame::Frame() {
@@ -63,12 +264,15 @@ Frame::Frame() {
     this->dx = 0;
     this->dy = 0;
     this->dz = 0;
+    this->lt = 0;
 }
 
 /**
  * Spyce
  **/
 void spyce_init() {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     // Error Handling
     //https://naif.jpl.nasa.gov/pub/naif/toolkit_docs/C/req/error.html
     erract_c("SET", 0, (SpiceChar *)"RETURN"); // disable "exit on error"
@@ -77,7 +281,23 @@ void spyce_init() {
 }
 
 //Helper Functions
+int spyce_frame_to_id(std::string frame_name) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
+    SpiceInt frame_code;
+
+    namfrm_c(frame_name.c_str(), &frame_code);
+    check_spice_errors();
+
+    if(frame_code == 0)
+        throw IDNotFoundException();
+
+    return frame_code;
+}
+
 int spyce_str_to_id(std::string naif_id) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     int  id_code;
     SpiceBoolean found;
 
@@ -91,6 +311,8 @@ int spyce_str_to_id(std::string naif_id) {
 }
 
 std::string spyce_id_to_str(int naif_id) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     char naif_name[NAIF_NAME_MAX] = {0};
     SpiceBoolean found;
 
@@ -104,6 +326,8 @@ std::string spyce_id_to_str(int naif_id) {
 }
 
 double spyce_utc_to_et(std::string date) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     //acceptable date formats:
     //https://naif.jpl.nasa.gov/pub/naif/toolkit_docs/C/cspice/utc2et_c.html#Examples
 
@@ -115,6 +339,8 @@ double spyce_utc_to_et(std::string date) {
 }
 
 std::string spyce_et_to_utc(double et, std::string format) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     //acceptable date formats:
     //https://naif.jpl.nasa.gov/pub/naif/toolkit_docs/C/cspice/utc2et_c.html#Examples
 
@@ -125,80 +351,366 @@ std::string spyce_et_to_utc(double et, std::string format) {
     return std::string(date_out);
 }
 
+py::tuple spyce_utc_to_et_batch(py::object dates) {
+    //copy the strings out first so the conversion loop doesn't touch python objects
+    std::vector<std::string> date_strs(
+        (py::stl_input_iterator<std::string>(dates)),
+        py::stl_input_iterator<std::string>());
+    Py_intptr_t count = date_strs.size();
+
+    np::ndarray ets   = np::zeros(py::make_tuple(count), np::dtype::get_builtin<double>());
+    np::ndarray valid = np::zeros(py::make_tuple(count), np::dtype::get_builtin<bool>());
+
+    double *et_data    = reinterpret_cast<double *>(ets.get_data());
+    bool   *valid_data = reinterpret_cast<bool *>(valid.get_data());
+
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        CallTimer timer("utc_to_et_batch", count);
+
+        for(Py_intptr_t i = 0; i < count; i++) {
+            utc2et_c(date_strs[i].c_str(), &et_data[i]);
+
+            if(failed_c()) {
+                timer.swallow_spice_error();
+                et_data[i]    = 0;
+                valid_data[i] = false;
+            } else {
+                valid_data[i] = true;
+            }
+        }
+    }
+
+    return py::make_tuple(ets, valid);
+}
+
+py::tuple spyce_et_to_utc_batch(py::object e_times, std::string format) {
+    np::ndarray ets = np::from_object(e_times, np::dtype::get_builtin<double>(), 1, 1, np::ndarray::CARRAY_RO);
+    Py_intptr_t count = ets.shape(0);
+
+    np::ndarray valid = np::zeros(py::make_tuple(count), np::dtype::get_builtin<bool>());
+
+    const double *et_data    = reinterpret_cast<const double *>(ets.get_data());
+    bool         *valid_data = reinterpret_cast<bool *>(valid.get_data());
+
+    std::vector<std::string> date_strs(count);
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        CallTimer timer("et_to_utc_batch", count);
+
+        char date_out[DATE_STR_MAX];
+        for(Py_intptr_t i = 0; i < count; i++) {
+            et2utc_c(et_data[i], format.c_str(), 0, DATE_STR_MAX, date_out);
+
+            if(failed_c()) {
+                timer.swallow_spice_error();
+                valid_data[i] = false;
+            } else {
+                date_strs[i]  = date_out;
+                valid_data[i] = true;
+            }
+        }
+    }
+
+    py::list dates;
+    for(const std::string &date : date_strs) {
+        dates.append(date);
+    }
+
+    return py::make_tuple(dates, valid);
+}
+
 //File Operations
 namespace py = boost::python;
 py::list spyce_get_objects(std::string file) {
-    //NOTE: this cell is static per the macro definition
-    SPICEINT_CELL(id_list, SPYCE_OBJECTS_MAX);
-
-    //have to reset the cell so data doesn't persist per call
-    scard_c(0, &id_list);
-    check_spice_errors();
+    std::vector<int> ids;
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        //NOTE: this cell is static per the macro definition
+        SPICEINT_CELL(id_list, SPYCE_OBJECTS_MAX);
+
+        //have to reset the cell so data doesn't persist per call
+        scard_c(0, &id_list);
+        check_spice_errors();
 
-    py::list ret_obj;
-    spkobj_c(file.c_str(), &id_list);
-    check_spice_errors();
+        spkobj_c(file.c_str(), &id_list);
+        check_spice_errors();
 
-    int limit = card_c(&id_list);
-    check_spice_errors();
+        int limit = card_c(&id_list);
+        check_spice_errors();
 
-    for(int i = 0; i < limit; i++) {
-        ret_obj.append(SPICE_CELL_ELEM_I(&id_list, i));
+        for(int i = 0; i < limit; i++) {
+            ids.push_back(SPICE_CELL_ELEM_I(&id_list, i));
+        }
     }
 
+    py::list ret_obj;
+    for(int id : ids) {
+        ret_obj.append(id);
+    }
     return ret_obj;
 }
 
 namespace py = boost::python;
 py::list spyce_get_coverage_windows(std::string file, int obj_id) {
-    //NOTE: this cell is static per the macro definition
-    SPICEDOUBLE_CELL(cover, SPYCE_OBJECTS_MAX);
-
-    //have to reset the cell so data doesn't persist per call
-    scard_c(0, &cover);
-    check_spice_errors();
-
-    py::list ret_obj;
-    spkcov_c(file.c_str(), obj_id, &cover); //load coverage data of `obj` id
-    check_spice_errors();
+    Windows windows;
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        //NOTE: this cell is static per the macro definition
+        SPICEDOUBLE_CELL(cover, SPYCE_OBJECTS_MAX);
+
+        //have to reset the cell so data doesn't persist per call
+        scard_c(0, &cover);
+        check_spice_errors();
 
-    int limit = card_c(&cover) / 2;
-    check_spice_errors();
+        spkcov_c(file.c_str(), obj_id, &cover); //load coverage data of `obj` id
+        check_spice_errors();
 
-    double beg, end;
-    for(int i = 0; i < limit; i++) {
-        wnfetd_c(&cover, i, &beg, &end);
+        int limit = card_c(&cover) / 2;
         check_spice_errors();
 
-        ret_obj.append(py::make_tuple(beg,end));
+        double beg, end;
+        for(int i = 0; i < limit; i++) {
+            wnfetd_c(&cover, i, &beg, &end);
+            check_spice_errors();
+
+            windows.push_back(std::make_pair(beg, end));
+        }
     }
 
-    return ret_obj;
+    return windows_to_python(windows);
 }
 
 //Kernel functions
 void spyce_add_kernel(std::string s) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     furnsh_c(s.c_str());
     check_spice_errors();
 }
 
 void spyce_remove_kernel(std::string s) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     unload_c(s.c_str());
     check_spice_errors();
 }
-Frame spyce_get_frame_data(int target_id, int observer_id, double e_time) {
+Frame spyce_get_frame_data(int target_id, int observer_id, double e_time, std::string ref_frame, std::string abcorr) {
+    ReleaseGIL nogil;
+    std::lock_guard<std::mutex> lock(spice_mutex);
     SpiceDouble frame[6] = {0};
     SpiceDouble lt;
 
+    check_frame_args(ref_frame, abcorr);
     spkez_c(
-        target_id,   // target
-        e_time,      // epoch time
-        "J2000",     // reference frame, TODO: J2000 vs ECLIPJ2000 frame?
-        "NONE",      // Aberration correction setting.
-        observer_id, // observer reference
-        frame,       // output frame
-        &lt);        // output light time
+        target_id,         // target
+        e_time,            // epoch time
+        ref_frame.c_str(), // reference frame, e.g. J2000, ECLIPJ2000 or IAU_EARTH
+        abcorr.c_str(),    // Aberration correction setting.
+        observer_id,       // observer reference
+        frame,             // output frame
+        &lt);              // output light time
     check_spice_errors();
 
-    return Frame(frame);
-}
\ No newline at end of file
+    return Frame(frame, lt);
+}
+
+py::tuple spyce_get_frames_batch(int target_id, int observer_id, py::object e_times, std::string ref_frame, std::string abcorr, bool light_time) {
+    //accept any 1-d sequence of floats, copying only if it isn't already a contiguous float64 array
+    np::ndarray ets = np::from_object(e_times, np::dtype::get_builtin<double>(), 1, 1, np::ndarray::CARRAY_RO);
+    Py_intptr_t count = ets.shape(0);
+
+    np::ndarray frames = np::zeros(py::make_tuple(count, FRAME_SIZE), np::dtype::get_builtin<double>());
+    np::ndarray valid  = np::zeros(py::make_tuple(count), np::dtype::get_builtin<bool>());
+    np::ndarray lts    = np::zeros(py::make_tuple(count), np::dtype::get_builtin<double>());
+
+    const double *et_data    = reinterpret_cast<const double *>(ets.get_data());
+    SpiceDouble  *frame_data = reinterpret_cast<SpiceDouble *>(frames.get_data());
+    bool         *valid_data = reinterpret_cast<bool *>(valid.get_data());
+    SpiceDouble  *lt_data    = reinterpret_cast<SpiceDouble *>(lts.get_data());
+
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        check_frame_args(ref_frame, abcorr);
+        CallTimer timer("get_frames_batch", count);
+
+        for(Py_intptr_t i = 0; i < count; i++) {
+            SpiceDouble *frame = frame_data + i * FRAME_SIZE;
+
+            spkez_c(target_id, et_data[i], ref_frame.c_str(), abcorr.c_str(), observer_id, frame, &lt_data[i]);
+
+            //failed epochs are reported through the mask instead of throwing,
+            // so a gap in coverage doesn't abort the whole batch
+            if(failed_c()) {
+                timer.swallow_spice_error();
+                std::memset(frame, 0, FRAME_SIZE * sizeof(SpiceDouble));
+                lt_data[i]    = 0;
+                valid_data[i] = false;
+            } else {
+                valid_data[i] = true;
+            }
+        }
+    }
+
+    if(light_time)
+        return py::make_tuple(frames, valid, lts);
+    return py::make_tuple(frames, valid);
+}
+
+py::tuple spyce_get_frames_multi(py::object target_ids, int observer_id, py::object e_times, std::string ref_frame, std::string abcorr, bool light_time) {
+    std::vector<int> targets(
+        (py::stl_input_iterator<int>(target_ids)),
+        py::stl_input_iterator<int>());
+    np::ndarray ets = np::from_object(e_times, np::dtype::get_builtin<double>(), 1, 1, np::ndarray::CARRAY_RO);
+    Py_intptr_t num_targets = targets.size();
+    Py_intptr_t count       = ets.shape(0);
+
+    np::ndarray frames = np::zeros(py::make_tuple(num_targets, count, FRAME_SIZE), np::dtype::get_builtin<double>());
+    np::ndarray valid  = np::zeros(py::make_tuple(num_targets, count), np::dtype::get_builtin<bool>());
+    np::ndarray lts    = np::zeros(py::make_tuple(num_targets, count), np::dtype::get_builtin<double>());
+
+    const double *et_data    = reinterpret_cast<const double *>(ets.get_data());
+    SpiceDouble  *frame_data = reinterpret_cast<SpiceDouble *>(frames.get_data());
+    bool         *valid_data = reinterpret_cast<bool *>(valid.get_data());
+    SpiceDouble  *lt_data    = reinterpret_cast<SpiceDouble *>(lts.get_data());
+
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        check_frame_args(ref_frame, abcorr);
+        CallTimer timer("get_frames_multi", num_targets * count);
+
+        for(Py_intptr_t t = 0; t < num_targets; t++) {
+            for(Py_intptr_t i = 0; i < count; i++) {
+                Py_intptr_t  row   = t * count + i;
+                SpiceDouble *frame = frame_data + row * FRAME_SIZE;
+
+                spkez_c(targets[t], et_data[i], ref_frame.c_str(), abcorr.c_str(), observer_id, frame, &lt_data[row]);
+
+                if(failed_c()) {
+                    timer.swallow_spice_error();
+                    std::memset(frame, 0, FRAME_SIZE * sizeof(SpiceDouble));
+                    lt_data[row]    = 0;
+                    valid_data[row] = false;
+                } else {
+                    valid_data[row] = true;
+                }
+            }
+        }
+    }
+
+    if(light_time)
+        return py::make_tuple(frames, valid, lts);
+    return py::make_tuple(frames, valid);
+}
+
+//Geometry Finder
+py::list spyce_find_distance_windows(int target_id, int observer_id, std::string relate, double distance, py::object windows, double step, std::string abcorr) {
+    Windows confinement = windows_from_python(windows);
+    Windows found;
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        check_option(relate, DISTANCE_RELATIONS, "Invalid Relation");
+        check_abcorr(abcorr, true);
+        CallTimer timer("find_distance_windows", confinement.size());
+
+        //NOTE: these cells are static per the macro definition
+        SPICEDOUBLE_CELL(cnfine, 2 * GF_MAX_WINDOWS);
+        SPICEDOUBLE_CELL(result, 2 * GF_MAX_WINDOWS);
+        set_confinement_window(confinement, &cnfine);
+        scard_c(0, &result);
+
+        gfdist_c(
+            std::to_string(target_id).c_str(),   // target
+            abcorr.c_str(),                      // aberration correction
+            std::to_string(observer_id).c_str(), // observer
+            relate.c_str(),                      // relation, or the kind of extremum
+            distance,                            // reference value (km), for =, < and >
+            0,                                   // adjustment value, for ABSMIN and ABSMAX
+            step,                                // search step size (s)
+            GF_MAX_WINDOWS,                      // workspace window intervals
+            &cnfine,
+            &result);
+        check_spice_errors();
+
+        found = get_result_windows(&result);
+    }
+    return windows_to_python(found);
+}
+
+py::list spyce_find_occultation_windows(std::string occultation_type, int front_id, int back_id, int observer_id, py::object windows, double step, std::string abcorr) {
+    Windows confinement = windows_from_python(windows);
+    Windows found;
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        check_option(occultation_type, OCCULTATION_TYPES, "Invalid Occultation Type");
+        check_abcorr(abcorr, false);
+        CallTimer timer("find_occultation_windows", confinement.size());
+
+        std::string front_shape, front_frame, back_shape, back_frame;
+        occultation_shape(front_id, front_shape, front_frame);
+        occultation_shape(back_id, back_shape, back_frame);
+        if(front_shape == "POINT")
+            throw InsufficientDataException();
+        if(back_shape == "POINT" && !eqstr_c(occultation_type.c_str(), "ANY"))
+            throw InvalidArgumentException("Only ANY Occultations Of A Point");
+
+        //NOTE: these cells are static per the macro definition
+        SPICEDOUBLE_CELL(cnfine, 2 * GF_MAX_WINDOWS);
+        SPICEDOUBLE_CELL(result, 2 * GF_MAX_WINDOWS);
+        set_confinement_window(confinement, &cnfine);
+        scard_c(0, &result);
+
+        gfoclt_c(
+            occultation_type.c_str(),
+            std::to_string(front_id).c_str(),    // occulting body
+            front_shape.c_str(),
+            front_frame.c_str(),
+            std::to_string(back_id).c_str(),     // occulted body
+            back_shape.c_str(),
+            back_frame.c_str(),
+            abcorr.c_str(),                      // aberration correction
+            std::to_string(observer_id).c_str(), // observer
+            step,                                // search step size (s)
+            &cnfine,
+            &result);
+        check_spice_errors();
+
+        found = get_result_windows(&result);
+    }
+    return windows_to_python(found);
+}
+
+//Statistics
+py::dict spyce_get_stats() {
+    std::map<std::string, CallStats> snapshot;
+    {
+        ReleaseGIL nogil;
+        std::lock_guard<std::mutex> lock(spice_mutex);
+        snapshot = call_stats;
+    }
+
+    py::dict stats;
+    for(const auto &entry : snapshot) {
+        py::dict errors;
+        for(const auto &error : entry.second.errors) {
+            errors[error.first] = error.second;
+        }
+
+        py::dict function;
+        function["calls"]   = entry.second.calls;
+        function["items"]   = entry.second.items;
+        function["seconds"] = entry.second.seconds;
+        function["errors"]  = errors;
+        stats[entry.first]  = function;
+    }
+
+    return stats;
+}
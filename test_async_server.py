@@ -0,0 +1,259 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+import async_server
+
+
+#
+# Fixtures
+#
+
+
+class SlowApp:
+    """
+    WSGI app that counts its calls and takes a while to answer, so that
+    concurrent requests overlap
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.calls += 1
+        body = environ['wsgi.input'].read()
+        time.sleep(0.2)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        if environ['PATH_INFO'] == '/stream':
+            return iter([b'a', b'b', b'c'])
+        return [environ['PATH_INFO'].encode() + b' ' + environ['QUERY_STRING'].encode() + b' ' + body]
+
+
+class StreamingApp:
+    """
+    WSGI app streaming events STREAM_PERIOD apart on /api/stream (as many
+    as the query string says, default STREAM_EVENTS), paced like
+    FlaskServer.stream_frames(), and answering anything else right away
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.closed = 0
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        if environ['PATH_INFO'] == '/api/stream':
+            return self.stream(environ.get(async_server.PACING_ENVIRON_KEY),
+                               int(environ['QUERY_STRING'] or STREAM_EVENTS))
+        return [b'ok']
+
+    def stream(self, pacing, events):
+        started = time.monotonic()
+        try:
+            for i in range(events):
+                send_at = started + i * STREAM_PERIOD
+                if pacing is not None:
+                    pacing['send_at'] = send_at
+                elif send_at > time.monotonic():
+                    time.sleep(send_at - time.monotonic())
+                self.events += 1
+                yield b'data\n\n'
+        finally:
+            self.closed += 1
+
+
+STREAM_EVENTS = 3
+STREAM_PERIOD = 0.5
+
+
+@pytest.fixture
+def wsgi_app():
+    return SlowApp()
+
+
+@pytest.fixture
+def asgi_app(wsgi_app):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        yield async_server.AsyncWSGIApp(wsgi_app, executor)
+
+
+async def call(app, path, body=b'', query=b'', headers=()):
+    """
+    Send one HTTP request to an ASGI app, returning (status, body)
+    """
+    request = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if request:
+            return request.pop(0)
+        # The client stays connected until the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query,
+        'headers': [(b'content-type', b'application/json')] + list(headers),
+        'server': ('localhost', 5000),
+        'client': ('127.0.0.1', 12345),
+    }
+    await app(scope, receive, send)
+    return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:])
+
+
+#
+# Tests
+#
+
+
+def test_identical_requests_coalesced(asgi_app, wsgi_app):
+    async def run():
+        return await asyncio.gather(*[
+            call(asgi_app, '/api/objects/main/frames', b'{"times": []}') for _ in range(5)
+        ])
+
+    responses = asyncio.run(run())
+    assert wsgi_app.calls == 1
+    assert asgi_app.coalesced == 4
+    assert responses == [(200, b'/api/objects/main/frames  {"times": []}')] * 5
+    assert asgi_app.in_flight == {}
+
+
+def test_different_requests_not_coalesced(asgi_app, wsgi_app):
+    async def run():
+        return await asyncio.gather(
+            call(asgi_app, '/api/objects/main/frames', b'{"times": []}'),
+            call(asgi_app, '/api/objects/main/frames', b'{"times": ["2000-01-01"]}'),
+            call(asgi_app, '/api/objects/main/frames', b'{"times": []}', query=b'format=binary'),
+            call(asgi_app, '/api/objects/main/frames', b'{"times": []}',
+                 headers=[(b'accept', b'application/octet-stream')]),
+        )
+
+    responses = asyncio.run(run())
+    assert wsgi_app.calls == 4
+    assert responses[2] == (200, b'/api/objects/main/frames format=binary {"times": []}')
+
+
+def test_sequential_requests_not_coalesced(asgi_app, wsgi_app):
+    async def run():
+        first = await call(asgi_app, '/api/objects/main/frames', b'{}')
+        second = await call(asgi_app, '/api/objects/main/frames', b'{}')
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert wsgi_app.calls == 2
+
+
+def test_other_paths_not_coalesced(asgi_app, wsgi_app):
+    async def run():
+        return await asyncio.gather(*[call(asgi_app, '/api/convert/et', b'{}') for _ in range(3)])
+
+    asyncio.run(run())
+    assert wsgi_app.calls == 3
+
+
+def test_coalesced_responses_streamed():
+    calls = []
+
+    def chunked_app(environ, start_response):
+        calls.append(environ['PATH_INFO'])
+        start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+
+        def chunks():
+            yield b'first\n'
+            time.sleep(0.5)
+            yield b'second\n'
+        return chunks()
+
+    async def timed_call(app):
+        started = time.monotonic()
+        first_body = []
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'{}', 'more_body': False}
+
+        async def send(message):
+            if message.get('body') and not first_body:
+                first_body.append(time.monotonic() - started)
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/objects/main/frames', 'query_string': b'',
+                 'headers': []}
+        await app(scope, receive, send)
+        return first_body[0], b''.join(m.get('body', b'') for m in sent[1:])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        app = async_server.AsyncWSGIApp(chunked_app, executor)
+
+        async def run():
+            return await asyncio.gather(*[timed_call(app) for _ in range(3)])
+
+        responses = asyncio.run(run())
+
+    # Every client got the first chunk before the second one was computed
+    assert calls == ['/api/objects/main/frames']
+    assert app.coalesced == 2
+    assert all(first < 0.4 for first, _ in responses)
+    assert [body for _, body in responses] == [b'first\nsecond\n'] * 3
+    assert app.in_flight == {}
+
+
+def test_streamed_response(asgi_app):
+    assert asyncio.run(call(asgi_app, '/stream')) == (200, b'abc')
+
+
+def test_streams_do_not_hold_threads():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        app = async_server.AsyncWSGIApp(StreamingApp(), executor)
+
+        async def run():
+            streams = [asyncio.ensure_future(call(app, '/api/stream')) for _ in range(10)]
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            response = await call(app, '/api/objects')
+            elapsed = time.monotonic() - started
+            return response, elapsed, await asyncio.gather(*streams)
+
+        response, elapsed, streams = asyncio.run(run())
+
+    assert response == (200, b'ok')
+    assert elapsed < STREAM_PERIOD
+    assert streams == [(200, b'data\n\n' * STREAM_EVENTS)] * 10
+
+
+def test_stream_stopped_on_disconnect():
+    wsgi_app = StreamingApp()
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(STREAM_PERIOD * 1.5)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/api/stream', 'query_string': b'1000', 'headers': []}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        app = async_server.AsyncWSGIApp(wsgi_app, executor)
+        environ = async_server.build_environ(scope, b'')
+        asyncio.run(asyncio.wait_for(app.streamed_call(environ, receive, send), timeout=5))
+
+    # The events at 0 and STREAM_PERIOD were sent, then the stream was
+    # stopped and closed without computing more
+    assert [m.get('body') for m in sent[1:]] == [b'data\n\n'] * 2
+    assert wsgi_app.events == 3
+    assert wsgi_app.closed == 1
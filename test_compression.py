@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+import werkzeug.datastructures
+import werkzeug.http
+
+import compression
+
+
+#
+# Tests
+#
+
+
+def accept_encodings(header):
+    """
+    Parse an Accept-Encoding header the way Flask does
+    """
+    return werkzeug.http.parse_accept_header(header, werkzeug.datastructures.Accept)
+
+
+def test_choose_encoding(monkeypatch):
+    """
+    Test content coding negotiation, with and without brotli
+    """
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert compression.choose_encoding(accept_encodings('')) is None
+    assert compression.choose_encoding(accept_encodings('identity')) is None
+    assert compression.choose_encoding(accept_encodings('gzip, deflate, br')) == 'gzip'
+    assert compression.choose_encoding(accept_encodings('*')) == 'gzip'
+    assert compression.choose_encoding(accept_encodings('gzip;q=0')) is None
+
+    monkeypatch.setattr(compression, 'brotli', object())
+    assert compression.choose_encoding(accept_encodings('gzip, deflate, br')) == 'br'
+    assert compression.choose_encoding(accept_encodings('gzip, br;q=0.5')) == 'gzip'
+
+
+def test_gzip():
+    """
+    Test that whole and chunked gzip bodies decompress to the original
+    """
+    chunks = [('chunk %d,' % i).encode() * 100 for i in range(20)]
+    data = b''.join(chunks)
+
+    assert gzip.decompress(compression.compress(data, 'gzip')) == data
+
+    compressed = list(compression.compress_chunks(iter(chunks), 'gzip'))
+    assert gzip.decompress(b''.join(compressed)) == data
+    # Every chunk is flushed as it comes
+    assert len(compressed) == len(chunks) + 1
+
+
+def test_brotli():
+    """
+    Test that whole and chunked brotli bodies decompress to the original
+    """
+    brotli = pytest.importorskip('brotli')
+    chunks = [('chunk %d,' % i).encode() * 100 for i in range(20)]
+    data = b''.join(chunks)
+
+    assert brotli.decompress(compression.compress(data, 'br')) == data
+    assert brotli.decompress(b''.join(compression.compress_chunks(iter(chunks), 'br'))) == data
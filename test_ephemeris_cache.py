@@ -0,0 +1,129 @@
+import pathlib
+import threading
+import time
+
+import numpy
+import pytest
+
+import ephemeris_cache
+import spyce
+
+#
+# Constants
+#
+
+STATIC_FOLDER = pathlib.Path('tests_static')
+
+KERNEL_FILES = [
+    STATIC_FOLDER / 'latest_leapseconds.tls',
+    STATIC_FOLDER / 'de430.bsp',
+    STATIC_FOLDER / 'apollo15-1.bsp',
+    STATIC_FOLDER / 'apollo_naif_ids.tf',
+]
+APOLLO_BSP_FILE = STATIC_FOLDER / 'apollo15-1.bsp'
+APOLLO15_INT_ID = -915
+EARTH_INT_ID = 399
+MOON_INT_ID = 301
+
+
+#
+# Fixtures
+#
+
+
+@pytest.fixture(scope='module')
+def kernel_files():
+    """
+    Fixture for loading the kernel files used by these tests
+    """
+    for fn in KERNEL_FILES:
+        spyce.add_kernel(str(fn.resolve()))
+
+    yield
+
+    for fn in KERNEL_FILES:
+        spyce.remove_kernel(str(fn.resolve()))
+
+
+def apollo_coverage_windows(obj_id):
+    """
+    Coverage window lookup for the cache, using only the Apollo 15 kernel
+    """
+    return spyce.get_coverage_windows(str(APOLLO_BSP_FILE), obj_id)
+
+
+#
+# EphemerisCache tests
+#
+
+
+@pytest.mark.parametrize('observer', [EARTH_INT_ID, MOON_INT_ID])
+def test_cache_matches_spyce(kernel_files, observer):
+    """
+    Test that cached answers stay within the configured tolerances.
+    """
+    cache = ephemeris_cache.EphemerisCache(apollo_coverage_windows, tolerance=1e-3, velocity_tolerance=1e-6)
+
+    # Both coverage windows, the gap between them, and times outside them
+    (start, _), (_, end) = apollo_coverage_windows(APOLLO15_INT_ID)
+    ets = numpy.linspace(start - 3600, end + 3600, 5000)
+
+    expected_states, expected_valid = spyce.get_frames_batch(APOLLO15_INT_ID, observer, ets)
+    states, valid = cache.get_frames_batch(APOLLO15_INT_ID, observer, ets)
+
+    assert valid.tolist() == expected_valid.tolist()
+    assert numpy.abs(states[:, :3] - expected_states[:, :3]).max() <= 1e-3
+    assert numpy.abs(states[:, 3:] - expected_states[:, 3:]).max() <= 1e-6
+    assert cache.hits > 0
+
+    # Asking again should be answered without refitting
+    hits, misses, nbytes = cache.hits, cache.misses, cache.nbytes
+    cache.get_frames_batch(APOLLO15_INT_ID, observer, ets)
+    assert cache.hits - hits == hits
+    assert cache.nbytes == nbytes
+
+
+def test_cache_memory_cap(kernel_files):
+    """
+    Test that segments are evicted to respect max_bytes, and that clear()
+    drops everything.
+    """
+    cache = ephemeris_cache.EphemerisCache(apollo_coverage_windows, max_bytes=1, segment_length=3600)
+
+    (start, end), _ = apollo_coverage_windows(APOLLO15_INT_ID)
+    states, valid = cache.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, numpy.linspace(start, end, 100))
+    assert valid.all()
+    assert len(cache._segments) == 1
+
+    cache.clear()
+    assert len(cache._segments) == 0
+    assert cache.nbytes == 0
+
+
+def test_concurrent_misses_fit_once():
+    """
+    Test that threads missing the same segment at once share one fit.
+    """
+    calls = []
+
+    def compute(target_id, observer_id, ets):
+        calls.append(len(ets))
+        time.sleep(0.05)
+        # Moving in a straight line, which any fit matches
+        states = numpy.outer(ets, [1, 2, 3, 0, 0, 0]) + [0, 0, 0, 1, 2, 3]
+        return states, numpy.ones(len(ets), dtype=bool)
+
+    cache = ephemeris_cache.EphemerisCache(lambda obj_id: [(0.0, 86400.0)], compute=compute)
+    ets = numpy.linspace(0, 86400, 10)
+    threads = [threading.Thread(target=cache.get_frames_batch, args=(APOLLO15_INT_ID, EARTH_INT_ID, ets))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One usable fit samples the nodes and the check points once each
+    assert len(calls) == 2
+    assert len(cache._segments) == 1
+    assert cache.hits == 8 * len(ets)
+    assert cache._fitting == {}
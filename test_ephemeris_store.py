@@ -0,0 +1,188 @@
+import pathlib
+import tracemalloc
+
+import numpy
+import pytest
+
+import ephemeris_store
+import spyce
+
+#
+# Constants
+#
+
+STATIC_FOLDER = pathlib.Path('tests_static')
+
+KERNEL_FILES = [
+    STATIC_FOLDER / 'latest_leapseconds.tls',
+    STATIC_FOLDER / 'de430.bsp',
+    STATIC_FOLDER / 'apollo15-1.bsp',
+    STATIC_FOLDER / 'apollo_naif_ids.tf',
+]
+APOLLO_BSP_FILE = STATIC_FOLDER / 'apollo15-1.bsp'
+APOLLO15_INT_ID = -915
+EARTH_INT_ID = 399
+MOON_INT_ID = 301
+
+STORE_STEP = 10.0
+
+
+#
+# Fixtures
+#
+
+
+@pytest.fixture(scope='module')
+def kernel_files():
+    """
+    Fixture for loading the kernel files used by these tests
+    """
+    for fn in KERNEL_FILES:
+        spyce.add_kernel(str(fn.resolve()))
+
+    yield
+
+    for fn in KERNEL_FILES:
+        spyce.remove_kernel(str(fn.resolve()))
+
+
+@pytest.fixture(scope='module')
+def store_path(kernel_files, tmp_path_factory):
+    """
+    Fixture baking a store of Apollo 15 relative to the Earth
+    """
+    path = str(tmp_path_factory.mktemp('store') / 'ephemeris.store')
+    ephemeris_store.bake(path, [str(fn) for fn in KERNEL_FILES], [APOLLO15_INT_ID],
+                         apollo_coverage_windows, EARTH_INT_ID, step=STORE_STEP)
+    return path
+
+
+def circular_orbit(target_id, observer_id, ets):
+    """
+    States of an object on a circular orbit, with the signature of
+    spyce.get_frames_batch()
+    """
+    angle = ets / 10000.0
+    radius = 10000.0
+    states = numpy.stack([radius * numpy.cos(angle), radius * numpy.sin(angle), numpy.zeros_like(ets),
+                          -numpy.sin(angle), numpy.cos(angle), numpy.zeros_like(ets)], axis=1)
+    return states, numpy.ones(len(ets), dtype=bool)
+
+
+def apollo_coverage_windows(obj_id):
+    """
+    Coverage window lookup for the store, using only the Apollo 15 kernel
+    """
+    return spyce.get_coverage_windows(str(APOLLO_BSP_FILE), obj_id)
+
+
+#
+# EphemerisStore tests
+#
+
+
+def test_store_matches_spyce(store_path):
+    """
+    Test that stored answers stay within the configured tolerances, in
+    and out of the baked coverage windows.
+    """
+    store = ephemeris_store.EphemerisStore(store_path, tolerance=1e-3, velocity_tolerance=1e-6)
+    assert store.observer == EARTH_INT_ID
+    assert store.step == STORE_STEP
+
+    (start, _), (_, end) = apollo_coverage_windows(APOLLO15_INT_ID)
+    ets = numpy.linspace(start - 3600, end + 3600, 5000)
+
+    expected_states, expected_valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+    states, valid = store.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+
+    assert valid.tolist() == expected_valid.tolist()
+    assert numpy.abs(states[:, :3] - expected_states[:, :3]).max() <= 1e-3
+    assert numpy.abs(states[:, 3:] - expected_states[:, 3:]).max() <= 1e-6
+    assert store.hits > 0
+    assert store.misses > 0
+
+
+def test_store_fallback(store_path):
+    """
+    Test that other observers and objects are passed on to spyce, as are
+    objects that weren't baked accurately enough.
+    """
+    store = ephemeris_store.EphemerisStore(store_path)
+    (start, end), _ = apollo_coverage_windows(APOLLO15_INT_ID)
+    ets = numpy.linspace(start, end, 100)
+
+    for target, observer in [(APOLLO15_INT_ID, MOON_INT_ID), (MOON_INT_ID, EARTH_INT_ID)]:
+        expected_states, expected_valid = spyce.get_frames_batch(target, observer, ets)
+        states, valid = store.get_frames_batch(target, observer, ets)
+        assert valid.tolist() == expected_valid.tolist()
+        assert numpy.array_equal(states, expected_states)
+    assert store.hits == 0
+
+    strict = ephemeris_store.EphemerisStore(store_path, tolerance=0.0, velocity_tolerance=0.0)
+    strict.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+    assert strict.hits == 0
+
+
+def test_store_is_current(store_path):
+    """
+    Test that a store is only current for the kernels it was baked from.
+    """
+    store = ephemeris_store.EphemerisStore(store_path)
+    assert store.is_current([str(fn) for fn in KERNEL_FILES])
+    assert not store.is_current([str(fn) for fn in KERNEL_FILES[:-1]])
+    assert not store.is_current([str(fn) for fn in reversed(KERNEL_FILES)])
+    assert not store.is_current([str(STATIC_FOLDER / 'no_such_kernel.bsp')])
+
+
+def test_bake_in_chunks(tmp_path):
+    """
+    Test that baking long coverage only holds one chunk of samples in
+    memory at a time, and gives the same store as baking it in one go.
+    """
+    windows = [(0.0, 1000000.0), (2000000.0, 2500000.5)]
+    path = str(tmp_path / 'chunked.store')
+    whole_path = str(tmp_path / 'whole.store')
+
+    tracemalloc.start()
+    ephemeris_store.bake(path, [], [APOLLO15_INT_ID], lambda obj_id: windows, EARTH_INT_ID,
+                         step=1.0, compute=circular_orbit, chunk_size=10000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The 1.5 million samples take 84 MB in the store
+    assert peak < 10 * 1024 * 1024
+
+    ephemeris_store.bake(whole_path, [], [APOLLO15_INT_ID], lambda obj_id: windows, EARTH_INT_ID,
+                         step=1.0, compute=circular_orbit, chunk_size=10 ** 7)
+    store = ephemeris_store.EphemerisStore(path, compute=circular_orbit)
+    whole = ephemeris_store.EphemerisStore(whole_path)
+    assert store.header == whole.header
+    assert numpy.array_equal(store._objects[APOLLO15_INT_ID], whole._objects[APOLLO15_INT_ID])
+    assert store._objects[APOLLO15_INT_ID][0, -1] == 2500000.5
+
+    ets = numpy.linspace(-10.0, 2600000.0, 1000)
+    expected_states, expected_valid = circular_orbit(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+    states, valid = store.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+    assert valid.all()
+    assert numpy.abs(states - expected_states).max() <= 1e-3
+    assert store.hits > 0
+
+
+def test_bake_limits(tmp_path):
+    """
+    Test that objects over the sample limit are skipped, and that the time
+    range limits what is baked.
+    """
+    path = str(tmp_path / 'ephemeris.store')
+    # Like de430.bsp: more than a thousand years of coverage
+    windows = [(-2e10, 2e10)]
+
+    ephemeris_store.bake(path, [], [APOLLO15_INT_ID], lambda obj_id: windows, EARTH_INT_ID,
+                         compute=circular_orbit)
+    assert ephemeris_store.EphemerisStore(path).header['objects'] == []
+
+    ephemeris_store.bake(path, [], [APOLLO15_INT_ID], lambda obj_id: windows, EARTH_INT_ID,
+                         compute=circular_orbit, start=0.0, end=86400.0)
+    columns = ephemeris_store.EphemerisStore(path)._objects[APOLLO15_INT_ID]
+    assert columns.shape == (7, 1441)
+    assert (columns[0, 0], columns[0, -1]) == (0.0, 86400.0)
@@ -1,9 +1,12 @@
 import contextlib
+import gzip
 import os, os.path
 import pathlib
+import struct
 import sys
 
 import flask
+import numpy
 import pytest
 
 import FlaskServer
@@ -24,6 +27,7 @@ APOLLO15_STR_ID = 'APOLLO15'
 APOLLO15_SERVER_RESPONSE = {'id': APOLLO15_INT_ID, 'name': APOLLO15_STR_ID}
 
 MOON_STR_ID = 'MOON'
+EARTH_INT_ID = 399
 
 CONFIG_KERNELS = pathlib.Path('config/kernels').resolve()
 STATIC_FOLDER = pathlib.Path('tests_static').resolve()
@@ -66,9 +70,8 @@ def testing_config():
 
     yield
 
-    for k in FlaskServer.kernels:
-        spyce.remove_kernel(k)
-    FlaskServer.kernels.clear()
+    for k in list(FlaskServer.kernels):
+        FlaskServer.remove_kernel(k)
 
 
 #
@@ -138,11 +141,19 @@ def test_get_object_coverage(client, testing_config):
     Test the /api/objects/<id>/coverage endpoint
     """
     APOLLO15_COVERAGE_WINDOWS_SERVER_RESPONSE = {'start': '1971-07-30T01:00:00', 'end': '1971-08-01T14:30:00'}
+    APOLLO15_COVERAGE_WINDOWS = [
+        {'start': '1971-07-30T01:00:00', 'end': '1971-07-30T20:00:00',
+         'start_et': pytest.approx(-897044358.3260887), 'end_et': pytest.approx(-896975958.324057)},
+        {'start': '1971-07-30T20:30:00', 'end': '1971-08-01T14:30:00',
+         'start_et': pytest.approx(-896974158.3240035), 'end_et': pytest.approx(-896822958.3195117)},
+    ]
 
     # Test both by ID and by name
     for id in [str(APOLLO15_INT_ID), APOLLO15_STR_ID]:
         resp = client.get('/api/objects/' + id + '/coverage')
-        assert resp.get_json() == APOLLO15_COVERAGE_WINDOWS_SERVER_RESPONSE
+        coverage = resp.get_json()
+        assert coverage.pop('windows') == APOLLO15_COVERAGE_WINDOWS
+        assert coverage == APOLLO15_COVERAGE_WINDOWS_SERVER_RESPONSE
 
     # Response for nonexistent object
     resp = client.get('/api/objects/' + str(INVALID_ID) + '/coverage')
@@ -224,6 +235,463 @@ def test_post_object_frames(client, testing_config):
     assert resp.status_code == 404
 
 
+def test_post_object_frames_range(client, testing_config):
+    """
+    Test the /api/objects/<id>/frames (POST) endpoint with a time range
+    """
+    START = '1971-07-31T01:00:00'
+    END = '1971-07-31T02:00:00'
+
+    def frames_for(body):
+        resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames', json=body)
+        assert resp.status_code == 200
+        return resp.get_json()
+
+    # The endpoints of the range should match explicitly requested times
+    explicit = frames_for({'times': [START, END]})
+    by_step = frames_for({'start': START, 'end': END, 'step': 1500})
+    assert [f['date'] for f in by_step] == [START, '1971-07-31T01:25:00', '1971-07-31T01:50:00', END]
+    assert by_step[0]['frame'] == explicit[0]['frame']
+    assert by_step[-1]['frame'] == explicit[1]['frame']
+    assert by_step[1]['et'] - by_step[0]['et'] == pytest.approx(1500)
+
+    by_count = frames_for({'start': START, 'end': END, 'count': 5})
+    assert [f['date'] for f in by_count] == [START, '1971-07-31T01:15:00', '1971-07-31T01:30:00', '1971-07-31T01:45:00', END]
+
+    # Dates can be left out
+    without_dates = frames_for({'start': START, 'end': END, 'count': 5, 'dates': False})
+    assert all('date' not in f for f in without_dates)
+    assert [f['et'] for f in without_dates] == [f['et'] for f in by_count]
+
+    # Times outside of the coverage are left out
+    assert frames_for({'start': '1965-01-11T01:00:00', 'end': '1965-01-11T02:00:00', 'count': 3}) == []
+
+    # Binary format, selected by query parameter or Accept header
+    for query, headers in [('?format=binary', {}), ('', {'Accept': 'application/octet-stream'})]:
+        resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames' + query,
+                           json={'start': START, 'end': END, 'count': 5}, headers=headers)
+        assert resp.mimetype == 'application/octet-stream'
+        magic, version, value_size, count, num_columns = struct.unpack_from('<4sHHII', resp.data)
+        assert (magic, version, value_size, count, num_columns) == (b'FRMS', 1, 8, 5, 7)
+        assert len(resp.data) == 16 + 8 * 5 * 7
+        ets = numpy.frombuffer(resp.data, dtype='<f8', count=5, offset=16)
+        columns = numpy.frombuffer(resp.data, dtype='<f8', offset=16 + 8 * 5).reshape(6, 5)
+        assert ets.tolist() == [f['et'] for f in by_count]
+        assert columns[:, 0].tolist() == list(explicit[0]['frame'][k] for k in ('x', 'y', 'z', 'dx', 'dy', 'dz'))
+
+    # Binary format with float32 state columns
+    resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames?format=binary&dtype=float32',
+                       json={'times': [START, END]})
+    magic, version, value_size, count, num_columns = struct.unpack_from('<4sHHII', resp.data)
+    assert (value_size, count) == (4, 2)
+    assert len(resp.data) == 16 + 8 * 2 + 4 * 2 * 6
+    columns = numpy.frombuffer(resp.data, dtype='<f4', offset=16 + 8 * 2).reshape(6, 2)
+    assert columns[0, 1] == pytest.approx(explicit[1]['frame']['x'])
+
+    resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames?format=xml', json={'times': [START]})
+    assert resp.status_code == 400
+
+    # Malformed ranges
+    for body in [
+            {'start': START, 'end': END},
+            {'start': START, 'end': END, 'step': 60, 'count': 3},
+            {'start': START, 'end': END, 'step': 0},
+            {'start': START, 'end': END, 'count': 0},
+            {'start': END, 'end': START, 'count': 3},
+            {'start': 'not a date', 'end': END, 'count': 3},
+            {'end': END, 'count': 3}]:
+        resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames', json=body)
+        assert resp.status_code == 400
+
+
+def test_post_object_trail(client, testing_config):
+    """
+    Test the /api/objects/<id>/trail (POST) endpoint
+    """
+    BODY = {'start': '1971-07-30T01:00:00', 'end': '1971-08-01T14:30:00', 'tolerances': [20, 200]}
+
+    resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/trail', json=BODY)
+    assert resp.status_code == 200
+    trail = resp.get_json()
+    assert trail['tolerances'] == [200, 20]
+    ets = [f['et'] for f in trail['frames']]
+    assert ets == sorted(ets)
+    assert {f['level'] for f in trail['frames']} <= {0, 1}
+
+    # Points should be exact frames, and finer levels should add points
+    first = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames', json={'times': [BODY['start']]}).get_json()
+    assert trail['frames'][0]['frame'] == first[0]['frame']
+    coarse = [f for f in trail['frames'] if f['level'] == 0]
+    assert 2 <= len(coarse) < len(trail['frames'])
+
+    # Binary format with a level column
+    resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/trail?format=binary', json=BODY)
+    magic, version, value_size, count, num_columns = struct.unpack_from('<4sHHII', resp.data)
+    assert (count, num_columns) == (len(ets), 8)
+    levels = numpy.frombuffer(resp.data, dtype='<f8', offset=16 + 8 * count * 7)
+    assert levels.tolist() == [f['level'] for f in trail['frames']]
+
+    # A trail outside the object's coverage is empty, which the web client
+    # has to handle
+    resp = client.post('/api/objects/' + APOLLO15_STR_ID + '/trail?format=binary',
+                       json=dict(BODY, start='2000-01-01T00:00:00', end='2000-01-02T00:00:00'))
+    assert resp.status_code == 200
+    assert struct.unpack_from('<4sHHII', resp.data)[3:] == (0, 8)
+    assert len(resp.data) == 16
+
+    for body in [dict(BODY, tolerances=[]), dict(BODY, tolerances=[-1]), dict(BODY, min_step=7200, max_step=3600),
+                 dict(BODY, max_step=0), {'tolerances': [20]}]:
+        assert client.post('/api/objects/' + APOLLO15_STR_ID + '/trail', json=body).status_code == 400
+
+
+def test_frame_options(client, testing_config):
+    """
+    Test frames in other reference frames, with aberration corrections
+    and with light times
+    """
+    url = '/api/objects/' + APOLLO15_STR_ID + '/frames'
+    BODY = {'start': '1971-07-30T01:00:00', 'end': '1971-08-01T14:30:00', 'count': 5}
+    CLIGHT = 299792.458
+
+    def positions(body):
+        resp = client.post(url, json=body)
+        assert resp.status_code == 200
+        return numpy.array([[f['frame'][c] for c in 'xyz'] for f in resp.get_json()])
+
+    j2000 = positions(BODY)
+    ecliptic = positions(dict(BODY, frame='ECLIPJ2000'))
+    assert numpy.linalg.norm(ecliptic, axis=1) == pytest.approx(numpy.linalg.norm(j2000, axis=1))
+    assert not numpy.allclose(ecliptic, j2000)
+    assert positions(dict(BODY, frame='eclipj2000')).tolist() == ecliptic.tolist()
+    assert not numpy.allclose(positions(dict(BODY, abcorr='LT+S')), j2000)
+
+    # Light times match SPICE's
+    frames = client.post(url, json=dict(BODY, abcorr='CN+S', light_time=True)).get_json()
+    ets = numpy.array([f['et'] for f in frames])
+    _, _, lts = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets, 'J2000', 'CN+S', True)
+    assert [f['frame']['lt'] for f in frames] == pytest.approx(lts.tolist(), rel=1e-9)
+    assert 'lt' not in client.post(url, json=BODY).get_json()[0]['frame']
+
+    resp = client.post(url + '?format=binary', json=dict(BODY, light_time=True))
+    assert struct.unpack('<4sHHII', resp.data[:16])[4] == 8
+
+    resp = client.post('/api/frames', json=dict(BODY, targets=[APOLLO15_INT_ID], frame='ECLIPJ2000', light_time=True))
+    assert [[u['frames'][str(APOLLO15_INT_ID)][c] for c in 'xyz'] for u in resp.get_json()] == ecliptic.tolist()
+
+    assert client.post(url, json=dict(BODY, frame='NOT_A_FRAME')).status_code == 400
+    assert client.post(url, json=dict(BODY, abcorr='SOMETIMES')).status_code == 400
+    assert client.post(url, json=dict(BODY, frame=17)).status_code == 400
+
+
+def test_object_events(client, testing_config):
+    """
+    Test the /api/objects/<id>/events endpoint
+    """
+    url = '/api/objects/' + APOLLO15_STR_ID + '/events'
+    BODY = {'start': '1971-07-31T00:00:00', 'end': '1971-08-01T00:00:00', 'observer': MOON_STR_ID}
+
+    resp = client.post(url, json=dict(BODY, type='periapsis'))
+    assert resp.status_code == 200
+    periapses = resp.get_json()
+    assert periapses['type'] == 'periapsis'
+    assert 8 <= len(periapses['events']) <= 14
+    for event in periapses['events']:
+        assert event['start_et'] == event['end_et']
+        assert event['start'] == event['end'] and event['start'].startswith('1971-07-3')
+        assert event['distance'] > 1737.4
+
+    # The closest approach is the lowest periapsis, and GET gives the same
+    resp = client.get(url + '?type=closest_approach&start=1971-07-31T00:00:00&end=1971-08-01T00:00:00&observer=MOON')
+    assert resp.status_code == 200
+    closest, = resp.get_json()['events']
+    assert closest['distance'] == pytest.approx(min(e['distance'] for e in periapses['events']))
+
+    # Without start and end, the whole coverage is searched
+    resp = client.post(url, json={'type': 'distance', 'relate': '<', 'distance': 2000, 'observer': MOON_STR_ID})
+    assert resp.status_code == 200
+    events = resp.get_json()['events']
+    assert events
+    assert all(e['start_et'] < e['end_et'] and 'distance' not in e for e in events)
+
+    # Occultations need the radii of the occulter, which aren't loaded
+    resp = client.post(url, json=dict(BODY, type='eclipse', occulter=MOON_STR_ID))
+    assert resp.status_code == 404
+
+    assert client.post(url, json=dict(BODY, type='sometimes')).status_code == 400
+    assert client.post(url, json=dict(BODY, type='distance', relate='<')).status_code == 400
+    assert client.post(url, json=dict(BODY, type='occultation')).status_code == 400
+    assert client.post(url, json=dict(BODY, type='eclipse', abcorr='LT+S')).status_code == 400
+    assert client.post(url, json=dict(BODY, type='periapsis', step=0.001)).status_code == 400
+    assert client.post(url, json=dict(BODY, type='periapsis', start='1980-01-01T00:00:00',
+                                      end='1980-01-02T00:00:00')).status_code == 404
+
+
+def test_http_caching(client, testing_config):
+    """
+    Test the GET forms of frames and trails, and their ETags
+    """
+    TIMES = ['1971-07-30T01:00:00', '1971-07-31T12:00:00']
+    url = '/api/objects/' + APOLLO15_STR_ID
+
+    # GET and POST give the same answers
+    resp = client.get(url + '/frames?times=' + ','.join(TIMES))
+    assert resp.status_code == 200
+    assert resp.get_json() == client.post(url + '/frames', json={'times': TIMES}).get_json()
+    assert client.get(url + '/frames?times=' + TIMES[0] + '&times=' + TIMES[1]).get_json() == resp.get_json()
+
+    range_body = {'start': TIMES[0], 'end': TIMES[1], 'count': 5, 'dates': False}
+    resp = client.get(url + '/frames?start=' + TIMES[0] + '&end=' + TIMES[1] + '&count=5&dates=false')
+    assert resp.get_json() == client.post(url + '/frames', json=range_body).get_json()
+    assert 'date' not in resp.get_json()[0]
+
+    trail_body = {'start': TIMES[0], 'end': TIMES[1], 'tolerances': [200, 20]}
+    resp = client.get(url + '/trail?start=' + TIMES[0] + '&end=' + TIMES[1] + '&tolerances=200,20')
+    assert resp.get_json() == client.post(url + '/trail', json=trail_body).get_json()
+
+    assert client.get(url + '/frames?start=' + TIMES[0] + '&end=' + TIMES[1] + '&step=soon').status_code == 400
+
+    # Cacheable responses carry an ETag, which gets a 304 when it still matches
+    for path in ['/api/objects', url, url + '/coverage', url + '/frames?times=' + TIMES[0]]:
+        resp = client.get(path)
+        assert resp.status_code == 200
+        etag = resp.headers['ETag']
+        assert 'max-age' in resp.headers['Cache-Control']
+
+        cached = client.get(path, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+        assert cached.data == b''
+        assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
+
+    # The format is part of the ETag, and ignored by routes without formats
+    binary = client.get(url + '/frames?times=' + TIMES[0], headers={'Accept': 'application/octet-stream'})
+    assert binary.headers['ETag'] != resp.headers['ETag']
+    assert client.get(url + '/coverage?format=x').status_code == 200
+    assert client.get(url + '/frames?times=' + TIMES[0] + '&format=x').status_code == 400
+
+    # Errors and POSTs aren't cacheable
+    assert 'ETag' not in client.get('/api/objects/' + str(INVALID_ID)).headers
+    assert 'ETag' not in client.post(url + '/frames', json={'times': TIMES}).headers
+
+
+def test_streamed_frames(client, testing_config, monkeypatch):
+    """
+    Test that frames responses of several chunks are streamed with the
+    same contents, as JSON or NDJSON, and compressed when accepted
+    """
+    url = '/api/objects/' + APOLLO15_STR_ID + '/frames'
+    BODY = {'start': '1971-07-30T01:00:00', 'end': '1971-08-01T14:30:00', 'count': 25}
+    expected = client.post(url, json=BODY).get_json()
+    times = [frame['date'] for frame in expected]
+    expected_times = client.post(url, json={'times': times}).get_json()
+    trail_url = '/api/objects/' + APOLLO15_STR_ID + '/trail?start=1971-07-30T01:00:00&end=1971-08-01T14:30:00'
+    expected_trail = client.get(trail_url).get_json()
+
+    monkeypatch.setattr(FlaskServer, 'FRAMES_CHUNK_SIZE', 4)
+    resp = client.post(url, json=BODY)
+    assert 'Content-Length' not in resp.headers
+    assert resp.get_json() == expected
+    assert client.post(url, json={'times': times}).get_json() == expected_times
+    assert client.get(trail_url).get_json() == expected_trail
+
+    resp = client.post(url + '?format=ndjson', json=BODY)
+    assert resp.mimetype == 'application/x-ndjson'
+    assert [flask.json.loads(line) for line in resp.get_data(as_text=True).splitlines()] == expected
+    resp = client.post(url, json=BODY, headers={'Accept': 'application/x-ndjson'})
+    assert resp.get_data(as_text=True).count('\n') == len(expected)
+    assert client.get(trail_url + '&format=ndjson').status_code == 400
+
+    resp = client.post(url, json=BODY, headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert flask.json.loads(gzip.decompress(resp.get_data())) == expected
+
+    # Small responses aren't compressed
+    resp = client.get('/api/objects/' + APOLLO15_STR_ID, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
+
+
+def test_post_multi_frames(client, testing_config):
+    """
+    Test the /api/frames (POST) endpoint
+    """
+    TIMES = ['1971-07-31T02:00:00', '1965-01-11T01:00:00', '1971-07-31T01:00:00']
+
+    resp = client.post('/api/frames', json={'targets': [APOLLO15_STR_ID, MOON_STR_ID], 'times': TIMES})
+    assert resp.status_code == 200
+    updates = resp.get_json()
+
+    # Sorted by time, with null frames where there is no data
+    assert [u['date'] for u in updates] == ['1965-01-11T01:00:00', '1971-07-31T01:00:00', '1971-07-31T02:00:00']
+    assert updates[0]['frames'][APOLLO15_STR_ID] is None
+
+    # Frames should match the single-object endpoint
+    for target in [APOLLO15_STR_ID, MOON_STR_ID]:
+        single = client.post('/api/objects/' + target + '/frames', json={'times': TIMES[::2]}).get_json()
+        single = {f['date']: f['frame'] for f in single}
+        for u in updates[1:]:
+            assert u['frames'][target] == single[u['date']]
+
+    # Time ranges work as for the single-object endpoint
+    resp = client.post('/api/frames', json={
+        'targets': [APOLLO15_STR_ID], 'observer': MOON_STR_ID,
+        'start': TIMES[2], 'end': TIMES[0], 'count': 5})
+    assert len(resp.get_json()) == 5
+
+    for body in [{'times': TIMES}, {'targets': [], 'times': TIMES}, {'targets': [APOLLO15_STR_ID]},
+                 {'targets': [APOLLO15_STR_ID], 'times': 'now'}]:
+        assert client.post('/api/frames', json=body).status_code == 400
+    assert client.post('/api/frames', json={'targets': [INVALID_ID], 'times': TIMES}).status_code == 404
+
+
+def test_frame_stream(client, testing_config):
+    """
+    Test the /api/stream endpoint
+    """
+    START = '1971-08-01T14:20:00'
+    END = '1971-08-01T14:50:00'
+
+    # 10 minutes per update, up to the end
+    resp = client.get('/api/stream?objects=' + APOLLO15_STR_ID + ',' + MOON_STR_ID +
+                      '&start=' + START + '&end=' + END + '&rate=12000&period=0.05')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/event-stream'
+
+    events = resp.get_data(as_text=True).split('\n\n')
+    assert events[-1] == ''
+    assert events[-2] == 'event: end\ndata: {}'
+    updates = [flask.json.loads(e[len('data: '):]) for e in events[:-2]]
+    assert [u['date'] for u in updates] == [
+        '1971-08-01T14:20:00', '1971-08-01T14:30:00', '1971-08-01T14:40:00', '1971-08-01T14:50:00']
+
+    # Apollo 15's coverage ends at 14:30
+    explicit = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames', json={'times': [START]}).get_json()
+    assert updates[0]['frames'][APOLLO15_STR_ID] == explicit[0]['frame']
+    assert updates[3]['frames'][APOLLO15_STR_ID] is None
+    assert all(u['frames'][MOON_STR_ID] is not None for u in updates)
+
+    for query in [
+            '?start=' + START,
+            '?objects=' + APOLLO15_STR_ID,
+            '?objects=' + APOLLO15_STR_ID + '&start=not a date',
+            '?objects=' + APOLLO15_STR_ID + '&start=' + START + '&rate=-1',
+            '?objects=' + APOLLO15_STR_ID + '&start=' + START + '&period=0',
+            '?objects=' + APOLLO15_STR_ID + '&start=' + START + '&rate=fast']:
+        assert client.get('/api/stream' + query).status_code == 400
+    assert client.get('/api/stream?objects=' + str(INVALID_ID) + '&start=' + START).status_code == 404
+
+
+def test_status(client, testing_config):
+    """
+    Test the /api/status endpoint
+    """
+    status = client.get('/api/status').get_json()
+    assert status['ready']
+    assert status['seconds'] >= 0
+
+    # Text kernels are loaded first
+    names = [os.path.basename(k) for k in TESTING_CONFIG['kernels']]
+    assert [k['file'] for k in status['kernels']] == ['latest_leapseconds.tls', 'apollo_naif_ids.tf', 'de430.bsp', 'apollo15-1.bsp']
+    assert sorted(k['file'] for k in status['kernels']) == sorted(names)
+    for kernel in status['kernels']:
+        assert kernel['status'] == 'loaded'
+        assert kernel['bytes'] == os.path.getsize(STATIC_FOLDER / kernel['file'])
+        assert kernel['seconds'] >= 0
+
+    assert len(status['fingerprint']) == 64
+
+
+def test_cache_stats(client, testing_config):
+    """
+    Test the /api/cache/stats endpoint, and that kernel pool caches are
+    dropped when the kernels change
+    """
+    client.get('/api/objects/' + APOLLO15_STR_ID + '/coverage')
+    before = client.get('/api/cache/stats').get_json()
+    client.get('/api/objects/' + APOLLO15_STR_ID + '/coverage')
+    after = client.get('/api/cache/stats').get_json()
+
+    # The second lookup should be answered from the caches
+    for name in ['lookup_object_id', 'get_coverage_windows']:
+        assert after[name]['hits'] == before[name]['hits'] + 1
+        assert after[name]['misses'] == before[name]['misses']
+
+    FlaskServer.kernels_changed()
+    cleared = client.get('/api/cache/stats').get_json()
+    assert cleared['get_coverage_windows']['currsize'] == 0
+    assert cleared['lookup_object_id']['currsize'] == 0
+
+
+def test_metrics(client, testing_config):
+    """
+    Test the /metrics endpoint
+    """
+    endpoint = '/api/objects/<object_identifier>/frames'
+    requests_before = FlaskServer.REQUESTS.get(endpoint=endpoint, method='POST', status=200)
+    no_data_before = FlaskServer.FRAMES.get(result='no_data')
+    not_covered_before = FlaskServer.FRAMES.get(result='not_covered')
+    spkez_before = FlaskServer.STAGE_SECONDS.get_count(stage='spkez')
+
+    # One time with data and one without, which isn't even evaluated
+    response = client.post('/api/objects/' + APOLLO15_STR_ID + '/frames',
+                           json={'times': ['1971-07-31T12:00:00', '2000-01-01T00:00:00']})
+    assert response.status_code == 200
+
+    assert FlaskServer.REQUESTS.get(endpoint=endpoint, method='POST', status=200) == requests_before + 1
+    assert FlaskServer.FRAMES.get(result='not_covered') == not_covered_before + 1
+    assert FlaskServer.FRAMES.get(result='no_data') == no_data_before
+    assert FlaskServer.STAGE_SECONDS.get_count(stage='spkez') == spkez_before + 1
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'lunah_http_requests_total{endpoint="' + endpoint + '",method="POST",status="200"}' in text
+    for stage in ['parse_json', 'utc_to_et', 'compute_frames', 'spkez', 'serialize']:
+        assert 'lunah_stage_duration_seconds_count{stage="' + stage + '"}' in text
+    assert 'lunah_spyce_swallowed_errors_total{function="get_frames_batch",error="InsufficientDataError"}' in text
+
+
+def test_reload_config(client, testing_config, monkeypatch):
+    """
+    Test reloading the kernels from a changed config, directly and through
+    the /api/admin/reload endpoint
+    """
+    coverage_url = '/api/objects/' + str(APOLLO15_INT_ID) + '/coverage'
+    assert client.get(coverage_url).status_code == 200
+
+    without_apollo = dict(TESTING_CONFIG, kernels=[k for k in TESTING_CONFIG['kernels'] if 'apollo15-1' not in k])
+    result = FlaskServer.reload_config(without_apollo)
+    assert result == {'unloaded': ['apollo15-1.bsp'], 'loaded': []}
+    assert client.get(coverage_url).status_code == 404
+
+    # Nothing changed, nothing to reload
+    assert FlaskServer.reload_config(without_apollo) == {'unloaded': [], 'loaded': []}
+
+    # The ephemeris cache is only rebuilt when its config changes
+    with_cache = dict(without_apollo, ephemeris_cache={'max_megabytes': 1})
+    FlaskServer.reload_config(with_cache)
+    cache = FlaskServer.frames_cache
+    assert cache is not None
+    FlaskServer.reload_config(with_cache)
+    assert FlaskServer.frames_cache is cache
+    FlaskServer.reload_config(without_apollo)
+    assert FlaskServer.frames_cache is None
+
+    # The endpoint doesn't exist without a token, and checks it
+    monkeypatch.setattr(FlaskServer, 'read_config', lambda: TESTING_CONFIG)
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.post('/api/admin/reload').status_code == 404
+    monkeypatch.setenv('ADMIN_TOKEN', 'test-token')
+    assert client.post('/api/admin/reload').status_code == 403
+    assert client.post('/api/admin/reload', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+
+    response = client.post('/api/admin/reload', headers={'Authorization': 'Bearer test-token'})
+    assert response.status_code == 200
+    assert response.get_json() == {'unloaded': [], 'loaded': ['apollo15-1.bsp']}
+    assert client.get(coverage_url).status_code == 200
+
+
 CONVERSION_TEST_TIME = {'UTC': '1996-12-18T12:28:28', 'J2000': -95815829.81644952}
 
 
@@ -235,6 +703,14 @@ def test_convert_et(client, testing_config):
     resp = client.post('/api/convert/et', json={'utc_time': CONVERSION_TEST_TIME['UTC']})
     assert resp.get_json() == CONVERSION_TEST_TIME
 
+    # Array request
+    resp = client.post('/api/convert/et', json={'utc_time': [CONVERSION_TEST_TIME['UTC']] * 2})
+    assert resp.get_json() == {k: [v] * 2 for k, v in CONVERSION_TEST_TIME.items()}
+
+    # Array request with a malformed time string
+    resp = client.post('/api/convert/et', json={'utc_time': [CONVERSION_TEST_TIME['UTC'], 'not a date']})
+    assert resp.status_code == 400
+
     # Empty request
     resp = client.post('/api/convert/et')
     assert resp.status_code == 400  # 400 "Bad Request"
@@ -248,6 +724,14 @@ def test_convert_utc(client, testing_config):
     resp = client.post('/api/convert/utc', json={'et_time': CONVERSION_TEST_TIME['J2000']})
     assert resp.get_json() == CONVERSION_TEST_TIME
 
+    # Array request
+    resp = client.post('/api/convert/utc', json={'et_time': [CONVERSION_TEST_TIME['J2000']] * 2})
+    assert resp.get_json() == {k: [v] * 2 for k, v in CONVERSION_TEST_TIME.items()}
+
+    # Array request with a malformed time
+    resp = client.post('/api/convert/utc', json={'et_time': [CONVERSION_TEST_TIME['J2000'], 'abc']})
+    assert resp.status_code == 400
+
     # Empty request
     resp = client.post('/api/convert/utc')
     assert resp.status_code == 400  # 400 "Bad Request"
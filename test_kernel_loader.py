@@ -0,0 +1,110 @@
+import threading
+
+import kernel_loader
+
+
+#
+# Helper Functions
+#
+
+def make_kernels(tmp_path, names):
+    """
+    Create empty stand-in kernel files, returning their paths
+    """
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b'x' * 10)
+        paths.append(str(path))
+    return paths
+
+
+#
+# Tests
+#
+
+
+def test_load_order_and_report(tmp_path):
+    """
+    Test that text kernels are loaded first, that failures are reported
+    and don't stop the other kernels, and that `finished` runs last
+    """
+    bsp, tls, bad, tf = make_kernels(tmp_path, ['a.bsp', 'b.tls', 'c.bsp', 'd.tf'])
+    loaded = []
+
+    def load(path):
+        if path == bad:
+            raise RuntimeError('corrupt kernel')
+        loaded.append(path)
+
+    loader = kernel_loader.KernelLoader([bsp, tls, bad, tf], load, finished=lambda: loaded.append('finished'))
+    assert not loader.ready
+    loader.run()
+
+    assert loader.ready
+    assert loaded == [tls, tf, bsp, 'finished']
+    report = loader.report()
+    assert [entry['file'] for entry in report] == ['b.tls', 'd.tf', 'a.bsp', 'c.bsp']
+    assert [entry['status'] for entry in report] == ['loaded', 'loaded', 'loaded', 'failed']
+    assert all(entry['bytes'] == 10 and entry['seconds'] >= 0 for entry in report)
+    assert loader.seconds >= 0
+
+
+def test_background_wait(tmp_path):
+    """
+    Test that wait() only blocks until the requested kernels are loaded
+    """
+    tls, bsp = make_kernels(tmp_path, ['a.tls', 'b.bsp'])
+    release = threading.Event()
+
+    def load(path):
+        if path == bsp:
+            release.wait(10)
+
+    loader = kernel_loader.KernelLoader([bsp, tls], load)
+    loader.start()
+
+    assert loader.wait([tls], timeout=10)
+    assert not loader.wait([bsp], timeout=0.05)
+    assert not loader.wait(timeout=0.05)
+    assert loader.report()[1]['status'] == 'loading'
+    # Kernels the loader doesn't know about are never waited for
+    assert loader.wait([str(tmp_path / 'other.bsp')], timeout=0)
+
+    release.set()
+    assert loader.wait(timeout=10)
+    assert loader.ready
+    loader.thread.join(10)
+
+
+def test_read_write_lock():
+    """
+    Test that readers share the lock, and that a waiting writer gets it
+    before new readers
+    """
+    lock = kernel_loader.ReadWriteLock()
+    events = []
+
+    def write():
+        with lock.writing():
+            events.append('write')
+
+    def read():
+        with lock.reading():
+            events.append('read')
+
+    lock.acquire_read()
+    lock.acquire_read()
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not lock._writers_waiting:
+        pass
+    reader = threading.Thread(target=read)
+    reader.start()
+
+    lock.release_read()
+    assert events == []
+    lock.release_read()
+    writer.join(10)
+    reader.join(10)
+    assert events == ['write', 'read']
@@ -0,0 +1,74 @@
+import metrics
+
+
+#
+# Tests
+#
+
+
+def test_counter():
+    """
+    Test counting with and without labels, and the rendered samples
+    """
+    registry = metrics.Registry()
+    plain = registry.counter('test_plain_total', 'A counter')
+    labelled = registry.counter('test_labelled_total', 'A labelled counter', ('method', 'status'))
+
+    plain.inc()
+    plain.inc(2)
+    labelled.inc(method='GET', status=200)
+    labelled.inc(method='GET', status=200)
+    labelled.inc(method='POST', status='4"0\n4')
+
+    assert plain.get() == 3
+    assert labelled.get(method='GET', status='200') == 2
+    assert labelled.get(method='PUT', status=200) == 0
+
+    assert registry.render() == (
+        '# HELP test_plain_total A counter\n'
+        '# TYPE test_plain_total counter\n'
+        'test_plain_total 3\n'
+        '# HELP test_labelled_total A labelled counter\n'
+        '# TYPE test_labelled_total counter\n'
+        'test_labelled_total{method="GET",status="200"} 2\n'
+        'test_labelled_total{method="POST",status="4\\"0\\n4"} 1\n')
+
+
+def test_histogram():
+    """
+    Test that observations land in cumulative buckets, and timing blocks
+    """
+    registry = metrics.Registry()
+    histogram = registry.histogram('test_seconds', 'A histogram', ('stage',), buckets=(0.1, 1.0))
+
+    for value in [0.05, 0.1, 0.5, 5.0]:
+        histogram.observe(value, stage='a')
+    with histogram.time(stage='b'):
+        pass
+
+    assert histogram.get_count(stage='a') == 4
+    assert histogram.get_count(stage='b') == 1
+    rendered = registry.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 2\n' in rendered
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 3\n' in rendered
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 4\n' in rendered
+    assert 'test_seconds_sum{stage="a"} 5.65\n' in rendered
+    assert 'test_seconds_count{stage="a"} 4\n' in rendered
+    assert 'test_seconds_count{stage="b"} 1\n' in rendered
+
+
+def test_collector():
+    """
+    Test that collectors are rendered after the registered metrics
+    """
+    registry = metrics.Registry()
+    registry.counter('test_total', 'A counter').inc()
+
+    @registry.collector
+    def collect():
+        return [('test_external', 'gauge', 'An external value', [('test_external', [('kind', 'x')], 1.5)])]
+
+    assert registry.render().endswith(
+        '# HELP test_external An external value\n'
+        '# TYPE test_external gauge\n'
+        'test_external{kind="x"} 1.5\n')
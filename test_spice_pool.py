@@ -0,0 +1,119 @@
+import pathlib
+
+import numpy
+import pytest
+
+import spice_pool
+import spyce
+
+#
+# Constants
+#
+
+STATIC_FOLDER = pathlib.Path('tests_static')
+
+KERNEL_FILES = [
+    str((STATIC_FOLDER / fn).resolve()) for fn in [
+        'latest_leapseconds.tls',
+        'de430.bsp',
+        'apollo15-1.bsp',
+        'apollo_naif_ids.tf',
+    ]
+]
+APOLLO15_INT_ID = -915
+EARTH_INT_ID = 399
+JULY_31_1971 = -896957958.816704
+
+
+#
+# Fixtures
+#
+
+
+@pytest.fixture(scope='module')
+def kernel_files():
+    """
+    Fixture for loading the kernel files in this process too, to compare
+    against
+    """
+    for fn in KERNEL_FILES:
+        spyce.add_kernel(fn)
+
+    yield KERNEL_FILES
+
+    for fn in KERNEL_FILES:
+        spyce.remove_kernel(fn)
+
+
+@pytest.fixture
+def pool(kernel_files):
+    """
+    A two-worker SpicePool with the kernel files loaded, which splits
+    batches into small chunks
+    """
+    pool = spice_pool.SpicePool(kernel_files, workers=2, chunk_size=10)
+
+    yield pool
+
+    pool.shutdown()
+
+
+#
+# SpicePool tests
+#
+
+
+def test_pool_get_frames_batch(pool):
+    """
+    Test that the pool gives the same answers as spyce, for batches that
+    are and aren't split across workers
+    """
+    for count in [0, 1, 5, 100]:
+        ets = JULY_31_1971 + 60 * numpy.arange(count, dtype=numpy.float64)
+        ets[::7] = 0  # outside of the coverage
+
+        states, valid = pool.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+        expected_states, expected_valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets)
+        assert states.tolist() == expected_states.tolist()
+        assert valid.tolist() == expected_valid.tolist()
+
+
+def test_pool_get_frames_multi(pool):
+    """
+    Test that the pool gives the same answers as spyce for several
+    targets at once
+    """
+    targets = [APOLLO15_INT_ID, 301]
+    ets = JULY_31_1971 + 60 * numpy.arange(25, dtype=numpy.float64)
+
+    states, valid = pool.get_frames_multi(targets, EARTH_INT_ID, ets)
+    expected_states, expected_valid = spyce.get_frames_multi(targets, EARTH_INT_ID, ets)
+    assert states.tolist() == expected_states.tolist()
+    assert valid.tolist() == expected_valid.tolist()
+
+
+def test_pool_frame_options(pool):
+    """
+    Test that the reference frame, aberration correction and light times
+    are passed on to the workers
+    """
+    targets = [APOLLO15_INT_ID, 301]
+    ets = JULY_31_1971 + 60 * numpy.arange(25, dtype=numpy.float64)
+
+    results = pool.get_frames_multi(targets, EARTH_INT_ID, ets, 'ECLIPJ2000', 'LT+S', True)
+    expected = spyce.get_frames_multi(targets, EARTH_INT_ID, ets, 'ECLIPJ2000', 'LT+S', True)
+    assert len(results) == 3
+    for array, expected_array in zip(results, expected):
+        assert array.tolist() == expected_array.tolist()
+
+    states, valid = pool.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets, frame='ECLIPJ2000')
+    assert states.tolist() == spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, ets, 'ECLIPJ2000')[0].tolist()
+
+
+def test_pool_restart(pool):
+    """
+    Test that restarting the pool replaces the workers' kernels
+    """
+    pool.restart([])
+    states, valid = pool.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, [JULY_31_1971])
+    assert valid.tolist() == [False]
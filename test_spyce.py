@@ -1,5 +1,6 @@
 import pathlib
 
+import numpy
 import pytest
 import spyce
 
@@ -129,6 +130,26 @@ def test_utc_et_conversion(leapseconds_kernel_files):
     assert spyce.et_to_utc(0.0, 'ISOC') == '2000-01-01T11:58:56'
 
 
+def test_utc_et_batch_conversion(leapseconds_kernel_files):
+    """
+    Test utc_to_et_batch() and et_to_utc_batch()
+    """
+    e_times, valid = spyce.utc_to_et_batch(['1996-12-18T12:28:28', 'not a date', '2000-01-01T11:58:56'])
+    assert e_times.dtype == numpy.float64
+    assert valid.tolist() == [True, False, True]
+    assert e_times[0] == pytest.approx(-95815829.81644952)
+    assert e_times[1] == 0.0
+    assert e_times[2] == pytest.approx(0.18392726328546233)
+
+    dates, valid = spyce.et_to_utc_batch(numpy.array([-95815829.81644952, 0.0]), 'ISOC')
+    assert dates == ['1996-12-18T12:28:28', '2000-01-01T11:58:56']
+    assert valid.tolist() == [True, True]
+
+    dates, valid = spyce.et_to_utc_batch([0.0], 'not a format')
+    assert dates == ['']
+    assert valid.tolist() == [False]
+
+
 def test_get_objects():
     """
     Test get_objects().
@@ -162,6 +183,170 @@ def test_get_frame_data(apollo_kernel_files, planet_ephemeris_kernel_files):
     assert frame.dz == pytest.approx(-0.6584766393115672)
 
 
+def test_get_frames_batch(apollo_kernel_files, planet_ephemeris_kernel_files):
+    """
+    Test get_frames_batch().
+    """
+    JULY_31_1971 = -896957958.816704
+    e_times = numpy.array([JULY_31_1971, 0.0, JULY_31_1971 + 3600])
+
+    frames, valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times)
+    assert frames.shape == (3, 6)
+    assert frames.dtype == numpy.float64
+    assert valid.tolist() == [True, False, True]
+
+    # Valid rows should match the single-epoch function exactly
+    for row, et in [(0, JULY_31_1971), (2, JULY_31_1971 + 3600)]:
+        frame = spyce.get_frame_data(APOLLO15_INT_ID, EARTH_INT_ID, et)
+        assert frames[row].tolist() == [frame.x, frame.y, frame.z, frame.dx, frame.dy, frame.dz]
+
+    # Failed epochs are zeroed rather than raising
+    assert frames[1].tolist() == [0.0] * 6
+
+    # Plain lists and empty inputs are accepted too
+    frames, valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, [])
+    assert frames.shape == (0, 6)
+    assert valid.shape == (0,)
+
+
+def test_get_frames_multi(apollo_kernel_files, planet_ephemeris_kernel_files):
+    """
+    Test get_frames_multi().
+    """
+    MOON_INT_ID = 301
+    JULY_31_1971 = -896957958.816704
+    e_times = numpy.array([JULY_31_1971, 0.0, JULY_31_1971 + 3600])
+    targets = [APOLLO15_INT_ID, MOON_INT_ID]
+
+    frames, valid = spyce.get_frames_multi(targets, EARTH_INT_ID, e_times)
+    assert frames.shape == (2, 3, 6)
+    assert valid.shape == (2, 3)
+
+    # Each target should match get_frames_batch() exactly
+    for k, target in enumerate(targets):
+        expected_frames, expected_valid = spyce.get_frames_batch(target, EARTH_INT_ID, e_times)
+        assert frames[k].tolist() == expected_frames.tolist()
+        assert valid[k].tolist() == expected_valid.tolist()
+
+    frames, valid = spyce.get_frames_multi([], EARTH_INT_ID, e_times)
+    assert frames.shape == (0, 3, 6)
+
+
+def test_frame_options(apollo_kernel_files, planet_ephemeris_kernel_files):
+    """
+    Test the reference frame, aberration correction and light time
+    options of the frame functions.
+    """
+    JULY_31_1971 = -896957958.816704
+    CLIGHT = 299792.458
+    e_times = numpy.array([JULY_31_1971, 0.0, JULY_31_1971 + 3600])
+
+    assert spyce.frame_to_id('J2000') == 1
+    assert spyce.frame_to_id('ECLIPJ2000') == 17
+    with pytest.raises(spyce.IDNotFoundError):
+        spyce.frame_to_id('NOT_A_FRAME')
+
+    # Rotating to the ecliptic keeps distances, but not coordinates
+    j2000, _ = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times)
+    ecliptic, valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times, 'ECLIPJ2000')
+    assert valid.tolist() == [True, False, True]
+    assert numpy.linalg.norm(ecliptic[:, :3], axis=1) == pytest.approx(numpy.linalg.norm(j2000[:, :3], axis=1))
+    assert ecliptic[0, 2] != pytest.approx(j2000[0, 2])
+
+    # Light times are the one-way light time to the (corrected) position
+    for abcorr in ['NONE', 'LT', 'LT+S', 'CN+S']:
+        frames, valid, lts = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times, 'J2000', abcorr, True)
+        assert valid.tolist() == [True, False, True]
+        assert lts.tolist()[1] == 0.0
+        assert lts[valid] == pytest.approx(numpy.linalg.norm(frames[valid, :3], axis=1) / CLIGHT, rel=1e-9)
+
+        frame = spyce.get_frame_data(APOLLO15_INT_ID, EARTH_INT_ID, JULY_31_1971, 'J2000', abcorr)
+        assert [frame.x, frame.y, frame.z, frame.dx, frame.dy, frame.dz, frame.lt] == frames[0].tolist() + [lts[0]]
+
+    frames, valid, lts = spyce.get_frames_multi([APOLLO15_INT_ID], EARTH_INT_ID, e_times, 'ECLIPJ2000', 'LT+S', True)
+    assert lts.shape == (1, 3)
+
+    # Bad options raise once, rather than failing every epoch
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times, 'NOT_A_FRAME')
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.get_frames_multi([APOLLO15_INT_ID], EARTH_INT_ID, e_times, 'J2000', 'LT+X')
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.get_frame_data(APOLLO15_INT_ID, EARTH_INT_ID, JULY_31_1971, 'J2000', 'SOMETIMES')
+
+
+def test_find_event_windows(apollo_kernel_files, planet_ephemeris_kernel_files):
+    """
+    Test the geometry finder functions.
+    """
+    MOON_INT_ID = 301
+    SUN_INT_ID = 10
+    # A day of Apollo 15's second coverage window, in lunar orbit
+    windows = [(-896974158.3240035, -896974158.3240035 + 86400)]
+
+    def distances(ets):
+        frames, valid = spyce.get_frames_batch(APOLLO15_INT_ID, MOON_INT_ID, numpy.array(ets))
+        assert valid.all()
+        return numpy.linalg.norm(frames[:, :3], axis=1)
+
+    # Periapses (about one per two hour lunar orbit) are local minima
+    periapses = spyce.find_distance_windows(APOLLO15_INT_ID, MOON_INT_ID, 'LOCMIN', 0, windows, 600)
+    assert 8 <= len(periapses) <= 14
+    for start, end in periapses:
+        assert start == end
+        assert windows[0][0] <= start <= windows[0][1]
+        before, at, after = distances([start - 60, start, start + 60])
+        assert at < before and at < after
+
+    # The closest approach is the lowest periapsis
+    (closest, _), = spyce.find_distance_windows(APOLLO15_INT_ID, MOON_INT_ID, 'ABSMIN', 0, windows, 600)
+    assert distances([closest])[0] == pytest.approx(min(distances([start for start, _ in periapses])))
+
+    # Threshold crossings bound the times below the threshold
+    threshold = float(numpy.median(distances(numpy.linspace(windows[0][0], windows[0][1], 100))))
+    below = spyce.find_distance_windows(APOLLO15_INT_ID, MOON_INT_ID, '<', threshold, windows, 600)
+    assert below
+    for start, end in below:
+        assert start < end
+        assert (distances(numpy.linspace(start, end, 10)[1:-1]) < threshold).all()
+
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.find_distance_windows(APOLLO15_INT_ID, MOON_INT_ID, 'SOMETIMES', 0, windows, 600)
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.find_distance_windows(APOLLO15_INT_ID, MOON_INT_ID, 'LOCMIN', 0, [(1.0, 0.0)], 600)
+
+    # Occultations need the occulting body's radii, which are in a PCK
+    with pytest.raises(spyce.InsufficientDataError):
+        spyce.find_occultation_windows('ANY', MOON_INT_ID, SUN_INT_ID, APOLLO15_INT_ID, windows, 60)
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.find_occultation_windows('SOMETIMES', MOON_INT_ID, SUN_INT_ID, APOLLO15_INT_ID, windows, 60)
+    with pytest.raises(spyce.InvalidArgumentError):
+        spyce.find_occultation_windows('ANY', MOON_INT_ID, SUN_INT_ID, APOLLO15_INT_ID, windows, 60, 'LT+S')
+
+
+def test_get_stats(apollo_kernel_files, planet_ephemeris_kernel_files):
+    """
+    Test get_stats().
+    """
+    JULY_31_1971 = -896957958.816704
+    e_times = numpy.array([JULY_31_1971, 0.0, JULY_31_1971 + 3600])
+
+    def frames_stats():
+        stats = spyce.get_stats().get('get_frames_batch', {'calls': 0, 'items': 0, 'seconds': 0.0, 'errors': {}})
+        return stats['calls'], stats['items'], stats['seconds'], stats['errors'].get('InsufficientDataError', 0)
+
+    calls, items, seconds, insufficient = frames_stats()
+    _, valid = spyce.get_frames_batch(APOLLO15_INT_ID, EARTH_INT_ID, e_times)
+    assert valid.tolist() == [True, False, True]
+
+    # The epoch without data counts as an InsufficientDataError
+    new_calls, new_items, new_seconds, new_insufficient = frames_stats()
+    assert new_calls == calls + 1
+    assert new_items == items + 3
+    assert new_seconds >= seconds
+    assert new_insufficient == insufficient + 1
+
+
 #
 # Spyce exception tests
 #
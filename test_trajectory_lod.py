@@ -0,0 +1,97 @@
+import numpy
+
+import trajectory_lod
+
+
+#
+# Constants
+#
+
+TOLERANCES = [2000.0, 200.0, 20.0]
+
+# Flyby-like trajectory: a straight cruise with a sharp swerve around t=0
+SPEED = 1.0
+SWERVE_SIZE = 20000.0
+SWERVE_DURATION = 5000.0
+
+
+#
+# Helper Functions
+#
+
+def flyby(ets):
+    """
+    States of the test trajectory, with the valid mask spyce would return
+    (no data after t=400000)
+    """
+    ets = numpy.asarray(ets, dtype=numpy.float64)
+    bump = SWERVE_SIZE * numpy.exp(-(ets / SWERVE_DURATION) ** 2)
+    zeros = numpy.zeros_like(ets)
+
+    states = numpy.stack([
+        SPEED * ets, bump, zeros,
+        SPEED + zeros, -2 * ets / SWERVE_DURATION ** 2 * bump, zeros], axis=1)
+    valid = ets <= 400000
+    states[~valid] = 0
+    return states, valid
+
+
+def max_chord_error(ets, states):
+    """
+    Largest distance between the midpoints of a polyline's segments and
+    the true trajectory at those times
+    """
+    mids, _ = flyby((ets[:-1] + ets[1:]) / 2)
+    return numpy.linalg.norm(mids[:, :3] - (states[:-1, :3] + states[1:, :3]) / 2, axis=1).max()
+
+
+#
+# Tests
+#
+
+
+def test_levels_meet_tolerances():
+    """
+    Test that every level of detail is drawn within its tolerance, and
+    that points concentrate around the swerve
+    """
+    ets, states, levels = trajectory_lod.adaptive_sample(flyby, -200000.0, 200000.0, TOLERANCES)
+    assert numpy.all(numpy.diff(ets) > 0)
+    assert ets[0] == -200000.0 and ets[-1] == 200000.0
+    assert set(levels.tolist()) <= {0, 1, 2}
+
+    for level, tolerance in enumerate(TOLERANCES):
+        selected = levels <= level
+        assert max_chord_error(ets[selected], states[selected]) <= tolerance
+
+    counts = [int((levels <= level).sum()) for level in range(len(TOLERANCES))]
+    assert counts == sorted(counts)
+
+    # Much denser around the swerve than in cruise
+    in_turn = numpy.abs(ets) < 3 * SWERVE_DURATION
+    assert in_turn.sum() > (~in_turn).sum()
+
+
+def test_min_step_and_max_points():
+    """
+    Test the limits on refinement
+    """
+    ets, _, _ = trajectory_lod.adaptive_sample(flyby, -200000.0, 200000.0, [0.001], min_step=600.0)
+    assert numpy.diff(ets).min() >= 300.0
+
+    ets, _, _ = trajectory_lod.adaptive_sample(flyby, -200000.0, 200000.0, [0.001], min_step=1.0, max_points=500)
+    assert len(ets) <= 500
+
+
+def test_invalid_times_dropped():
+    """
+    Test that times spyce has no data for are left out
+    """
+    ets, states, levels = trajectory_lod.adaptive_sample(flyby, 300000.0, 500000.0, TOLERANCES)
+    assert ets.max() <= 400000
+    assert len(ets) == len(states) == len(levels)
+
+    # A range without any data gives an empty trail
+    ets, states, levels = trajectory_lod.adaptive_sample(flyby, 500000.0, 600000.0, TOLERANCES)
+    assert len(ets) == len(levels) == 0
+    assert states.shape == (0, 6)
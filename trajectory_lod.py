@@ -0,0 +1,112 @@
+import numpy
+
+
+# Default trail tolerances in km, coarsest level first
+DEFAULT_TOLERANCES = (2000.0, 200.0, 20.0)
+
+# Default spacing of the initial samples, and the closest two samples may get
+DEFAULT_MAX_STEP = 6 * 60 * 60.0
+DEFAULT_MIN_STEP = 60.0
+
+
+#
+# Helper Functions
+#
+
+def midpoint_error(start_states, end_states, mid_states, dt):
+    """
+    Estimate how far a straight line between two samples strays from the
+    trajectory, from the states at both ends and at the middle of each
+    interval: the larger of the true midpoint's distance from the chord,
+    and the chord's distance from the cubic Hermite curve through both
+    ends (which accounts for the curvature implied by their velocities,
+    even where the trajectory happens to cross the chord at the middle).
+    """
+    chord_mid = (start_states[:, :3] + end_states[:, :3]) / 2
+    chord_error = numpy.linalg.norm(mid_states[:, :3] - chord_mid, axis=1)
+    curvature_error = dt / 8 * numpy.linalg.norm(start_states[:, 3:] - end_states[:, 3:], axis=1)
+    return numpy.maximum(chord_error, curvature_error)
+
+
+#
+# Sampling
+#
+
+def adaptive_sample(compute, start_et, end_et, tolerances=DEFAULT_TOLERANCES,
+                    max_step=DEFAULT_MAX_STEP, min_step=DEFAULT_MIN_STEP, max_points=100000):
+    """
+    Sample a trajectory over [start_et, end_et] with only as many points
+    as are needed to draw it as a polyline within each tolerance (km).
+
+    Sampling starts with evenly spaced points at most `max_step` seconds
+    apart, and every interval whose estimated error (midpoint_error()) is
+    above the finest tolerance is halved, down to `min_step`, until no
+    more than `max_points` points are used. Each point is given the
+    coarsest level of detail it is needed for, so the points with
+    level <= k are exactly what sampling for tolerances[k] alone would
+    have produced.
+
+    compute: function taking an array of ETs and returning the
+        (states, valid) pair described for spyce.get_frames_batch
+    tolerances: decreasing tolerances, one per level of detail
+
+    Return (ets, states, levels) for the valid samples, sorted by time.
+    """
+    tolerances = sorted(tolerances, reverse=True)
+    finest = tolerances[-1]
+
+    count = max(2, int(numpy.ceil((end_et - start_et) / max_step)) + 1)
+    ets = numpy.linspace(start_et, end_et, count)
+    states, valid = compute(ets)
+
+    # Per point: the largest tolerance it is needed for, and whether the
+    # interval starting at it may still be split (and below what
+    # tolerance its splits are needed, which is bounded by its parent's)
+    significance = numpy.full(count, numpy.inf)
+    active = numpy.ones(count, dtype=bool)
+    active[-1] = False
+    cap = numpy.full(count, numpy.inf)
+
+    while True:
+        dt = numpy.diff(ets)
+        candidates = active[:-1] & valid[:-1] & valid[1:] & (dt >= 2 * min_step)
+        active[:-1] &= candidates
+        idx = numpy.flatnonzero(candidates)
+        budget = max_points - len(ets)
+        if len(idx) == 0 or budget <= 0:
+            break
+
+        mid_ets = ets[idx] + dt[idx] / 2
+        mid_states, mid_valid = compute(mid_ets)
+        error = midpoint_error(states[idx], states[idx + 1], mid_states, dt[idx])
+
+        split = mid_valid & (error > finest)
+        # Intervals that are tested once and don't need splitting are done
+        active[idx[~split]] = False
+        if split.sum() > budget:
+            keep = numpy.argsort(-numpy.where(split, error, -numpy.inf), kind='stable')[:budget]
+            split = numpy.zeros_like(split)
+            split[keep] = True
+            active[idx[~split]] = False
+        if not split.any():
+            break
+
+        new_significance = numpy.minimum(error[split], cap[idx[split]])
+        cap[idx[split]] = new_significance
+
+        ets = numpy.concatenate([ets, mid_ets[split]])
+        order = numpy.argsort(ets, kind='stable')
+        ets = ets[order]
+        states = numpy.concatenate([states, mid_states[split]])[order]
+        valid = numpy.concatenate([valid, mid_valid[split]])[order]
+        significance = numpy.concatenate([significance, new_significance])[order]
+        active = numpy.concatenate([active, numpy.ones(int(split.sum()), dtype=bool)])[order]
+        cap = numpy.concatenate([cap, new_significance])[order]
+
+        if len(ets) >= max_points:
+            break
+
+    # A point is needed at tolerances[k] if its significance is above it
+    levels = numpy.searchsorted(-numpy.array(tolerances), -significance, side='right')
+    return ets[valid], states[valid], levels[valid]
+
@@ -90,16 +90,21 @@ class SpaceScene extends Component {
       spacecraftCamera.lookAt(satelliteObj.position);
 
       // Determine whether to display full, partial, or no spacecraft trail
-      scene.remove(currentTrailObj);
+      // (the trail objects are persistent, so the scene only changes when a different one is shown)
+      let trailToShow = null;
       if(this.props.currentTrailType == "full") {
-        currentTrailObj = trailObj.getFullPath();
+        trailToShow = trailObj.getFullPath(selectedCameraObj, renderer);
       } else if(this.props.currentTrailType == "partial") {
-        currentTrailObj = trailObj.getPartialPath(pos_store.get_working_date());
-      } else {
-        currentTrailObj = null;
+        trailToShow = trailObj.getPartialPath(pos_store.get_working_date());
       }
-      if(currentTrailObj) {
-        scene.add(currentTrailObj);
+      if(trailToShow !== currentTrailObj) {
+        if(currentTrailObj) {
+          scene.remove(currentTrailObj);
+        }
+        if(trailToShow) {
+          scene.add(trailToShow);
+        }
+        currentTrailObj = trailToShow;
       }
 
       //very bad approximation of earth's rotation
@@ -1,7 +1,8 @@
 let config = {
     backendURL: "localhost:5000", //this should be the ip of your webserver
     mainSpacecraftName: "LMAP",
-    updatePeriod: 1000//30 seconds = 30000
+    updatePeriod: 1000,//30 seconds = 30000
+    prefetchSeconds: 10 //seconds of playback to fetch frames for at once
 }
 
 export default config;
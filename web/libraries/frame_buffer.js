@@ -0,0 +1,136 @@
+/**
+ * @name lower_bound(array, value)
+ * @description index of the first element of a sorted array that is >= value (array.length if there is none)
+ */
+function lower_bound(array, value) {
+    let low = 0,
+        high = array.length;
+    while(low < high) {
+        let mid = (low + high) >>> 1;
+        if(array[mid] < value) low = mid + 1;
+        else                   high = mid;
+    }
+    return low;
+}
+
+/**
+ * @name hermite(f0, f1, t0, t1, t)
+ * @description cubic Hermite interpolation between two frames {x, y, z, dx, dy, dz} at times t0 and t1 (ms), using
+ *              both their positions and velocities (per second), so the curve and its velocity stay continuous from
+ *              one pair of samples to the next
+ * @returns the interpolated frame at time t
+ */
+export
+function hermite(f0, f1, t0, t1, t) {
+    let h = (t1 - t0) / 1000;
+    let s = (t - t0) / (t1 - t0);
+    let s2 = s * s,
+        s3 = s2 * s;
+
+    //basis functions, and their derivatives with respect to s
+    let h00 = 2 * s3 - 3 * s2 + 1,  d00 = 6 * s2 - 6 * s;
+    let h10 = s3 - 2 * s2 + s,      d10 = 3 * s2 - 4 * s + 1;
+    let h01 = -2 * s3 + 3 * s2,     d01 = -6 * s2 + 6 * s;
+    let h11 = s3 - s2,              d11 = 3 * s2 - 2 * s;
+
+    let frame = {};
+    for(let [p, v] of [["x", "dx"], ["y", "dy"], ["z", "dz"]]) {
+        frame[p] = h00 * f0[p] + h10 * h * f0[v] + h01 * f1[p] + h11 * h * f1[v];
+        frame[v] = (d00 * f0[p] + d10 * h * f0[v] + d01 * f1[p] + d11 * h * f1[v]) / h;
+    }
+    return frame;
+}
+
+/**
+ * Look-ahead buffer of the frames of several objects, sampled at the same times. Batches of frames are appended
+ * as they are fetched, and frames at any time in between are interpolated from the samples on either side, so
+ * positions can be updated every rendered frame without asking the server each time.
+ */
+export default class FrameBuffer {
+    constructor() {
+        this.clear();
+    }
+
+    /**
+     * @name clear()
+     * @description drop every sample, such as when the simulation jumps to another time
+     */
+    clear() {
+        //sample times in ms, and for each object its frame at each of them (undefined where it has no data)
+        this.times = [];
+        this.frames = {};
+    }
+
+    /**
+     * @name start()
+     * @description time (ms) of the first sample, or undefined if the buffer is empty
+     */
+    start() {
+        return this.times[0];
+    }
+
+    /**
+     * @name end()
+     * @description time (ms) of the last sample, or undefined if the buffer is empty
+     */
+    end() {
+        return this.times[this.times.length - 1];
+    }
+
+    /**
+     * @name append(times, frames)
+     * @description add a batch of samples after the current ones; samples at or before the end of the buffer
+     *              (where batches overlap) are skipped
+     * @param times: sorted array of sample times in ms
+     * @param frames: object mapping each object to an array with its frame at each time, or undefined
+     */
+    append(times, frames) {
+        let first = (this.times.length > 0) ? lower_bound(times, this.end() + 1) : 0;
+        let count = this.times.length;
+        for(let i = first; i < times.length; i++) {
+            this.times.push(times[i]);
+        }
+        for(let object of Object.keys(frames)) {
+            if(!this.frames[object])
+                this.frames[object] = new Array(count);
+            for(let i = first; i < times.length; i++) {
+                this.frames[object].push(frames[object][i]);
+            }
+        }
+        //objects missing from this batch have no data at its times
+        for(let object of Object.keys(this.frames)) {
+            this.frames[object].length = this.times.length;
+        }
+    }
+
+    /**
+     * @name trim(time)
+     * @description drop the samples that are no longer needed to interpolate at `time` (ms) or after it
+     */
+    trim(time) {
+        let drop = lower_bound(this.times, time) - 1;
+        if(drop > 0) {
+            this.times.splice(0, drop);
+            for(let object of Object.keys(this.frames)) {
+                this.frames[object].splice(0, drop);
+            }
+        }
+    }
+
+    /**
+     * @name frame_at(object, time)
+     * @description the frame of an object at `time` (ms), interpolated between the samples around it
+     * @returns {x, y, z, dx, dy, dz}, or undefined if the buffer doesn't have samples with data on both sides
+     */
+    frame_at(object, time) {
+        let frames = this.frames[object];
+        let i = lower_bound(this.times, time);
+        if(!frames || i >= this.times.length)
+            return undefined;
+        if(this.times[i] == time)
+            return frames[i];
+        if(i == 0 || !frames[i - 1] || !frames[i])
+            return undefined;
+        return hermite(frames[i - 1], frames[i], this.times[i - 1], this.times[i], time);
+    }
+}
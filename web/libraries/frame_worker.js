@@ -0,0 +1,115 @@
+/**
+ * Web Worker decoding binary trail responses (see the REST API docs) off the main thread and building the trail's
+ * geometry from them, in GL units. Messages are {id, task, buffer, ...} with the response's ArrayBuffer
+ * transferred in, and the results are posted back as {id, result} (or {id, error}) with their typed arrays
+ * transferred out, so nothing is copied either way.
+ */
+
+//kilometers to GL Units
+const gl_p_km = 100 / 149597870.7;
+
+/**
+ * @name decode_frames(buffer)
+ * @description unpack a binary frames response into typed array columns. The columns are views straight into the
+ *              response buffer, nothing is copied or parsed.
+ * @param buffer: ArrayBuffer
+ */
+function decode_frames(buffer) {
+    let header = new DataView(buffer, 0, 16);
+    let magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if(magic != "FRMS")
+        throw new Error("not a binary frames response");
+
+    //every value is little-endian, which typed arrays read natively on every platform we run on
+    let value_size = header.getUint16(6, true);
+    let count      = header.getUint32(8, true);
+    let ColumnType = (value_size == 4) ? Float32Array : Float64Array;
+
+    let num_columns = header.getUint32(12, true);
+
+    let columns = { et: new Float64Array(buffer, 16, count) };
+    let offset = 16 + count * 8;
+    //trails have an extra "level" column after the state columns
+    let names = ["x", "y", "z", "dx", "dy", "dz", "level"].slice(0, num_columns - 1);
+    for(let name of names) {
+        columns[name] = new ColumnType(buffer, offset, count);
+        offset += count * value_size;
+    }
+    return columns;
+}
+
+/**
+ * @name epochs(columns, start_time)
+ * @description rebuild the time (ms) of every frame from the time of the first one, since the response has ET times
+ *              and no date strings
+ */
+function epochs(columns, start_time) {
+    let count = columns.et.length;
+    let times = new Float64Array(count);
+    for(let i = 0; i < count; i++) {
+        times[i] = start_time + (columns.et[i] - columns.et[0]) * 1000;
+    }
+    return times;
+}
+
+/**
+ * @name trail_task(buffer, start_time, num_levels)
+ * @description build the geometry of an adaptively sampled trail: every point's position in GL units and three.js
+ *              axis order, and for each level of detail the positions of the points drawn at that level
+ * @returns {times: Float64Array of ms, positions: Float32Array of x/y/z triples, levels: array of Float32Arrays}
+ */
+function trail_task(buffer, start_time, num_levels) {
+    let columns = decode_frames(buffer);
+    let count = columns.et.length;
+
+    //SPICE (x, y, z) is three.js (z, x, y), see set_object_position() in position_store.js
+    let positions = new Float32Array(count * 3);
+    let level_counts = new Array(num_levels).fill(0);
+    for(let i = 0; i < count; i++) {
+        positions[i * 3]     = columns.y[i] * gl_p_km;
+        positions[i * 3 + 1] = columns.z[i] * gl_p_km;
+        positions[i * 3 + 2] = columns.x[i] * gl_p_km;
+        for(let level = columns.level[i]; level < num_levels; level++) {
+            level_counts[level]++;
+        }
+    }
+
+    let levels = level_counts.map(n => new Float32Array(n * 3));
+    let filled = new Array(num_levels).fill(0);
+    for(let i = 0; i < count; i++) {
+        for(let level = columns.level[i]; level < num_levels; level++) {
+            levels[level].set(positions.subarray(i * 3, i * 3 + 3), filled[level] * 3);
+            filled[level]++;
+        }
+    }
+    return { times: epochs(columns, start_time), positions: positions, levels: levels };
+}
+
+/**
+ * @name transferables(result)
+ * @description the buffers of every typed array in a result, to transfer them instead of copying
+ */
+function transferables(result) {
+    let buffers = [];
+    for(let value of Object.values(result)) {
+        for(let array of (Array.isArray(value) ? value : [value])) {
+            if(ArrayBuffer.isView(array))
+                buffers.push(array.buffer);
+        }
+    }
+    return buffers;
+}
+
+self.onmessage = function(event) {
+    let message = event.data;
+    try {
+        let result;
+        if(message.task == "trail")
+            result = trail_task(message.buffer, message.start_time, message.num_levels);
+        else
+            throw new Error(`unknown task ${message.task}`);
+        self.postMessage({ id: message.id, result: result }, transferables(result));
+    } catch(error) {
+        self.postMessage({ id: message.id, error: error.message });
+    }
+};
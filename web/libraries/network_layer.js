@@ -1,16 +1,11 @@
 import config from '../config/config';
 import axios from 'axios';
-import math from 'mathjs';
+import { cached } from './trajectory_cache';
 
 axios.defaults.baseURL = `http://${config.backendURL}/api`
 
-// kilometers to Astronomical Units
-const km_p_au = math.number(149597870.7);
-const au_p_km = math.eval(`1 / ${km_p_au}`);
-
-//Astronomical Units to GL Units
-const au_p_gl = math.eval(`1 / 100`);
-const gl_p_au = math.number(100);
+//kilometers to GL Units (100 GL Units per Astronomical Unit)
+const gl_p_km = 100 / 149597870.7;
 
 /**
  * Internal Conversion Functions, I wouldn't mess with these unless you spot some math errors.
@@ -19,9 +14,59 @@ function to_iso(date) {
     return new Date(date).toISOString()
 }
 
-function to_au(km) {
-    let d_au = math.eval(`${km} / ${km_p_au}`);
-    return math.eval(`${d_au} / ${au_p_gl}`);
+//the kernel fingerprint of the server (see get_fingerprint()), fetched once per page load
+let fingerprint_promise = undefined;
+
+/**
+ * @name get_fingerprint()
+ * @description get the fingerprint of the server's kernels from /api/status, which identifies every response that
+ *              only depends on them for the browser cache (see trajectory_cache.js)
+ * @returns a promise of the fingerprint, or of undefined if the server doesn't have one yet (it is still loading
+ *          its kernels) or can't be reached, in which case nothing is cached
+ */
+function get_fingerprint() {
+    if(!fingerprint_promise) {
+        fingerprint_promise = axios.get("/status").then(
+            response => response.data["fingerprint"] || undefined,
+            error => undefined);
+        //ask again next time if there was no fingerprint yet
+        fingerprint_promise.then(fingerprint => {
+            if(fingerprint === undefined)
+                fingerprint_promise = undefined;
+        });
+    }
+    return fingerprint_promise;
+}
+
+//binary trail responses are decoded by frame_worker.js, started on first use
+let worker = undefined;
+let worker_calls = {};
+let next_call_id = 0;
+
+/**
+ * @name run_in_worker(task, buffer, fields)
+ * @description transfer a binary response to the frame worker, and resolve to the result of `task` on it
+ * @param task: "trail", see frame_worker.js
+ * @param buffer: ArrayBuffer, which can no longer be used here afterwards
+ * @param fields: object with the other members of the task's message
+ */
+function run_in_worker(task, buffer, fields) {
+    if(!worker) {
+        worker = new Worker('./frame_worker.js');
+        worker.onmessage = function(event) {
+            let call = worker_calls[event.data.id];
+            delete worker_calls[event.data.id];
+            if(event.data.error !== undefined)
+                call.reject(new Error(event.data.error));
+            else
+                call.resolve(event.data.result);
+        };
+    }
+    let id = next_call_id++;
+    return new Promise(function(resolve, reject) {
+        worker_calls[id] = { resolve: resolve, reject: reject };
+        worker.postMessage(Object.assign({ id: id, task: task, buffer: buffer }, fields), [buffer]);
+    });
 }
 
 /**
@@ -104,33 +149,34 @@ async function() {
 }
 
 /**
- * @name get_frame(object, observer, date)
- * @description get a frame for an object at a particular time from a particular observer
- * @param object: string
+ * @name get_frames_multi(objects, observer, date)
+ * @description get the frames of several objects at a particular time from a particular observer, in one request
+ * @param objects: array of strings
  * @param observer: string
  * @param date: any type convertable to a Date object
+ * @returns object mapping each object to its {x, y, z, dx, dy, dz} in GL units, or undefined if it has no data then
  */
-exports.get_frame =
-async function(object, observer, date) {
+exports.get_frames_multi =
+async function(objects, observer, date) {
     try {
-        let response = await axios.post(`/objects/${object}/frames`, {
+        let response = await axios.post("/frames", {
+            targets: objects,
             observer: observer,
             times: [to_iso(date)]
         });
 
-        if(response.status == 200) {
-            let frame = response.data[0]
-            return {
-                date: new Date(frame["date"]),
-                frame: {
-                    x: to_au(frame["frame"]["x"]),
-                    y: to_au(frame["frame"]["y"]),
-                    z: to_au(frame["frame"]["z"]),
-                    dx: to_au(frame["frame"]["dx"]),
-                    dy: to_au(frame["frame"]["dy"]),
-                    dz: to_au(frame["frame"]["dz"])
+        if(response.status == 200 && response.data.length > 0) {
+            let frames = {};
+            for(let object of objects) {
+                let frame = response.data[0]["frames"][object];
+                if(frame) {
+                    frames[object] = {};
+                    for(let name of ["x", "y", "z", "dx", "dy", "dz"]) {
+                        frames[object][name] = frame[name] * gl_p_km;
+                    }
                 }
-            };
+            }
+            return frames;
         }
     } catch(error) {
         console.log(error);
@@ -139,42 +185,125 @@ async function(object, observer, date) {
 }
 
 /**
- * @name get_frames(object, observer, date_list)
- * @description get a frame for an object at a particular time from a particular observer
- * @param object: string
+ * @name get_frames_multi_range(objects, observer, start, end, step)
+ * @description get the frames of several objects from a particular observer, sampled every `step` seconds from
+ *              start to end, in one request
+ * @param objects: array of strings
  * @param observer: string
- * @param date_list: a lit of dates. any type convertable to a Date object
+ * @param start: any type convertable to a Date object
+ * @param end: any type convertable to a Date object
+ * @param step: number of seconds between samples
+ * @returns {times: array of sample times in ms, frames: object mapping each object to an array with its
+ *           {x, y, z, dx, dy, dz} in GL units at each time, or undefined where it has no data}
  */
-exports.get_frames =
-async function(object, observer, date_list) {
-    let data_arr = [];
-    for(let entry of date_list) {
-        data_arr.push(to_iso(entry));
-    }
+exports.get_frames_multi_range =
+async function(objects, observer, start, end, step) {
+    let start_date = new Date(start);
+    //going back over a time range is answered from the browser cache
+    let key = ["frames", objects.join(","), observer, to_iso(start_date), to_iso(end), step];
+    return cached(await get_fingerprint(), key, () => fetch_frames_multi_range(objects, observer, start_date, end, step));
+}
 
+async function fetch_frames_multi_range(objects, observer, start_date, end, step) {
     try {
-        let response = await axios.post(`/objects/${object}/frames`, {
+        let response = await axios.post("/frames", {
+            targets: objects,
             observer: observer,
-            times: data_arr
+            start: to_iso(start_date),
+            end: to_iso(end),
+            step: step
         });
 
         if(response.status == 200) {
-            let return_arr = [];
-            for(let frame of response.data) {
-                return_arr.push({
-                    date: new Date(frame["date"]),
-                    frame: {
-                        x: to_au(frame["frame"]["x"]),
-                        y: to_au(frame["frame"]["y"]),
-                        z: to_au(frame["frame"]["z"]),
-                        dx: to_au(frame["frame"]["dx"]),
-                        dy: to_au(frame["frame"]["dy"]),
-                        dz: to_au(frame["frame"]["dz"])
+            //times come from each update's et and date rather than from the request, so nothing assumes the response
+            //starts exactly at the start date. The dates (UTC, without a time zone) are only to the second, so the
+            //first one just tells which sample after the start date the response begins with, and every other time
+            //is its ET offset from that one.
+            let times = [];
+            let frames = {};
+            for(let object of objects) {
+                frames[object] = [];
+            }
+            let first_time = undefined;
+            if(response.data.length > 0) {
+                let first_date = new Date(response.data[0]["date"] + "Z").getTime();
+                first_time = start_date.getTime() + Math.round((first_date - start_date.getTime()) / (step * 1000)) * step * 1000;
+            }
+            for(let update of response.data) {
+                times.push(first_time + (update["et"] - response.data[0]["et"]) * 1000);
+                for(let object of objects) {
+                    let frame = update["frames"][object];
+                    let converted = undefined;
+                    if(frame) {
+                        converted = {};
+                        for(let name of ["x", "y", "z", "dx", "dy", "dz"]) {
+                            converted[name] = frame[name] * gl_p_km;
+                        }
                     }
-                });
+                    frames[object].push(converted);
+                }
             }
+            return { times: times, frames: frames };
+        }
+    } catch(error) {
+        console.log(error);
+    }
+    return undefined;
+}
+
+/**
+ * @name get_trail(object, observer, start, end, tolerances)
+ * @description get an adaptively sampled trail of an object from a particular observer between two dates: points are
+ *              denser where the trajectory curves, and each point has the coarsest level of detail it is part of
+ *              (a level per tolerance, coarsest first), so that the points with level <= k draw the trail within
+ *              tolerances[k] kilometers.
+ * @param object: string
+ * @param observer: string
+ * @param start: any type convertable to a Date object
+ * @param end: any type convertable to a Date object
+ * @param tolerances: array of kilometers, coarsest first
+ * @returns {times: Float64Array of ms, positions: Float32Array of (x, y, z) in GL units and three.js axis order,
+ *           levels: for each tolerance, a Float32Array of the positions of the points drawn at that level}
+ */
+exports.get_trail =
+async function(object, observer, start, end, tolerances) {
+    let start_date = new Date(start);
+
+    //the binary response is kept in the browser cache, so reloading the page doesn't fetch the whole trail again
+    let key = ["trail", object, observer, to_iso(start_date), to_iso(end), tolerances.join(",")];
+    let buffer = await cached(await get_fingerprint(), key, () => fetch_trail(object, observer, start_date, end, tolerances));
+    if(buffer === undefined)
+        return undefined;
+
+    try {
+        //the first point is always at the start date, so times can be rebuilt from it. Decoding the points and
+        //building the geometry of every level happens in the worker, so the scene keeps rendering meanwhile.
+        return await run_in_worker("trail", buffer, {
+            start_time: start_date.getTime(),
+            num_levels: tolerances.length
+        });
+    } catch(error) {
+        console.log(error);
+    }
+    return undefined;
+}
 
-            return return_arr;
+async function fetch_trail(object, observer, start_date, end, tolerances) {
+    try {
+        //a GET, so HTTP caches in front of the server can keep the trail too
+        let response = await axios.get(`/objects/${object}/trail`, {
+            params: {
+                observer: observer,
+                start: to_iso(start_date),
+                end: to_iso(end),
+                tolerances: tolerances.join(","),
+                format: "binary"
+            },
+            responseType: "arraybuffer"
+        });
+
+        if(response.status == 200) {
+            return response.data;
         }
     } catch(error) {
         console.log(error);
@@ -189,6 +318,10 @@ async function(object, observer, date_list) {
  */
 exports.get_coverage =
 async function(object) {
+    return cached(await get_fingerprint(), ["coverage", object], () => fetch_coverage(object));
+}
+
+async function fetch_coverage(object) {
     try {
         let response = await axios.get(`/objects/${object}/coverage`);
 
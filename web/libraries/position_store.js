@@ -1,8 +1,16 @@
 import config from '../config/config'
 import net from './network_layer';
+import FrameBuffer from './frame_buffer';
 import reduxStore from '../store';
 import { UPDATE_SIMULATION_TIME } from '../actions/spaceSceneActions';
 
+//simulated seconds between buffered samples: a few per second of playback, within these bounds
+const PREFETCH_SAMPLES_PER_SECOND = 4;
+const PREFETCH_MIN_STEP = 1;
+const PREFETCH_MAX_STEP = 300;
+//fewest samples fetched in a batch, which also keeps a paused simulation buffered
+const PREFETCH_MIN_SAMPLES = 16;
+
 const base_objects = [
   "sun",
   "moon",
@@ -10,9 +18,8 @@ const base_objects = [
 ]
 
 let app_store = {}
-let timeout_ref = undefined;
-let will_refresh_loop = false;
-let offset_time = new Date();
+let interval_ref = undefined;
+let buffer = new FrameBuffer();
 
 /**
  * @name init_object(obj)
@@ -34,37 +41,136 @@ async function init_object(obj) {
   }
 }
 
+/**
+ * @name set_object_position(key, frame)
+ * @description store a frame (in GL units, SPICE axes) as the position of an object
+ */
+function set_object_position(key, frame) {
+  /*
+    * Coordinate frames:
+    *
+    *    ThreeJS           SPICE
+    *      |Y                |Z
+    *      |                 |
+    *      |                 |
+    *      |________         |________
+    *     /        X        /        Y
+    *    /                 /
+    *   /Z                /X
+    */
+  app_store.objects[key].position = {
+    x: frame.y,
+    y: frame.z,
+    z: frame.x,
+    dx: frame.dy,
+    dy: frame.dz,
+    dz: frame.dx
+  }
+}
+
 /**
  * @name update_objects()
  * @description update each object in the app_store dictionary
  */
 async function update_objects() {
-  for(let key of Object.keys(app_store.objects)) {
-    let spice_pos = await net.get_frame(key, "earth", app_store.working_date);
-
-    /*
-      * Coordinate frames:
-      *
-      *    ThreeJS           SPICE
-      *      |Y                |Z
-      *      |                 |
-      *      |                 |
-      *      |________         |________
-      *     /        X        /        Y
-      *    /                 /
-      *   /Z                /X
-      */
-    app_store.objects[key].position = {
-      x: spice_pos.frame.y,
-      y: spice_pos.frame.z,
-      z: spice_pos.frame.x,
-      dx: spice_pos.frame.dy,
-      dy: spice_pos.frame.dz,
-      dz: spice_pos.frame.dx
+  //every object is fetched in a single request, so this doesn't get slower as objects are added
+  let frames = await net.get_frames_multi(Object.keys(app_store.objects), "earth", app_store.working_date);
+  if(frames) {
+    for(let key of Object.keys(frames)) {
+      set_object_position(key, frames[key]);
     }
   }
 }
 
+/**
+ * @name current_time()
+ * @description the simulation time (ms) right now: the clock runs at update_frequency simulated seconds per real
+ *              second from the last time it was set, and stops at the end of the coverage
+ */
+function current_time() {
+  let elapsed = (performance.now() - app_store.clock_real) * app_store.update_frequency;
+  return Math.min(app_store.clock_date + elapsed, app_store.coverage.end.getTime());
+}
+
+/**
+ * @name set_clock(date)
+ * @description restart the simulation clock from a date (ms), at the current update frequency
+ */
+function set_clock(date) {
+  app_store.clock_date = date;
+  app_store.clock_real = performance.now();
+}
+
+/**
+ * @name prefetch_step()
+ * @description simulated seconds between buffered samples at the current playback rate: a few samples per real
+ *              second, which Hermite interpolation fills in smoothly
+ */
+function prefetch_step() {
+  let step = app_store.update_frequency / PREFETCH_SAMPLES_PER_SECOND;
+  return Math.min(Math.max(step, PREFETCH_MIN_STEP), PREFETCH_MAX_STEP);
+}
+
+/**
+ * @name prefetch()
+ * @description fetch the next batch of frames into the buffer if less than half of the look-ahead is left. A batch
+ *              covers config.prefetchSeconds of playback at the current rate, starting where the buffer ends (or
+ *              just before the current time, if it doesn't reach it).
+ *              This polls /api/frames rather than subscribing to /api/stream: the stream only sends each update
+ *              when it is due, while interpolation needs the samples after the current time, and a seek or rate
+ *              change would mean opening a new stream.
+ */
+async function prefetch() {
+  if(app_store.fetching)
+    return;
+
+  let now = current_time();
+  let step = prefetch_step();
+  let lookahead = Math.max(config.prefetchSeconds * app_store.update_frequency, PREFETCH_MIN_SAMPLES * step) * 1000;
+  let buffered = buffer.end();
+  if(buffered !== undefined && buffered >= now && buffered - now > lookahead / 2)
+    return;
+
+  //batches start and end on multiples of the step, so that batches fetched at the same rate line up, and going
+  //back over a time range asks for the same batches again, which the browser cache already has
+  let step_ms = step * 1000;
+  let start = (buffered !== undefined && buffered >= now) ? buffered : Math.floor(now / step_ms) * step_ms;
+  let end = Math.min(Math.floor((start + lookahead) / step_ms + 1) * step_ms, app_store.coverage.end.getTime());
+  if(start >= end)
+    return;
+
+  //a seek while this is fetching makes the batch useless
+  let generation = app_store.generation;
+  app_store.fetching = true;
+  try {
+    let batch = await net.get_frames_multi_range(Object.keys(app_store.objects), "earth", start, end, step);
+    if(batch && generation == app_store.generation) {
+      if(buffer.end() !== undefined && start > buffer.end())
+        buffer.clear();
+      buffer.append(batch.times, batch.frames);
+    }
+  } finally {
+    app_store.fetching = false;
+  }
+}
+
+/**
+ * @name tick()
+ * @description runs every config.updatePeriod: tells the application the simulation time, drops samples that were
+ *              played and fetches the next batch when needed. Positions themselves are interpolated every rendered
+ *              frame by get_object_position(), so they don't wait for this.
+ */
+function tick() {
+  app_store.working_date = new Date(current_time());
+  reduxStore.dispatch({type: UPDATE_SIMULATION_TIME, payload: app_store.working_date.getTime()});
+
+  buffer.trim(app_store.working_date.getTime());
+  prefetch();
+
+  if(app_store.working_date >= app_store.coverage.end)
+    stop_loop();
+}
+
 /**
  * @name init_store()
  * @description initialize the app_store dict and begin our update loop
@@ -81,6 +187,9 @@ async function init_store() {
   //dispatch to the application that we are updating the simulation time to the start of the coverage window
   reduxStore.dispatch({type: UPDATE_SIMULATION_TIME, payload: app_store.working_date.getTime() })
   app_store.update_frequency = 1;
+  app_store.generation = 0;
+  app_store.fetching = false;
+  set_clock(app_store.working_date.getTime());
 
   //define each object in the app store to be empty
   app_store.objects = {};
@@ -90,19 +199,25 @@ async function init_store() {
   }
   await update_objects();
 
-  //here we start our update loop using some javascript hacks
-  will_refresh_loop = true;
+  //here we start playing
+  set_clock(app_store.working_date.getTime());
   start_loop();
 }
 
 export
 /**
- * @name start_loop() 
- * @description repeatedly calls request_loop() and then times out the request if it exceeds the updatePeriod
+ * @name start_loop()
+ * @description start the update loop, which keeps the frame buffer filled ahead of the simulation clock
  */
- //NOTE: this is what allows the application to recover from short disconnections
+ //NOTE: a failed fetch is simply tried again on the next tick, which is what allows the application to recover
+ //      from short disconnections
 function start_loop() {
-  timeout_ref = setTimeout(request_loop, config.updatePeriod);
+  stop_loop();
+  if(app_store.working_date >= app_store.coverage.end)
+    return;
+
+  prefetch();
+  interval_ref = setInterval(tick, config.updatePeriod);
 }
 
 //occastionally needed in some weird edge cases
@@ -114,41 +229,23 @@ function restart_loop() {
 
 export
 function stop_loop() {
-  clearTimeout(timeout_ref);
-}
-
-/**
- * @name request_loop()
- * @description request the position of all of the objects in the simulation and update them
- */
-async function request_loop() {
-  //first we update our time based on our time period, then dispatch that we are updating the time to that time.
-  app_store.working_date.setTime(app_store.working_date.getTime() + (config.updatePeriod * app_store.update_frequency));
-  reduxStore.dispatch({type: UPDATE_SIMULATION_TIME, payload: app_store.working_date.getTime()});
-  //if we are inside the coverage window still, update our objects and restart this loop
-  if(app_store.working_date < app_store.coverage.end && app_store.working_date > app_store.coverage.start) {
-    update_objects();
-
-    //reissue timeout;
-    if(will_refresh_loop){
-      restart_loop();
-      return;
-    }
-  }
-  //If we are outside the coverage window, stop the update loop.
-  stop_loop();
+  clearInterval(interval_ref);
+  interval_ref = undefined;
 }
 
 //these are all just short helper functions
 export
 function get_working_date() {
-  return app_store.working_date;
+  return (app_store.clock_date === undefined) ? app_store.working_date : new Date(current_time());
 }
 
 export
 function set_working_date(date) {
     app_store.working_date = date;
-    update_objects();
+    //the buffered frames are for the old time, so fetches in flight are ignored and the buffer starts over
+    app_store.generation += 1;
+    buffer.clear();
+    set_clock(date.getTime());
     restart_loop();
 }
 
@@ -159,6 +256,9 @@ function get_update_frequency() {
 
 export
 function set_update_frequency(freq) {
+    //the buffered frames are still right, only the clock and the size of later batches change
+    if(app_store.clock_date !== undefined)
+      set_clock(current_time());
     app_store.update_frequency = freq;
 }
 
@@ -172,8 +272,18 @@ function get_object_id(object) {
   return app_store.objects[object].id;
 }
 
+/**
+ * @name get_object_position(object)
+ * @description the position of an object at the current simulation time, interpolated from the frame buffer (or
+ *              its last known position, if the buffer doesn't cover the current time yet)
+ */
 export
 function get_object_position(object) {
+  if(app_store.clock_date !== undefined) {
+    let frame = buffer.frame_at(object, current_time());
+    if(frame)
+      set_object_position(object, frame);
+  }
   return app_store.objects[object].position;
 }
 
@@ -0,0 +1,145 @@
+/**
+ * Persistent cache of server responses (coverage, trails and batches of frames) in the browser's IndexedDB, so
+ * reloading the page or going back over a time range doesn't fetch them again.
+ *
+ * Every entry belongs to the kernel fingerprint the server reported when it was stored (see /api/status). The
+ * cache only ever holds entries for one fingerprint: as soon as the server reports another one, which means its
+ * kernels changed, everything is dropped. It is also kept to MAX_ENTRIES responses, dropping the oldest first, since
+ * playback stores a batch of frames every few seconds.
+ */
+
+const DB_NAME = "lunah-map";
+const DB_VERSION = 2;
+const STORE = "responses";
+//responses are stored as {value, added} records, indexed by when they were added (ms)
+const ADDED_INDEX = "added";
+//the fingerprint the stored responses were computed from is kept under this key (not in the index)
+const FINGERPRINT_KEY = "fingerprint";
+//once the cache holds more than this many responses, the oldest are dropped until it holds PRUNE_ENTRIES less,
+//so that pruning doesn't happen on every write
+const MAX_ENTRIES = 5000;
+const PRUNE_ENTRIES = 500;
+
+let db_promise = undefined;
+//number of responses in the cache, counted when it is opened and kept up to date by cached()
+let entry_count = 0;
+
+/**
+ * @name request_promise(request)
+ * @description a promise of the result of an IndexedDB request
+ */
+function request_promise(request) {
+    return new Promise(function(resolve, reject) {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+/**
+ * @name prune(db)
+ * @description drop the oldest responses once there are more than MAX_ENTRIES
+ */
+function prune(db) {
+    if(entry_count <= MAX_ENTRIES)
+        return;
+
+    let excess = entry_count - (MAX_ENTRIES - PRUNE_ENTRIES);
+    entry_count -= excess;
+    let store = db.transaction(STORE, "readwrite").objectStore(STORE);
+    let request = store.index(ADDED_INDEX).openKeyCursor();
+    request.onsuccess = function() {
+        let cursor = request.result;
+        if(cursor && excess-- > 0) {
+            store.delete(cursor.primaryKey);
+            cursor.continue();
+        }
+    };
+}
+
+/**
+ * @name open_db(fingerprint)
+ * @description open the database (once), emptying it if it holds responses for other kernels
+ * @returns a promise of the IDBDatabase, or of undefined if IndexedDB isn't available (private browsing for example)
+ */
+function open_db(fingerprint) {
+    if(db_promise)
+        return db_promise;
+
+    db_promise = (async function() {
+        if(typeof indexedDB === "undefined")
+            return undefined;
+
+        let request = indexedDB.open(DB_NAME, DB_VERSION);
+        //earlier versions stored responses without the time they were added, they are dropped
+        request.onupgradeneeded = function() {
+            let db = request.result;
+            if(db.objectStoreNames.contains(STORE))
+                db.deleteObjectStore(STORE);
+            db.createObjectStore(STORE).createIndex(ADDED_INDEX, "added");
+        };
+        let db = await request_promise(request);
+
+        //requests are all made before waiting for any, so each transaction stays active until they are done
+        let store = db.transaction(STORE, "readonly").objectStore(STORE);
+        let [stored, count] = await Promise.all([
+            request_promise(store.get(FINGERPRINT_KEY)),
+            request_promise(store.count())
+        ]);
+        if(stored !== fingerprint) {
+            store = db.transaction(STORE, "readwrite").objectStore(STORE);
+            await Promise.all([
+                request_promise(store.clear()),
+                request_promise(store.put(fingerprint, FINGERPRINT_KEY))
+            ]);
+            entry_count = 0;
+        } else {
+            entry_count = count - 1;
+            prune(db);
+        }
+        return db;
+    })().catch(function(error) {
+        console.log(error);
+        return undefined;
+    });
+    return db_promise;
+}
+
+/**
+ * @name cached(fingerprint, key, fetch)
+ * @description return the response stored under `key`, or else call `fetch` and store what it resolves to (unless
+ *              that is undefined, which means the request failed). Nothing is cached without a fingerprint, since
+ *              the server only has one once its kernels are loaded.
+ * @param fingerprint: the server's kernel fingerprint, or undefined/null
+ * @param key: array of strings and numbers identifying the response, such as ["trail", object, observer, ...]
+ * @param fetch: async function() returning the response; it must be something IndexedDB can store, such as plain
+ *               objects, arrays, Dates, ArrayBuffers and typed arrays
+ */
+export
+async function cached(fingerprint, key, fetch) {
+    let db = fingerprint ? await open_db(fingerprint) : undefined;
+    if(!db)
+        return fetch();
+
+    let id = JSON.stringify([fingerprint].concat(key));
+    try {
+        let record = await request_promise(db.transaction(STORE, "readonly").objectStore(STORE).get(id));
+        if(record !== undefined)
+            return record.value;
+    } catch(error) {
+        console.log(error);
+    }
+
+    let value = await fetch();
+    if(value !== undefined) {
+        try {
+            //the value is copied by put() right away, so the caller can still transfer or change it afterwards
+            db.transaction(STORE, "readwrite").objectStore(STORE).put({ value: value, added: Date.now() }, id);
+            //(a response stored twice by concurrent calls is counted twice, which only prunes a little early)
+            entry_count++;
+            prune(db);
+        } catch(error) {
+            console.log(error);
+        }
+    }
+    return value;
+}
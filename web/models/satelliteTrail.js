@@ -2,69 +2,132 @@ import * as THREE from '../three/three';
 
 import * as net from '../libraries/network_layer'
 
+//trail levels of detail, in kilometers of error allowed, coarsest first
+const TRAIL_TOLERANCES = [2000, 200, 20];
+//kilometers to GL Units
+const gl_p_km = 100 / 149597870.7;
+//how much simulation time the partial trail covers
+const PARTIAL_TRAIL_MS = 12 * 24 * 60 * 60 * 1000;
+
+
+/**
+ * @name lower_bound(array, value)
+ * @description index of the first element of a sorted array that is >= value (array.length if there is none)
+ */
+function lower_bound(array, value) {
+    let low = 0,
+        high = array.length;
+    while(low < high) {
+        let mid = (low + high) >>> 1;
+        if(array[mid] < value) low = mid + 1;
+        else                   high = mid;
+    }
+    return low;
+}
+
 
 export default class SatelliteTrail {
     constructor(sat_object) {
         this.satellite = sat_object;
-        this.date_list = []
-        this.vector_arr = []
-        this.full_path_object = null;
+        this.epochs = new Float64Array(0);
+        this.trail_positions = new Float32Array(0);
+        this.full_path_levels = [];
+        this.partial_path_object = null;
+        this.live_index = -1;
     }
 
     async preload() {
         let main_object = await net.get_main_object();
+        if(!main_object) return;
         let coverage =    await net.get_coverage(main_object.name);
+        if(!coverage) return;
+
+        //the server samples the trail more densely where it curves, so it can be drawn as is, and the network layer's
+        //worker builds the positions of every level of detail, so only the line objects are made here
+        let trail = await net.get_trail(main_object.name, "earth", coverage.start, coverage.end, TRAIL_TOLERANCES);
+        //the request failed, or there is no data to draw: leave the trail empty (both paths are then null)
+        if(!trail || trail.times.length == 0) return;
+        let count = trail.times.length;
 
-        let next_date = new Date(coverage.start);
-        while(next_date < coverage.end) {
-            this.date_list.push(new Date(next_date));
-            next_date.setHours(next_date.getHours() + 12);
+        //epochs (ms) and positions (in three.js axis order) as flat typed arrays
+        this.epochs = trail.times;
+        this.trail_positions = trail.positions;
+
+        //one line per level of detail, built once
+        let material = new THREE.LineBasicMaterial();
+        for(let positions of trail.levels) {
+            let geometry = new THREE.BufferGeometry();
+            geometry.addAttribute('position', new THREE.BufferAttribute(positions, 3));
+            this.full_path_levels.push(new THREE.Line(geometry, material));
         }
-        this.date_list.push(new Date(coverage.end));
-
-        (await net.get_frames(main_object.name, "earth", this.date_list)).forEach(e => {
-            this.vector_arr.push(new THREE.Vector3(
-                e.frame.y,
-                e.frame.z,
-                e.frame.x))
-        });
-
-        if(this.date_list.length != this.vector_arr.length)
-            console.warn("date_list and vector_arr are different sizes:",
-                    this.date_list.length,
-                    this.vector_arr.length);
-        this.full_path_object = new THREE.CatmullRomCurve3(this.vector_arr);
+
+        //the partial path is a window over every point of the trail, plus one spare vertex after the window's end
+        //that follows the satellite. Only the draw range and the spare vertex change as playback moves.
+        let partial_positions = new Float32Array((count + 1) * 3);
+        partial_positions.set(this.trail_positions);
+        let geometry = new THREE.BufferGeometry();
+        geometry.addAttribute('position', new THREE.BufferAttribute(partial_positions, 3).setDynamic(true));
+        geometry.setDrawRange(0, 0);
+        //(its bounding sphere is computed from the whole buffer, so it holds wherever the window is)
+        this.partial_path_object = new THREE.Line(geometry, new THREE.LineBasicMaterial());
     }
 
-    getFullPath() {
-        let geometry = new THREE.BufferGeometry().setFromPoints(this.full_path_object.getPoints(this.vector_arr.length * 12));
-        let material = new THREE.LineBasicMaterial();
+    /**
+     * @name getFullPath(camera, renderer)
+     * @description get the whole trail, at the coarsest level of detail whose error is still under a pixel when seen
+     *              from `camera` (or the finest level if no camera is given)
+     */
+    getFullPath(camera, renderer) {
+        if(this.full_path_levels.length == 0) return null;
 
-        return new THREE.Line(geometry, material);
+        let level = this.full_path_levels.length - 1;
+        if(camera && renderer && camera.isPerspectiveCamera) {
+            //size of a pixel, in GL units, at the distance of the earth (which the trail is centered on)
+            let distance = camera.position.length();
+            let pixel_size = 2 * distance * Math.tan(THREE.Math.degToRad(camera.fov) / 2) / renderer.domElement.clientHeight;
+            level = TRAIL_TOLERANCES.findIndex(km => km * gl_p_km <= pixel_size);
+            if(level == -1) level = this.full_path_levels.length - 1;
+        }
+        return this.full_path_levels[level];
     }
 
+    /**
+     * @name getPartialPath(end_date)
+     * @description get the last PARTIAL_TRAIL_MS of the trail before end_date, ending at the satellite's position.
+     *              The same line object is returned every time, updated in place.
+     */
     getPartialPath(end_date) {
+        if(!this.partial_path_object) return null;
 
-        let end_index = -1,
-            start_index = 0;
-        for(let i = 0; i < this.date_list.length; i++) {
-            if(this.date_list[i] >= end_date) {
-                end_index = i-1;
-                break;
-            }
-        }
-        if(end_index == -1) end_index = this.date_list.length -1;
+        let end_time = end_date.getTime();
+        //points strictly before end_date, then the satellite itself
+        let end_index = lower_bound(this.epochs, end_time) - 1;
+        let start_index = Math.min(lower_bound(this.epochs, end_time - PARTIAL_TRAIL_MS), end_index + 1);
 
-        if((end_index - 23) < 0) start_index = 0;
-        else                     start_index = end_index-23;
+        let geometry = this.partial_path_object.geometry;
+        let attribute = geometry.attributes.position;
+        let positions = attribute.array;
+        let live_index = end_index + 1;
+        let first_changed = live_index;
 
-        let partial_arr = this.vector_arr.slice(start_index, end_index + 1);
-        partial_arr.push(this.satellite.position);
+        //put back the trail point the satellite vertex was covering before it moved
+        if(this.live_index != live_index && this.live_index >= 0 && this.live_index * 3 < this.trail_positions.length) {
+            positions.set(this.trail_positions.subarray(this.live_index * 3, this.live_index * 3 + 3), this.live_index * 3);
+            first_changed = Math.min(first_changed, this.live_index);
+        }
+        let last_changed = Math.max(live_index, this.live_index);
+        this.live_index = live_index;
 
-        let curve = new THREE.CatmullRomCurve3(partial_arr);
-        let geometry = new THREE.BufferGeometry().setFromPoints(curve.getPoints(partial_arr.length * 12));
-        let material = new THREE.LineBasicMaterial();
+        positions[live_index * 3]     = this.satellite.position.x;
+        positions[live_index * 3 + 1] = this.satellite.position.y;
+        positions[live_index * 3 + 2] = this.satellite.position.z;
+
+        //only upload the vertices that changed
+        attribute.updateRange.offset = first_changed * 3;
+        attribute.updateRange.count = (last_changed - first_changed + 1) * 3;
+        attribute.needsUpdate = true;
 
-        return new THREE.Line(geometry, material);
+        geometry.setDrawRange(start_index, live_index - start_index + 1);
+        return this.partial_path_object;
     }
 }